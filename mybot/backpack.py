@@ -5,10 +5,12 @@ from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKe
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy import select, and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from database.models import LorePiece, UserLorePiece
-from database.hint_combination import HintCombination
-from database.setup import get_session
-from notificaciones import send_narrative_notification
+from services.backpack_service import BackpackService
+from services.hint_combination_service import HintCombinationService
+from services.lore_unlock_service import LoreUnlockService, DELIVERY_NOTICE
+from database.setup import get_session, get_session_factory
 import random
 from datetime import datetime
 
@@ -52,77 +54,51 @@ LUCIEN_BACKPACK_MESSAGES = [
 ]
 
 @router.message(F.text == "🎒 Mochila")
-async def mostrar_mochila_narrativa(message: Message):
+async def mostrar_mochila_narrativa(message: Message, session: AsyncSession, user_id: int = None):
     """Mochila principal con categorización y contexto narrativo"""
-    session_factory = await get_session()
-    async with session_factory() as session:
-        user_id = message.from_user.id
-        
-        # Obtener todas las pistas del usuario
-        result = await session.execute(
-            select(LorePiece, UserLorePiece.unlocked_at, UserLorePiece.context)
-            .join(UserLorePiece, LorePiece.id == UserLorePiece.lore_piece_id)
-            .where(UserLorePiece.user_id == user_id)
-            .order_by(UserLorePiece.unlocked_at.desc())
-        )
-        
-        pistas_data = result.all()
-        
-        if not pistas_data:
-            await mostrar_mochila_vacia(message)
-            return
-        
-        # Organizar por categorías
-        categorized_hints = {}
-        recent_hints = []
-        
-        for pista, unlocked_at, context in pistas_data:
-            category = pista.category or 'fragmentos'
-            if category not in categorized_hints:
-                categorized_hints[category] = []
-            categorized_hints[category].append((pista, unlocked_at, context))
-            
-            # Marcar pistas recientes (últimas 24h)
-            if unlocked_at and (datetime.now() - unlocked_at).days == 0:
-                recent_hints.append(pista)
-        
-        # Crear mensaje principal
-        lucien_message = random.choice(LUCIEN_BACKPACK_MESSAGES)
-        total_hints = len(pistas_data)
-        
-        texto = f"🎩 **Lucien:**\n*{lucien_message}*\n\n"
-        texto += f"📊 **Tu Colección:** {total_hints} pistas descubiertas\n"
-        
-        if recent_hints:
-            texto += f"✨ **Nuevas:** {len(recent_hints)} pistas recientes\n"
-        
-        texto += "\n🎒 **Explora tu mochila:**"
-        
-        # Crear botones por categoría
-        keyboard = []
-        for category, data in categorized_hints.items():
-            cat_info = BACKPACK_CATEGORIES.get(category, {
-                'emoji': '📜', 'title': category.title(), 'description': 'Elementos diversos'
-            })
-            count = len(data)
-            keyboard.append([
-                InlineKeyboardButton(text=f"{cat_info['emoji']} {cat_info['title']} ({count})", callback_data=f"mochila_cat:{category}"
-                )
-            ])
-        
-        # Botones adicionales
-        keyboard.extend([
-            [
-                InlineKeyboardButton(text="🔗 Combinar Pistas", callback_data="combinar_inicio"),
-                InlineKeyboardButton(text="🔍 Buscar", callback_data="buscar_pistas")
-            ],
-            [
-                InlineKeyboardButton(text="📈 Estadísticas", callback_data="stats_mochila"),
-                InlineKeyboardButton(text="🎯 Sugerencias", callback_data="sugerencias_diana")
-            ]
+    # Desde un callback, message.from_user es el bot
+    user_id = user_id or message.from_user.id
+    summary = await BackpackService(session).get_summary(user_id)
+
+    if not summary["total"]:
+        await mostrar_mochila_vacia(message)
+        return
+
+    # Crear mensaje principal
+    lucien_message = random.choice(LUCIEN_BACKPACK_MESSAGES)
+
+    texto = f"🎩 **Lucien:**\n*{lucien_message}*\n\n"
+    texto += f"📊 **Tu Colección:** {summary['total']} pistas descubiertas\n"
+
+    if summary["recent"]:
+        texto += f"✨ **Nuevas:** {summary['recent']} pistas recientes\n"
+
+    texto += "\n🎒 **Explora tu mochila:**"
+
+    # Crear botones por categoría
+    keyboard = []
+    for category, count in summary["categories"].items():
+        cat_info = BACKPACK_CATEGORIES.get(category, {
+            'emoji': '📜', 'title': category.title(), 'description': 'Elementos diversos'
+        })
+        keyboard.append([
+            InlineKeyboardButton(text=f"{cat_info['emoji']} {cat_info['title']} ({count})", callback_data=f"mochila_cat:{category}"
+            )
         ])
-        
-        await message.answer(texto, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard), parse_mode="Markdown")
+
+    # Botones adicionales
+    keyboard.extend([
+        [
+            InlineKeyboardButton(text="🔗 Combinar Pistas", callback_data="combinar_inicio"),
+            InlineKeyboardButton(text="🔍 Buscar", callback_data="buscar_pistas")
+        ],
+        [
+            InlineKeyboardButton(text="📈 Estadísticas", callback_data="stats_mochila"),
+            InlineKeyboardButton(text="🎯 Sugerencias", callback_data="sugerencias_diana")
+        ]
+    ])
+
+    await message.answer(texto, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard), parse_mode="Markdown")
 
 async def mostrar_mochila_vacia(message: Message):
     """Mensaje especial para mochila vacía con contexto narrativo"""
@@ -149,50 +125,44 @@ async def mostrar_mochila_vacia(message: Message):
     await message.answer(texto, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard), parse_mode="Markdown")
 
 @router.callback_query(F.data.startswith("mochila_cat:"))
-async def mostrar_categoria(callback: CallbackQuery):
-    """Muestra pistas de una categoría específica"""
-    category = callback.data.split(":")[1]
-    session_factory = await get_session()
-    
-    async with session_factory() as session:
-        user_id = callback.from_user.id
-        
-        result = await session.execute(
-            select(LorePiece, UserLorePiece.unlocked_at, UserLorePiece.context)
-            .join(UserLorePiece, LorePiece.id == UserLorePiece.lore_piece_id)
-            .where(
-                and_(
-                    UserLorePiece.user_id == user_id,
-                    LorePiece.category == category
-                )
-            )
-            .order_by(UserLorePiece.unlocked_at.desc())
-        )
-        
-        pistas_data = result.all()
-        cat_info = BACKPACK_CATEGORIES.get(category, {'emoji': '📜', 'title': category.title(), 'description': 'Elementos diversos'})
-        
-        texto = f"{cat_info['emoji']} **{cat_info['title']}**\n*{cat_info['description']}*\n\n"
-        
-        keyboard = []
-        for pista, unlocked_at, context in pistas_data:
-            # Agregar indicadores especiales
-            indicators = ""
-            if context and context.get('is_combinable'):
-                indicators += "🔗"
-            if unlocked_at and (datetime.now() - unlocked_at).days == 0:
-                indicators += "✨"
-            
-            button_text = f"{indicators} {pista.title}"
-            keyboard.append([
-                InlineKeyboardButton(text=button_text, callback_data=f"ver_pista_detail:{pista.id}")
-            ])
-        
+async def mostrar_categoria(callback: CallbackQuery, session: AsyncSession):
+    """Muestra pistas de una categoría específica, paginadas por cursor"""
+    # mochila_cat:<categoria>[:<cursor>]
+    parts = callback.data.split(":", 2)
+    category = parts[1]
+    after = parts[2] if len(parts) > 2 else None
+
+    pistas, next_cursor = await BackpackService(session).list_category(
+        callback.from_user.id, category, after=after
+    )
+    cat_info = BACKPACK_CATEGORIES.get(category, {'emoji': '📜', 'title': category.title(), 'description': 'Elementos diversos'})
+
+    texto = f"{cat_info['emoji']} **{cat_info['title']}**\n*{cat_info['description']}*\n\n"
+
+    keyboard = []
+    for pista in pistas:
+        # Agregar indicadores especiales
+        indicators = ""
+        context = pista["context"]
+        if context and context.get('is_combinable'):
+            indicators += "🔗"
+        if pista["unlocked_at"] and (datetime.now() - pista["unlocked_at"]).days == 0:
+            indicators += "✨"
+
+        button_text = f"{indicators} {pista['title']}"
         keyboard.append([
-            InlineKeyboardButton(text="⬅️ Volver a Mochila", callback_data="volver_mochila")
+            InlineKeyboardButton(text=button_text, callback_data=f"ver_pista_detail:{pista['id']}")
         ])
-        
-        await callback.message.edit_text(texto, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard), parse_mode="Markdown")
+
+    if next_cursor:
+        keyboard.append([
+            InlineKeyboardButton(text="Más ➡️", callback_data=f"mochila_cat:{category}:{next_cursor}")
+        ])
+    keyboard.append([
+        InlineKeyboardButton(text="⬅️ Volver a Mochila", callback_data="volver_mochila")
+    ])
+
+    await callback.message.edit_text(texto, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard), parse_mode="Markdown")
 
 @router.callback_query(F.data.startswith("ver_pista_detail:"))
 async def ver_pista_detallada(callback: CallbackQuery):
@@ -314,11 +284,11 @@ async def iniciar_combinacion_interactiva(callback: CallbackQuery, state: FSMCon
             await callback.answer("❌ Necesitas al menos 2 pistas para combinar")
             return
         
-        # Verificar si hay combinaciones posibles
-        combinaciones_disponibles = []
-        for pista in pistas:
-            combos = await verificar_combinaciones_disponibles(session, user_id, pista.code_name)
-            combinaciones_disponibles.extend(combos)
+        # Verificar si hay combinaciones posibles (una pasada por el índice invertido)
+        completables = await HintCombinationService(session).get_near_completions(
+            [pista.code_name for pista in pistas], max_missing=0
+        )
+        combinaciones_disponibles = [item["combination"] for item in completables]
         
         if not combinaciones_disponibles:
             texto = """🎩 **Lucien:**
@@ -419,25 +389,25 @@ async def procesar_combinacion_seleccionada(callback: CallbackQuery, state: FSMC
     async with session_factory() as session:
         user_id = callback.from_user.id
         
-        # Verificar combinación
-        result = await session.execute(select(HintCombination))
-        combinaciones = result.scalars().all()
-        
-        for combinacion in combinaciones:
-            required_hints = sorted(combinacion.required_hints.split(","))
-            user_hints = sorted(selected_hints)
-            
-            if user_hints == required_hints:
-                # ¡Combinación correcta!
-                await desbloquear_pista_narrativa(callback.message.bot, user_id, combinacion.reward_code, {
+        # Verificar combinación: búsqueda O(1) por clave canónica
+        combinacion = await HintCombinationService(session).find_combination(selected_hints)
+        if combinacion:
+            # ¡Combinación correcta!
+            await LoreUnlockService(session).unlock(
+                user_id,
+                combinacion.reward_code,
+                context={
                     'source': 'combination',
                     'combined_hints': selected_hints,
                     'combination_code': combinacion.combination_code
-                })
-                
-                await mostrar_exito_combinacion(callback, combinacion, selected_hints)
-                await state.clear()
-                return
+                },
+                bot=callback.message.bot,
+                delivery=DELIVERY_NOTICE,
+            )
+            
+            await mostrar_exito_combinacion(callback, combinacion, selected_hints)
+            await state.clear()
+            return
         
         # Combinación incorrecta
         await mostrar_fallo_combinacion(callback, selected_hints)
@@ -501,71 +471,26 @@ async def verificar_combinaciones_disponibles(session, user_id, hint_code):
         .join(UserLorePiece, LorePiece.id == UserLorePiece.lore_piece_id)
         .where(UserLorePiece.user_id == user_id)
     )
-    user_hint_codes = [row[0] for row in result.all()]
-    
-    # Buscar combinaciones que incluyan esta pista
-    result = await session.execute(select(HintCombination))
-    combinaciones = result.scalars().all()
-    
-    combinaciones_posibles = []
-    for combo in combinaciones:
-        required_hints = combo.required_hints.split(",")
-        if hint_code in required_hints:
-            # Verificar si el usuario tiene todas las pistas requeridas
-            if all(req_hint in user_hint_codes for req_hint in required_hints):
-                combinaciones_posibles.append(combo)
+    user_hint_codes = {row[0] for row in result.all()}
     
-    return combinaciones_posibles
+    # Combinaciones que incluyen esta pista (índice invertido) y están completas
+    combinaciones = await HintCombinationService(session).get_combinations_for_hint(hint_code)
+    return [
+        combo for combo in combinaciones
+        if user_hint_codes.issuperset(combo.canonical_key.split(","))
+    ]
 
 async def desbloquear_pista_narrativa(bot, user_id, pista_code, context=None):
-    """Desbloquea una pista con contexto narrativo completo"""
-    session_factory = await get_session()
-    async with session_factory() as session:
-        # Buscar la pista por código
-        result = await session.execute(
-            select(LorePiece).where(LorePiece.code_name == pista_code)
+    """Desbloquea una pista con contexto narrativo y avisa al usuario"""
+    async with get_session_factory()() as session:
+        return await LoreUnlockService(session).unlock(
+            user_id, pista_code, context=context, bot=bot, delivery=DELIVERY_NOTICE
         )
-        pista = result.scalar_one_or_none()
-        
-        if not pista:
-            return False
-        
-        # Verificar si ya la tiene
-        existing = await session.execute(
-            select(UserLorePiece).where(
-                and_(
-                    UserLorePiece.user_id == user_id,
-                    UserLorePiece.lore_piece_id == pista.id
-                )
-            )
-        )
-        
-        if existing.scalar_one_or_none():
-            return False  # Ya la tiene
-        
-        # Crear registro
-        user_lore_piece = UserLorePiece(
-            user_id=user_id,
-            lore_piece_id=pista.id,
-            context=context or {}
-        )
-        
-        session.add(user_lore_piece)
-        await session.commit()
-        
-        # Enviar notificación narrativa
-        await send_narrative_notification(bot, user_id, "new_hint", {
-            'hint_title': pista.title,
-            'hint_code': pista.code_name,
-            'source': context.get('source', 'unknown') if context else 'unknown'
-        })
-        
-        return True
 
 @router.callback_query(F.data == "volver_mochila")
-async def volver_mochila(callback: CallbackQuery):
+async def volver_mochila(callback: CallbackQuery, session: AsyncSession):
     """Regresa al menú principal de la mochila"""
-    await mostrar_mochila_narrativa(callback.message)
+    await mostrar_mochila_narrativa(callback.message, session, user_id=callback.from_user.id)
 
 # Funciones de utilidad adicionales para estadísticas y búsqueda
 
@@ -577,15 +502,9 @@ async def mostrar_estadisticas(callback: CallbackQuery):
         user_id = callback.from_user.id
         
         # Contar por categorías
-        result = await session.execute(
-            select(LorePiece.category, func.count(LorePiece.id))
-            .join(UserLorePiece, LorePiece.id == UserLorePiece.lore_piece_id)
-            .where(UserLorePiece.user_id == user_id)
-            .group_by(LorePiece.category)
-        )
-        
-        stats_by_category = dict(result.all())
-        total = sum(stats_by_category.values())
+        summary = await BackpackService(session).get_summary(user_id)
+        stats_by_category = summary["categories"]
+        total = summary["total"]
         
         # Primera pista obtenida
         first_hint = await session.execute(
@@ -635,7 +554,6 @@ async def mostrar_sugerencias_diana(callback: CallbackQuery):
         count = total_hints.scalar()
         
         # Verificar combinaciones posibles
-        combinaciones_disponibles = []
         result = await session.execute(
             select(LorePiece.code_name)
             .join(UserLorePiece, LorePiece.id == UserLorePiece.lore_piece_id)
@@ -643,11 +561,10 @@ async def mostrar_sugerencias_diana(callback: CallbackQuery):
         )
         user_codes = [row[0] for row in result.all()]
         
-        combinaciones_result = await session.execute(select(HintCombination))
-        for combo in combinaciones_result.scalars().all():
-            required = combo.required_hints.split(",")
-            if all(code in user_codes for code in required):
-                combinaciones_disponibles.append(combo)
+        # Completables y a una pista de completarse, precalculadas desde el índice invertido
+        cercanas = await HintCombinationService(session).get_near_completions(user_codes, max_missing=1)
+        combinaciones_disponibles = [item["combination"] for item in cercanas if not item["missing"]]
+        combinaciones_cercanas = [item["combination"] for item in cercanas if item["missing"]]
         
         # Generar sugerencia personalizada
         if count == 0:
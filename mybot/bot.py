@@ -1,2 +1,263 @@
-# Actualizar import en bot.py (línea 45)
-from database import init_db, get_session_factory
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+
+from utils.config import STARTUP_PROFILE
+from utils.startup_profile import enable_import_profiling, format_startup_report, startup_phase
+
+# Antes de cualquier otro import para que el perfil los cubra todos
+if STARTUP_PROFILE:
+    enable_import_profiling()
+
+with startup_phase("imports"):
+    from aiogram import Bot, Dispatcher
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from aiogram.types import Update
+
+    from database import init_db, get_session_factory, close_db
+    from handlers.registry import preload_lazy_routers, register_routers
+    from middlewares import DBSessionMiddleware, PointsMiddleware, UserRegistrationMiddleware, setup_metrics
+    from services.cluster import SCHEDULER_WORKER, configure_worker, handle_message, is_scheduler_worker, update_user_id
+    from services.loop_monitor import loop_monitor
+    from services.job_runtime import DatabaseLeaseLeader, FollowerLeader, JobRuntime, set_job_runtime
+    from services.lore_unlock_service import stop_lore_delivery
+    from services.scheduler import register_scheduler_jobs
+    from utils.config import (
+        BOT_TOKEN,
+        BOT_WORKERS,
+        NARRATIVE_HOT_RELOAD,
+        SCHEDULER_LEADER_ELECTION,
+        SAMPLING_PROFILER_OUTPUT,
+        SAMPLING_PROFILER_SECONDS,
+        WEBHOOK_COALESCE,
+        WEBHOOK_HOST,
+        WEBHOOK_PATH,
+        WEBHOOK_PORT,
+        WEBHOOK_QUEUE_SIZE,
+        WEBHOOK_SECRET,
+        WEBHOOK_URL,
+        WORKER_CONCURRENCY,
+        WORKER_QUEUE_SIZE,
+    )
+    from utils.rate_limiter import TELEGRAM_LIMITER
+    from utils.update_feed import UserOrderedFeed
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(processName)s %(name)s: %(message)s"
+# Segundos tras el arranque antes de precargar los routers diferidos no usados
+LAZY_ROUTER_PRELOAD_DELAY = 300
+# Segundos de espera en la cola del worker antes de comprobar si sigue el supervisor
+INBOX_POLL = 1
+
+
+def build_dispatcher(session_factory, bot: Bot) -> tuple:
+    dp = Dispatcher(storage=MemoryStorage())
+    setup_metrics(dp, bot)
+    dp.update.outer_middleware(DBSessionMiddleware(session_factory))
+    dp.update.outer_middleware(UserRegistrationMiddleware())
+    points = PointsMiddleware()
+    for observer in ("message", "message_reaction", "poll_answer"):
+        dp.observers[observer].outer_middleware(points)
+    lazy_routers, skipped = register_routers(dp)
+    for module in skipped:
+        logger.error(f"Router omitido: {module}")
+    return dp, lazy_routers
+
+
+def webhook_settings() -> dict:
+    """Opciones de ``WebhookServer`` y ``serve`` según la configuración; vacío si se usa polling."""
+    if not WEBHOOK_URL:
+        return {}
+    return {
+        "url": WEBHOOK_URL,
+        "path": WEBHOOK_PATH,
+        "host": WEBHOOK_HOST,
+        "port": WEBHOOK_PORT,
+        "secret": WEBHOOK_SECRET,
+        "queue_size": WEBHOOK_QUEUE_SIZE,
+        "coalesce": WEBHOOK_COALESCE,
+    }
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot) -> None:
+    """Recibe por webhook en este proceso hasta SIGINT/SIGTERM."""
+    from webhook import WebhookServer
+
+    settings = webhook_settings()
+    feed = UserOrderedFeed(dp, bot, WORKER_CONCURRENCY, WEBHOOK_QUEUE_SIZE)
+    server = WebhookServer(
+        bot,
+        feed.submit,
+        update_user_id,
+        path=settings["path"],
+        secret=settings["secret"],
+        queue_size=settings["queue_size"],
+        coalesce=settings["coalesce"],
+        status=lambda: {"pending_users": feed.pending_users},
+    )
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await server.serve(
+        stop,
+        url=settings["url"],
+        host=settings["host"],
+        port=settings["port"],
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    await feed.drain()
+
+
+async def prepare_database() -> None:
+    await init_db()
+    await close_db()
+
+
+def resolve_allowed_updates() -> list:
+    """Tipos de actualización que usan los handlers (para el polling del supervisor)."""
+    dp = Dispatcher()
+    register_routers(dp)
+    return dp.resolve_used_update_types()
+
+
+async def preload_routers_later(lazy_routers) -> None:
+    await asyncio.sleep(LAZY_ROUTER_PRELOAD_DELAY)
+    preload_lazy_routers(lazy_routers)
+
+
+async def start_background(bot: Bot, session_factory, lazy_routers, leader=None) -> tuple:
+    """Arranca el runtime de tareas y las tareas de fondo; devuelve (runtime, tareas)."""
+    runtime = JobRuntime(leader)
+    await register_scheduler_jobs(runtime, bot, session_factory)
+    set_job_runtime(runtime)
+    runtime.start()
+
+    tasks = [
+        asyncio.create_task(loop_monitor()),
+        asyncio.create_task(preload_routers_later(lazy_routers)),
+    ]
+    # Solo un proceso escribe los fragmentos; el resto recibe los cambios por el bus
+    if NARRATIVE_HOT_RELOAD and is_scheduler_worker():
+        from services.narrative_watcher import narrative_watcher
+
+        tasks.append(asyncio.create_task(narrative_watcher(session_factory)))
+    if SAMPLING_PROFILER_SECONDS > 0:
+        from services.sampling_profiler import profile_to_file
+
+        tasks.append(asyncio.create_task(profile_to_file(SAMPLING_PROFILER_SECONDS, SAMPLING_PROFILER_OUTPUT)))
+    return runtime, tasks
+
+
+async def stop_background(runtime: JobRuntime, tasks: list) -> None:
+    await runtime.stop()
+    # Antes de cerrar la sesión del bot: las pistas en cola aún se pueden enviar
+    await stop_lore_delivery()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
+    with startup_phase("init_db"):
+        await init_db()
+    session_factory = get_session_factory()
+    bot = Bot(token=BOT_TOKEN)
+    with startup_phase("routers"):
+        dp, lazy_routers = build_dispatcher(session_factory, bot)
+
+    leader = DatabaseLeaseLeader(session_factory) if SCHEDULER_LEADER_ELECTION else None
+    runtime, tasks = await start_background(bot, session_factory, lazy_routers, leader)
+
+    if STARTUP_PROFILE:
+        logger.info(format_startup_report())
+    try:
+        if WEBHOOK_URL:
+            await run_webhook(dp, bot)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        await stop_background(runtime, tasks)
+        await bot.session.close()
+        await close_db()
+
+
+def _read_control(control, loop: asyncio.AbstractEventLoop) -> None:
+    """Hilo del worker: pasa al bucle los mensajes del bus, sin esperar a las actualizaciones."""
+    while True:
+        message = control.get()
+        if message is None:
+            return
+        try:
+            loop.call_soon_threadsafe(handle_message, *message)
+        except RuntimeError:
+            # Bucle ya cerrado: el worker está terminando
+            return
+
+
+async def worker_main(index: int, workers: int, inbox, control, bus) -> None:
+    """Bucle de un worker: procesa las actualizaciones de su cola y los mensajes del bus."""
+    configure_worker(index, workers, bus)
+    # El límite de Telegram es por bot: se reparte entre los workers
+    TELEGRAM_LIMITER.set_rate(TELEGRAM_LIMITER.rate / workers)
+    await init_db()
+    session_factory = get_session_factory()
+    bot = Bot(token=BOT_TOKEN)
+    dp, lazy_routers = build_dispatcher(session_factory, bot)
+
+    if index != SCHEDULER_WORKER:
+        leader = FollowerLeader()
+    else:
+        leader = DatabaseLeaseLeader(session_factory) if SCHEDULER_LEADER_ELECTION else None
+    runtime, tasks = await start_background(bot, session_factory, lazy_routers, leader)
+
+    feed = UserOrderedFeed(dp, bot, WORKER_CONCURRENCY, WORKER_QUEUE_SIZE)
+    loop = asyncio.get_running_loop()
+    threading.Thread(target=_read_control, args=(control, loop), name="cluster-control", daemon=True).start()
+    logger.info(f"Worker {index} of {workers} ready")
+    try:
+        while True:
+            try:
+                item = await loop.run_in_executor(None, inbox.get, True, INBOX_POLL)
+            except queue.Empty:
+                if not multiprocessing.parent_process().is_alive():
+                    logger.error("Supervisor is gone; stopping worker")
+                    break
+                continue
+            if item is None:
+                break
+            await feed.submit(Update.model_validate_json(item[1], context={"bot": bot}))
+        await feed.drain()
+    finally:
+        await stop_background(runtime, tasks)
+        await bot.session.close()
+        await close_db()
+
+
+def run_worker(index: int, workers: int, inbox, control, bus) -> None:
+    """Proceso worker lanzado por ``supervisor.Supervisor``."""
+    # Las señales las atiende el supervisor, que avisa a cada worker por su cola
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    asyncio.run(worker_main(index, workers, inbox, control, bus))
+
+
+if __name__ == "__main__":
+    if BOT_WORKERS > 1:
+        from supervisor import run_supervisor
+
+        logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+        # Esquema y migraciones una sola vez; los workers arrancan por la vía rápida
+        asyncio.run(prepare_database())
+        run_supervisor(
+            BOT_TOKEN, BOT_WORKERS, run_worker, resolve_allowed_updates(), WORKER_QUEUE_SIZE, webhook_settings()
+        )
+    else:
+        asyncio.run(main())
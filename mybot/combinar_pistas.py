@@ -4,11 +4,9 @@ from utils.message_safety import safe_answer, safe_edit, safe_send_message, safe
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.filters import Command
-from sqlalchemy.future import select
 from database.setup import get_session
-from database.models import UserLorePiece, LorePiece
-from database.hint_combination import HintCombination
-from narrativa import desbloquear_pista
+from services.hint_combination_service import HintCombinationService
+from services.lore_unlock_service import LoreUnlockService
 
 router = Router()
 
@@ -26,18 +24,18 @@ async def procesar_combinacion(message: Message, state: FSMContext):
     async with session_factory() as session:
         user_id = message.from_user.id
         user_input = message.text.replace(" ", "")
-        user_hints = sorted(user_input.split(","))
     
-        result = await session.execute(select(HintCombination))
-        combinaciones = result.scalars().all()
-    
-        for combinacion in combinaciones:
-            pistas_requeridas = sorted(combinacion.required_hints.split(","))
-            if user_hints == pistas_requeridas:
-                await desbloquear_pista(bot=message.bot, user_id=user_id, pista_code=combinacion.reward_code)
-                await safe_answer(message, "\u00a1Combinaci\u00f3n correcta! Has desbloqueado una nueva pista.")
-                await state.clear()
-                return
+        combinacion = await HintCombinationService(session).find_combination(user_input)
+        if combinacion:
+            await LoreUnlockService(session).unlock(
+                user_id,
+                combinacion.reward_code,
+                context={"source": "combination", "combination_code": combinacion.combination_code},
+                bot=message.bot,
+            )
+            await safe_answer(message, "\u00a1Combinaci\u00f3n correcta! Has desbloqueado una nueva pista.")
+            await state.clear()
+            return
     
         await safe_answer(message, "Combinaci\u00f3n incorrecta. Verifica tus pistas e intenta nuevamente.")
         await state.clear()
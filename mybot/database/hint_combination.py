@@ -1,14 +1,14 @@
 from sqlalchemy import Column, Integer, String, DateTime, func
-from sqlalchemy.ext.asyncio import AsyncAttrs
-from sqlalchemy.ext.declarative import declarative_base
+from .base import Base
 
-Base = declarative_base()
-
-class HintCombination(AsyncAttrs, Base):
+class HintCombination(Base):
     __tablename__ = "hint_combinations"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     combination_code = Column(String, unique=True, nullable=False)  # Código que representa la combinación correcta
     required_hints = Column(String, nullable=False)  # IDs o códigos separados por coma, ejemplo: "2,4,7"
+    # Códigos ordenados y sin duplicados (ver canonical_hint_key); clave de búsqueda O(1).
+    # En bases existentes la añade la migración 1; las filas viejas se rellenan al cargar la caché
+    canonical_key = Column(String, unique=True, nullable=True, index=True)
     reward_code = Column(String, nullable=False)  # Código de la pista o recompensa que se desbloquea
     created_at = Column(DateTime, default=func.now())
@@ -0,0 +1,118 @@
+# database/migrations.py
+"""
+Migraciones versionadas del esquema.
+``create_all`` solo crea tablas que faltan: no añade columnas ni índices a
+tablas existentes. Cada migración de ``MIGRATIONS`` hace ese trabajo sobre
+bases ya desplegadas y su versión queda registrada en ``schema_migrations``,
+así que cada una se aplica una sola vez. Son idempotentes (comprueban columnas
+e índices antes de crearlos) porque en una base nueva ``create_all`` ya dejó
+el esquema al día y solo falta anotar la versión.
+
+Los índices se crean sin reconstruir la tabla; en PostgreSQL con
+``CREATE INDEX CONCURRENTLY`` para no bloquear escrituras mientras se construyen.
+"""
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_TABLE = "schema_migrations"
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return column in {col["name"] for col in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    if not _has_column(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        logger.info(f"Columna {table}.{column} añadida")
+
+
+def _create_index(conn: Connection, name: str, table: str, columns: str, unique: bool = False) -> None:
+    existing = {index["name"] for index in inspect(conn).get_indexes(table)}
+    if name in existing:
+        return
+    concurrently = "CONCURRENTLY " if conn.dialect.name == "postgresql" else ""
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    conn.execute(text(f"CREATE {kind} {concurrently}IF NOT EXISTS {name} ON {table} ({columns})"))
+    logger.info(f"Índice {name} creado")
+
+
+def _v1_hint_canonical_key(conn: Connection) -> None:
+    _add_column(conn, "hint_combinations", "canonical_key", "VARCHAR")
+    _create_index(conn, "ix_hint_combinations_canonical_key", "hint_combinations", "canonical_key", unique=True)
+
+
+def _v2_narrative_decisions_count(conn: Connection) -> None:
+    _add_column(conn, "user_narrative_states", "decisions_count", "INTEGER DEFAULT 0")
+
+
+def _v3_hot_path_indexes(conn: Connection) -> None:
+    _create_index(conn, "ix_users_role_vip_expires_at", "users", "role, vip_expires_at")
+    _create_index(conn, "ix_users_points", "users", "points")
+    _create_index(conn, "ix_button_reactions_message_id_user_id", "button_reactions", "message_id, user_id")
+    _create_index(conn, "ix_button_reactions_created_at", "button_reactions", "created_at")
+    _create_index(conn, "ix_bids_auction_id_amount", "bids", "auction_id, amount")
+    _create_index(
+        conn,
+        "ix_pending_channel_requests_approved_request_timestamp",
+        "pending_channel_requests",
+        "approved, request_timestamp",
+    )
+
+
+def _v4_scheduler_leases(conn: Connection) -> None:
+    from .models import SchedulerLease
+
+    SchedulerLease.__table__.create(conn, checkfirst=True)
+
+
+# (versión, descripción, función). Solo se añaden al final.
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "hint_combinations.canonical_key", _v1_hint_canonical_key),
+    (2, "user_narrative_states.decisions_count", _v2_narrative_decisions_count),
+    (3, "hot path indexes", _v3_hot_path_indexes),
+    (4, "scheduler_leases", _v4_scheduler_leases),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: Connection) -> int:
+    if not inspect(conn).has_table(SCHEMA_TABLE):
+        return 0
+    return conn.execute(text(f"SELECT COALESCE(MAX(version), 0) FROM {SCHEMA_TABLE}")).scalar_one()
+
+
+def run_migrations(conn: Connection) -> List[int]:
+    """Aplica las migraciones pendientes y devuelve las versiones aplicadas.
+
+    Espera una conexión en modo AUTOCOMMIT: cada sentencia se confirma por sí
+    sola (``CREATE INDEX CONCURRENTLY`` no admite transacciones) y la versión
+    se anota solo después de que la migración termine.
+    """
+    conn.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {SCHEMA_TABLE} ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        )
+    )
+    current = get_schema_version(conn)
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Aplicando migración {version}: {name}")
+        migrate(conn)
+        conn.execute(
+            text(f"INSERT INTO {SCHEMA_TABLE} (version, name) VALUES (:version, :name)"),
+            {"version": version, "name": name},
+        )
+        applied.append(version)
+    return applied
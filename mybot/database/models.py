@@ -12,6 +12,7 @@ from sqlalchemy import (
     Float,
     UniqueConstraint,
     Enum,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from uuid import uuid4
@@ -52,6 +53,13 @@ class User(Base):
     menu_state = Column(String, default="root")
     is_admin = Column(Boolean, default=False) # New column for admin status
 
+    __table_args__ = (
+        # Recordatorios y vencimientos VIP filtran por rol y fecha de expiración
+        Index("ix_users_role_vip_expires_at", "role", "vip_expires_at"),
+        # Rankings por puntos
+        Index("ix_users_points", "points"),
+    )
+
     @declared_attr
     def narrative_state(cls):
         from .narrative_models import UserNarrativeState
@@ -335,6 +343,10 @@ class PendingChannelRequest(Base):
     request_timestamp = Column(DateTime, default=func.now())
     approved = Column(Boolean, default=False)
 
+    __table_args__ = (
+        Index("ix_pending_channel_requests_approved_request_timestamp", "approved", "request_timestamp"),
+    )
+
 
 class Challenge(Base):
     __tablename__ = "challenges"
@@ -369,6 +381,11 @@ class ButtonReaction(Base):
     reaction_type = Column(String, nullable=False)
     created_at = Column(DateTime, default=func.now())
 
+    __table_args__ = (
+        Index("ix_button_reactions_message_id_user_id", "message_id", "user_id"),
+        Index("ix_button_reactions_created_at", "created_at"),
+    )
+
 
 # NEW AUCTION SYSTEM MODELS
 class Auction(Base):
@@ -411,6 +428,8 @@ class Bid(Base):
     
     __table_args__ = (
         UniqueConstraint("auction_id", "user_id", "amount", name="uix_auction_user_bid"),
+        # Puja más alta por subasta
+        Index("ix_bids_auction_id_amount", "auction_id", "amount"),
     )
 
 
@@ -537,3 +556,13 @@ class TriviaUserAnswer(Base):
     question_id = Column(Integer, ForeignKey("trivia_questions.id"), nullable=False)
     user_answer = Column(Text, nullable=True)
     is_correct = Column(Boolean, default=False)
+
+
+class SchedulerLease(Base):
+    """Arrendamiento de liderazgo para que solo un proceso ejecute las tareas programadas."""
+
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
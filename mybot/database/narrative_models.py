@@ -72,9 +72,12 @@ class UserNarrativeState(Base):
 
     user_id = Column(BigInteger, ForeignKey('users.id'), primary_key=True)
     current_fragment_key = Column(String(50), nullable=True)  # Referencia por key
+    # Histórico heredado; las decisiones nuevas van a user_narrative_decisions
     choices_made = Column(JSON, default=list)
     
     # Estadísticas adicionales
+    # Último seq usado en el registro de decisiones; en bases existentes lo añade la migración 2
+    decisions_count = Column(Integer, default=0)
     fragments_visited = Column(Integer, default=0)
     total_besitos_earned = Column(Integer, default=0)
     narrative_started_at = Column(DateTime, default=func.now())
@@ -86,3 +89,14 @@ class UserNarrativeState(Base):
         lazy="joined",
         single_parent=True
     )
+
+
+class UserNarrativeDecision(Base):
+    """Registro append-only de decisiones narrativas (una fila por decisión)."""
+    __tablename__ = 'user_narrative_decisions'
+
+    user_id = Column(BigInteger, ForeignKey('users.id'), primary_key=True)
+    seq = Column(Integer, primary_key=True, autoincrement=False)
+    fragment_key = Column(String(50), nullable=False)
+    choice_index = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=func.now())
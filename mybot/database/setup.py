@@ -3,24 +3,27 @@ import logging
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import NullPool
 from .base import Base
-from utils.config import Config
+from . import hint_combination  # Registra hint_combinations en Base.metadata
+from .migrations import LATEST_VERSION, get_schema_version, run_migrations
+from utils.config import Config, DB_FAST_START
 
 logger = logging.getLogger(__name__)
 
 _engine = None
 _sessionmaker = None
 
+# Una tabla nueva necesita además una migración: con DB_FAST_START no se ejecuta
+# create_all sobre un esquema que ya está en la última versión.
 TABLES_ORDER = [
     'users',
     'achievements',
     'story_fragments',
-    'narrative_choices', 
-    'user_narrative_states',
-    'story_fragments',
     'narrative_choices',
     'user_narrative_states',
+    'user_narrative_decisions',
     'rewards',
     'lore_pieces',
+    'hint_combinations',
     'missions',
     'events',
     'raffles',
@@ -54,6 +57,7 @@ TABLES_ORDER = [
     'trivia_questions',
     'trivia_attempts',
     'trivia_user_answers',
+    'scheduler_leases',
 ]
 
 async def init_db():
@@ -73,11 +77,23 @@ async def init_db():
                 echo=False, 
                 poolclass=NullPool
             )
+        if DB_FAST_START:
+            async with _engine.connect() as conn:
+                version = await conn.run_sync(get_schema_version)
+            if version >= LATEST_VERSION:
+                logger.info(f"Esquema en la versión {version}; se omite create_all")
+                return _engine
         async with _engine.begin() as conn:
             logger.info("Creando tablas...")
             tables = [Base.metadata.tables[name] for name in TABLES_ORDER]
             await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn, tables=tables))
             logger.info("Tablas creadas exitosamente")
+        # Fuera de la transacción: los índices en PostgreSQL se crean CONCURRENTLY
+        async with _engine.connect() as conn:
+            autocommit = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            applied = await autocommit.run_sync(run_migrations)
+            if applied:
+                logger.info(f"Migraciones aplicadas: {applied}")
         return _engine
     except Exception as e:
         logger.critical(f"Error crítico en init_db: {str(e)}")
@@ -98,3 +114,10 @@ def get_session_factory():
 async def get_session() -> AsyncSession:
     session_factory = get_session_factory()
     return session_factory()
+
+async def close_db():
+    global _engine, _sessionmaker
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _sessionmaker = None
@@ -7,10 +7,8 @@ from .subscription_plans import router as subscription_plans_router
 from .game_admin import router as game_admin_router
 from .event_admin import router as event_admin_router
 from .admin_config import router as admin_config_router
-from .trivia_admin import router as trivia_admin_router
 
-# Asegúrate de incluir trivia_admin_router al registrar routers:
-admin_router.include_router(trivia_admin_router)
+# trivia_admin y auction_admin se registran bajo demanda (ver handlers/registry.py)
 
 __all__ = [
     "admin_router",
@@ -2,7 +2,7 @@
 Enhanced admin menu with improved navigation and multi-tenant support.
 """
 from aiogram import Router, F, Bot
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, BufferedInputFile
 from aiogram.filters import CommandStart, Command
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -17,9 +17,23 @@ from uuid import uuid4
 from sqlalchemy import select
 from utils.messages import BOT_MESSAGES
 from utils.keyboard_utils import get_admin_manage_content_keyboard # Importar la función del teclado
-from backpack import desbloquear_pista_narrativa
+from services.lore_unlock_service import LoreUnlockService, DELIVERY_NOTICE
+from services.job_runtime import get_job_runtime
+from services.loop_monitor import format_loop_report, set_lag_threshold
+from services.metrics import get_update_summary, render_metrics
+from services.sampling_profiler import format_collapsed, format_profile_summary, is_profiling, profile_for
+from services.slow_query_log import (
+    disable_slow_query_log,
+    enable_slow_query_log,
+    format_slow_query_report,
+    is_slow_query_log_enabled,
+    reset_slow_queries,
+)
 
+import asyncio
+import html
 import logging
+from typing import Set
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -102,6 +116,10 @@ async def admin_stats(callback: CallbackQuery, session: AsyncSession):
             "💰 **Ingresos**",
             f"• Total recaudado: ${stats.get('revenue_total', 0)}",
             "",
+            "📈 **Últimos 7 días**",
+            "• Nuevos usuarios: " + " ".join(str(count) for _, count in stats.get("users_daily", [])),
+            "• Ingresos: " + " ".join(f"${amount}" for _, amount in stats.get("revenue_daily", [])),
+            "",
             "⚙️ **Configuración**"
         ]
         
@@ -358,8 +376,11 @@ async def admin_free_channel_redirect(callback: CallbackQuery, session: AsyncSes
 
 
 @router.message(F.text.startswith("/give_hint "))
-async def cmd_give_hint(message: Message):
-    """Comando de admin para dar una pista a un usuario."""
+async def cmd_give_hint(message: Message, session: AsyncSession):
+    """Comando de admin para dar una pista a uno o varios usuarios.
+
+    Acepta varios IDs separados por coma: ``/give_hint 1,2,3 codigo``.
+    """
     if not await is_admin(message.from_user.id, session):
         await message.answer(
             "❌ **Acceso Denegado**\n\nNo tienes permisos para usar este comando.",
@@ -370,24 +391,31 @@ async def cmd_give_hint(message: Message):
     parts = message.text.split()
     if len(parts) == 3:
         try:
-            target_user_id = int(parts[1])
+            target_user_ids = [int(uid) for uid in parts[1].split(",") if uid]
             hint_code_to_give = parts[2]
 
-            success = await desbloquear_pista_narrativa(
-                message.bot,
-                target_user_id,
+            granted = await LoreUnlockService(session).unlock_for_users(
+                target_user_ids,
                 hint_code_to_give,
-                {"source": "admin_command", "admin_id": message.from_user.id},
+                context={"source": "admin_command", "admin_id": message.from_user.id},
+                bot=message.bot,
+                delivery=DELIVERY_NOTICE,
             )
 
-            if success:
+            if len(target_user_ids) > 1:
+                await message.answer(
+                    f"✅ Pista '<b>{hint_code_to_give}</b>' desbloqueada para <b>{len(granted)}</b> "
+                    f"de {len(target_user_ids)} usuarios.",
+                    parse_mode="HTML",
+                )
+            elif granted:
                 await message.answer(
-                    f"✅ Pista '<b>{hint_code_to_give}</b>' desbloqueada para el usuario <b>{target_user_id}</b>.",
+                    f"✅ Pista '<b>{hint_code_to_give}</b>' desbloqueada para el usuario <b>{target_user_ids[0]}</b>.",
                     parse_mode="HTML",
                 )
             else:
                 await message.answer(
-                    f"⚠️ La pista '<b>{hint_code_to_give}</b>' ya la tiene el usuario <b>{target_user_id}</b> o no existe.",
+                    f"⚠️ La pista '<b>{hint_code_to_give}</b>' ya la tiene el usuario <b>{parts[1]}</b> o no existe.",
                     parse_mode="HTML",
                 )
         except ValueError:
@@ -400,3 +428,158 @@ async def cmd_give_hint(message: Message):
             "❌ Uso incorrecto. Formato: <code>/give_hint <user_id> <hint_code></code>",
             parse_mode="HTML",
         )
+
+
+@router.message(Command("metrics"))
+async def cmd_metrics(message: Message, session: AsyncSession):
+    """Resumen de latencia, SQL y llamadas a Telegram por handler.
+
+    ``/metrics raw`` envía todas las métricas en formato de texto de Prometheus.
+    """
+    if not await is_admin(message.from_user.id, session):
+        return
+
+    if message.text.split()[1:2] == ["raw"]:
+        await message.answer_document(
+            BufferedInputFile(render_metrics().encode(), filename="metrics.txt"),
+            caption="📈 Métricas del proceso",
+        )
+        return
+
+    rows = get_update_summary(limit=15)
+    if not rows:
+        await message.answer("📈 Aún no hay métricas registradas.")
+        return
+
+    lines = ["📈 <b>Métricas por handler</b> (ordenadas por tiempo total)", ""]
+    for row in rows:
+        lines.append(
+            f"<code>{html.escape(row['handler'])}</code> [{row['update_type']}]\n"
+            f"  {row['count']} updates · media {row['avg_ms']:.0f} ms · p95 ≤{row['p95_ms']:.0f} ms\n"
+            f"  SQL {row['avg_db_statements']:.1f} ({row['avg_db_ms']:.0f} ms) · "
+            f"Telegram {row['avg_telegram_calls']:.1f} · errores {row['errors']}"
+        )
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("loop"))
+async def cmd_loop(message: Message, session: AsyncSession):
+    """Lag del bucle de eventos, tareas vivas por origen y bloqueos recientes.
+
+    ``/loop threshold <ms>`` cambia el umbral a partir del cual se registra un bloqueo.
+    """
+    if not await is_admin(message.from_user.id, session):
+        return
+
+    args = message.text.split()[1:]
+    if len(args) == 2 and args[0] == "threshold" and args[1].replace(".", "", 1).isdigit():
+        set_lag_threshold(float(args[1]))
+        await message.answer(f"⏱️ Umbral de bloqueo del bucle: {float(args[1]):g} ms.")
+        return
+
+    await message.answer(f"<pre>{html.escape(format_loop_report(limit=10))[:3900]}</pre>", parse_mode="HTML")
+
+
+@router.message(Command("jobs"))
+async def cmd_jobs(message: Message, session: AsyncSession):
+    """Estado de las tareas programadas; ``/jobs run <nombre>`` lanza una ahora."""
+    if not await is_admin(message.from_user.id, session):
+        return
+    runtime = get_job_runtime()
+    if runtime is None:
+        await message.answer("⏲️ El runtime de tareas no está en marcha en este proceso.")
+        return
+
+    args = message.text.split()[1:]
+    if len(args) == 2 and args[0] == "run":
+        if args[1] not in runtime.jobs:
+            await message.answer(f"❌ No existe la tarea {html.escape(args[1])}.")
+            return
+        runtime.trigger(args[1])
+        await message.answer(f"⏲️ Tarea {html.escape(args[1])} lanzada.")
+        return
+
+    role = "líder" if runtime.leader.is_leader else "en espera (otro proceso es líder)"
+    lines = [f"⏲️ <b>Tareas programadas</b> · {role}", ""]
+    for job in runtime.status():
+        state = "▶️" if job["running"] else ("⚠️" if job["failures"] else "✅")
+        next_in = "esperando plazo" if job["next_in"] is None else f"en {job['next_in']:.0f} s"
+        duration = "-" if job["last_duration"] is None else f"{job['last_duration'] * 1000:.0f} ms"
+        lines.append(f"{state} <code>{job['name']}</code> · {job['runs']} ejecuciones · última {duration} · {next_in}")
+        if job["last_error"]:
+            lines.append(f"    {job['failures']} fallos: {html.escape(job['last_error'][:200])}")
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+# Perfiles en curso (referencia para que el recolector no cancele la tarea)
+_PROFILE_TASKS: Set[asyncio.Task] = set()
+
+
+@router.message(Command("profile"))
+async def cmd_profile(message: Message, session: AsyncSession):
+    """Perfil de muestreo del proceso durante ``/profile [segundos]`` (30 por defecto).
+
+    Envía un fichero collapsed stack para flamegraph.pl o speedscope.
+    """
+    if not await is_admin(message.from_user.id, session):
+        return
+    if is_profiling():
+        await message.answer("🔬 Ya hay un perfil en curso.")
+        return
+
+    args = message.text.split()[1:]
+    seconds = float(args[0]) if args and args[0].replace(".", "", 1).isdigit() else 30
+    await message.answer(f"🔬 Muestreando el bot durante {seconds:g} s...")
+    # En segundo plano: el handler no ocupa el turno del admin mientras se muestrea
+    task = asyncio.create_task(_send_profile(message, seconds))
+    _PROFILE_TASKS.add(task)
+    task.add_done_callback(_PROFILE_TASKS.discard)
+
+
+async def _send_profile(message: Message, seconds: float) -> None:
+    try:
+        result = await profile_for(seconds)
+    except ValueError as e:
+        await message.answer(f"❌ {e}")
+        return
+    try:
+        await message.answer_document(
+            BufferedInputFile(format_collapsed(result).encode(), filename="profile.folded"),
+            caption=f"🔬 {format_profile_summary(result)}"[:1024],
+        )
+    except Exception:
+        logger.exception("Could not send profile")
+
+
+@router.message(Command("slow_queries"))
+async def cmd_slow_queries(message: Message, session: AsyncSession):
+    """Modo diagnóstico de consultas lentas.
+
+    ``/slow_queries on [ms]`` lo activa, ``off`` lo desactiva, ``reset`` borra
+    lo acumulado y sin argumentos envía el informe de las más costosas.
+    """
+    if not await is_admin(message.from_user.id, session):
+        return
+
+    args = message.text.split()[1:]
+    action = args[0].lower() if args else "report"
+    if action == "on":
+        threshold = float(args[1]) if len(args) > 1 and args[1].replace(".", "", 1).isdigit() else 100
+        enable_slow_query_log(threshold)
+        await message.answer(f"🐢 Registro de consultas lentas activado (> {threshold:g} ms).")
+    elif action == "off":
+        disable_slow_query_log()
+        await message.answer("🐢 Registro de consultas lentas desactivado.")
+    elif action == "reset":
+        reset_slow_queries()
+        await message.answer("🐢 Informe de consultas lentas reiniciado.")
+    else:
+        report = format_slow_query_report(limit=20)
+        if not report:
+            state = "activo" if is_slow_query_log_enabled() else "desactivado (usa /slow_queries on [ms])"
+            await message.answer(f"🐢 Sin consultas lentas registradas. Modo diagnóstico {state}.")
+            return
+        await message.answer_document(
+            BufferedInputFile(report.encode(), filename="slow_queries.txt"),
+            caption="🐢 Consultas más costosas",
+        )
@@ -2,7 +2,6 @@ from aiogram import Router, F
 from aiogram.filters import StateFilter
 from aiogram.types import CallbackQuery, Message
 from aiogram.enums.chat_type import ChatType
-from aiogram import Bot
 from sqlalchemy.ext.asyncio import AsyncSession
 from utils.user_roles import is_admin
 from utils.menu_utils import update_menu
@@ -16,8 +15,7 @@ from keyboards.admin_config_kb import (
 from utils.keyboard_utils import get_back_keyboard
 from services.config_service import ConfigService
 from services.channel_service import ChannelService
-from services.scheduler import run_channel_request_check, run_vip_subscription_check
-from database.setup import get_session
+from services.job_runtime import get_job_runtime
 from utils.admin_state import AdminConfigStates
 from aiogram.fsm.context import FSMContext
 
@@ -127,9 +125,8 @@ async def scheduler_menu(callback: CallbackQuery, session: AsyncSession):
     if not await is_admin(callback.from_user.id, session):
         return await callback.answer()
     config = ConfigService(session)
-    ch = await config.get_value("channel_scheduler_interval") or "30"
     vip = await config.get_value("vip_scheduler_interval") or "3600"
-    text = f"Intervalos actuales:\nCanal: {ch}s\nVIP: {vip}s"
+    text = f"Intervalos actuales:\nVIP: {vip}s"
     await update_menu(callback, text, get_scheduler_config_kb(), session, "scheduler_config")
     await callback.answer()
 
@@ -185,18 +182,6 @@ async def channel_mode_both(callback: CallbackQuery, state: FSMContext, session:
     await callback.answer()
 
 
-@router.callback_query(F.data == "set_channel_interval")
-async def prompt_channel_interval(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
-    if not await is_admin(callback.from_user.id, session):
-        return await callback.answer()
-    await callback.message.edit_text(
-        "Ingresa el intervalo en segundos para revisar solicitudes de canal:",
-        reply_markup=get_back_keyboard("config_scheduler"),
-    )
-    await state.set_state(AdminConfigStates.waiting_for_channel_interval)
-    await callback.answer()
-
-
 @router.callback_query(F.data == "set_vip_interval")
 async def prompt_vip_interval(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     if not await is_admin(callback.from_user.id, session):
@@ -210,27 +195,16 @@ async def prompt_vip_interval(callback: CallbackQuery, state: FSMContext, sessio
 
 
 @router.callback_query(F.data == "run_schedulers_now")
-async def run_schedulers_now(callback: CallbackQuery, bot: Bot, session: AsyncSession):
+async def run_schedulers_now(callback: CallbackQuery, session: AsyncSession):
     if not await is_admin(callback.from_user.id, session):
         return await callback.answer()
-    Session = await get_session()
-    await run_channel_request_check(bot, Session)
-    await run_vip_subscription_check(bot, Session)
-    await callback.answer("Schedulers ejecutados", show_alert=True)
-
-
-@router.message(AdminConfigStates.waiting_for_channel_interval)
-async def set_channel_interval(message: Message, state: FSMContext, session: AsyncSession):
-    if not await is_admin(message.from_user.id, session):
-        return
-    try:
-        seconds = int(message.text.strip())
-    except ValueError:
-        await message.answer("Ingresa un número válido.")
-        return
-    await ConfigService(session).set_value("channel_scheduler_interval", str(seconds))
-    await message.answer("Intervalo actualizado.", reply_markup=get_admin_config_kb())
-    await state.clear()
+    runtime = get_job_runtime()
+    if runtime is None:
+        return await callback.answer("El runtime de tareas no está en marcha en este proceso.", show_alert=True)
+    # Por el runtime: no se solapan con los plazos en curso y corren en el líder
+    runtime.trigger("join_safety_scan")
+    runtime.trigger("vip_safety_scan")
+    await callback.answer("Schedulers lanzados", show_alert=True)
 
 
 @router.message(AdminConfigStates.waiting_for_vip_channel_id)
@@ -310,5 +284,8 @@ async def set_vip_interval(message: Message, state: FSMContext, session: AsyncSe
         await message.answer("Ingresa un número válido.")
         return
     await ConfigService(session).set_value("vip_scheduler_interval", str(seconds))
+    runtime = get_job_runtime()
+    if runtime is not None:
+        runtime.set_interval("vip_membership", seconds)
     await message.answer("Intervalo actualizado.", reply_markup=get_admin_config_kb())
     await state.clear()
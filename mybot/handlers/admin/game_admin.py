@@ -39,35 +39,30 @@ from services.lore_piece_service import LorePieceService
 from services.point_service import PointService
 from services.config_service import ConfigService
 from services.badge_service import BadgeService
+from services.user_search import UserSearchService
 from utils.messages import BOT_MESSAGES
-from utils.pagination import get_pagination_buttons
+from utils.pagination import (
+    get_cached_count,
+    get_keyset_pagination_buttons,
+    get_pagination_buttons,
+    keyset_page,
+)
 from states.gamification_states import LorePieceAdminStates
 
 router = Router()
 
 
-async def show_users_page(message: Message, session: AsyncSession, offset: int) -> None:
+async def show_users_page(message: Message, session: AsyncSession, cursor: str | None = None) -> None:
     """Display a paginated list of users with action buttons."""
     limit = 5
-    if offset < 0:
-        offset = 0
-
-    total_stmt = select(func.count()).select_from(User)
-    total_result = await session.execute(total_stmt)
-    total_users = total_result.scalar_one()
 
-    stmt = (
-        select(User)
-        .order_by(User.id)
-        .offset(offset)
-        .limit(limit)
-    )
-    result = await session.execute(stmt)
-    users = result.scalars().all()
+    total_users = await get_cached_count(session, "admin_users", select(User.id))
+    stmt = select(User.id, User.username, User.first_name, User.points)
+    users, prev_cursor, next_cursor = await keyset_page(session, stmt, User.id, cursor, limit)
 
     text_lines = [
         "👥 Gestión de Usuarios",
-        f"Mostrando {offset + 1}-{min(offset + limit, total_users)} de {total_users}",
+        f"Total: {total_users} usuarios",
         "",
     ]
 
@@ -75,7 +70,8 @@ async def show_users_page(message: Message, session: AsyncSession, offset: int)
         display = user.username or (user.first_name or "Sin nombre")
         text_lines.append(f"- {display} (ID: {user.id}) - {user.points} pts")
 
-    keyboard = get_admin_users_list_keyboard(users, offset, total_users, limit)
+    nav = get_keyset_pagination_buttons(prev_cursor, next_cursor, "admin_users_page")
+    keyboard = get_admin_users_list_keyboard(users, nav)
 
     await message.edit_text("\n".join(text_lines), reply_markup=keyboard)
 
@@ -84,19 +80,16 @@ async def show_users_page(message: Message, session: AsyncSession, offset: int)
 async def admin_manage_users(callback: CallbackQuery, session: AsyncSession):
     if not await is_admin(callback.from_user.id, session):
         return await callback.answer()
-    await show_users_page(callback.message, session, 0)
+    await show_users_page(callback.message, session)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("admin_users_page_"))
+@router.callback_query(F.data.startswith("admin_users_page:"))
 async def admin_users_page(callback: CallbackQuery, session: AsyncSession):
     if not await is_admin(callback.from_user.id, session):
         return await callback.answer()
-    try:
-        offset = int(callback.data.split("_")[-1])
-    except ValueError:
-        offset = 0
-    await show_users_page(callback.message, session, offset)
+    cursor = callback.data.split(":", 1)[1]
+    await show_users_page(callback.message, session, cursor)
     await callback.answer()
 
 
@@ -176,33 +169,47 @@ async def admin_search_user(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
+async def show_user_search_results(message: Message, session: AsyncSession, query: str, page: int, edit: bool = False) -> None:
+    """Render one page of ranked user search results."""
+    limit = 10
+    users, total = await UserSearchService(session).search(query, offset=page * limit, limit=limit)
+    if not users:
+        await send_temporary_reply(message, "No se encontraron usuarios.")
+        return
+
+    response = f"Resultados para «{query}» ({total}):\n" + "\n".join(
+        f"- {(u.username or u.first_name or 'Sin nombre')} (ID: {u.id})" for u in users
+    )
+    total_pages = (total + limit - 1) // limit
+    nav = get_pagination_buttons(page, total_pages, "admin_search_page")
+    markup = InlineKeyboardMarkup(inline_keyboard=[nav]) if nav else None
+    if edit:
+        await message.edit_text(response, reply_markup=markup)
+    else:
+        await message.answer(response, reply_markup=markup)
+
+
 @router.message(AdminUserStates.search_user_query)
 async def process_search_user(message: Message, state: FSMContext, session: AsyncSession):
     if not await is_admin(message.from_user.id, session):
         return
     query = message.text.strip()
-    users = []
-    if query.isdigit():
-        user = await session.get(User, int(query))
-        if user:
-            users = [user]
-    else:
-        stmt = select(User).where(
-            (User.username.ilike(f"%{query}%")) |
-            (User.first_name.ilike(f"%{query}%")) |
-            (User.last_name.ilike(f"%{query}%"))
-        ).limit(10)
-        result = await session.execute(stmt)
-        users = result.scalars().all()
+    await show_user_search_results(message, session, query, 0)
+    # Se conserva la consulta para paginar los resultados
+    await state.set_state(None)
+    await state.update_data(user_search_query=query)
 
-    if not users:
-        await send_temporary_reply(message, "No se encontraron usuarios.")
-    else:
-        response = "Resultados:\n" + "\n".join(
-            f"- {(u.username or u.first_name or 'Sin nombre')} (ID: {u.id})" for u in users
-        )
-        await message.answer(response)
-    await state.clear()
+
+@router.callback_query(F.data.startswith("admin_search_page:"))
+async def admin_search_page(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    if not await is_admin(callback.from_user.id, session):
+        return await callback.answer()
+    query = (await state.get_data()).get("user_search_query")
+    if not query:
+        return await callback.answer("La búsqueda ha expirado", show_alert=True)
+    page = int(callback.data.split(":")[1])
+    await show_user_search_results(callback.message, session, query, page, edit=True)
+    await callback.answer()
 
 
 @router.callback_query(F.data == "admin_content_missions")
@@ -32,9 +32,10 @@ from services import (
     AchievementService,
     MissionService,
 )
-from database.models import User, Tariff
+from database.models import User, Tariff, VipSubscription
 from utils.message_utils import get_profile_message
 from utils.text_utils import sanitize_text
+from utils.pagination import get_cached_count, get_keyset_pagination_buttons, keyset_page
 from utils.admin_state import (
     AdminVipMessageStates,
     AdminManualBadgeStates,
@@ -347,19 +348,28 @@ async def cancel_vip_channel_post(callback: CallbackQuery, state: FSMContext, se
 async def manage_subs(callback: CallbackQuery, session: AsyncSession):
     if not await is_admin(callback.from_user.id, session):
         return await callback.answer()
-    parts = callback.data.split(":")
-    page = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
-    sub_service = SubscriptionService(session)
-    subs = await sub_service.get_active_subscribers()
+    parts = callback.data.split(":", 1)
+    cursor = parts[1] if len(parts) > 1 else None
     page_size = 10
-    start = page * page_size
-    current = subs[start : start + page_size]
+
+    now = datetime.utcnow()
+    active = (VipSubscription.expires_at.is_(None)) | (VipSubscription.expires_at > now)
+    stmt = (
+        select(VipSubscription.user_id, User.id.label("known_user"), User.username, User.first_name)
+        .outerjoin(User, User.id == VipSubscription.user_id)
+        .where(active)
+    )
+    subs, prev_cursor, next_cursor = await keyset_page(
+        session, stmt, VipSubscription.user_id, cursor, page_size
+    )
+    total = await get_cached_count(
+        session, "vip_active_subs", select(VipSubscription.user_id).where(active)
+    )
 
     builder = InlineKeyboardBuilder()
-    for sub in current:
-        user = await session.get(User, sub.user_id)
-        username = sanitize_text(user.username) if user else None
-        display = username or (user.first_name or "Sin nombre") if user else str(sub.user_id)
+    for sub in subs:
+        username = sanitize_text(sub.username) if sub.username else None
+        display = (username or sub.first_name or "Sin nombre") if sub.known_user else str(sub.user_id)
         builder.row(InlineKeyboardButton(text=display, callback_data="vip_none"))
         builder.row(
             InlineKeyboardButton(text="👤", callback_data=f"vip_profile_{sub.user_id}"),
@@ -368,18 +378,14 @@ async def manage_subs(callback: CallbackQuery, session: AsyncSession):
             InlineKeyboardButton(text="✏️", callback_data=f"vip_edit_{sub.user_id}"),
         )
 
-    if start > 0 or start + page_size < len(subs):
-        nav = []
-        if start > 0:
-            nav.append(InlineKeyboardButton(text="⬅️", callback_data=f"vip_manage:{page - 1}"))
-        if start + page_size < len(subs):
-            nav.append(InlineKeyboardButton(text="➡️", callback_data=f"vip_manage:{page + 1}"))
+    nav = get_keyset_pagination_buttons(prev_cursor, next_cursor, "vip_manage")
+    if nav:
         builder.row(*nav)
     builder.row(InlineKeyboardButton(text="🔙 Volver", callback_data="admin_vip"))
 
     await update_menu(
         callback,
-        "👥 Suscriptores VIP activos:",
+        f"👥 Suscriptores VIP activos: {total}",
         builder.as_markup(),
         session,
         "admin_vip_manage",
@@ -7,6 +7,7 @@ from aiogram.types import Message, CallbackQuery, Document
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 import os
 import json
@@ -181,12 +182,16 @@ async def reset_user_narrative(message: Message, session: AsyncSession):
         target_user_id = int(command_parts[1])
         
         # Buscar y eliminar estado narrativo del usuario
-        from database.narrative_models import UserNarrativeState
+        from database.narrative_models import UserNarrativeState, UserNarrativeDecision
         stmt = select(UserNarrativeState).where(UserNarrativeState.user_id == target_user_id)
         result = await session.execute(stmt)
         user_state = result.scalar_one_or_none()
         
         if user_state:
+            # El contador de secuencia vive en el estado: se borra también el registro
+            await session.execute(
+                delete(UserNarrativeDecision).where(UserNarrativeDecision.user_id == target_user_id)
+            )
             await session.delete(user_state)
             await session.commit()
             await safe_answer(message, f"✅ **Narrativa Reiniciada**\n\nLa historia del usuario {target_user_id} ha sido reiniciada.")
@@ -7,7 +7,7 @@ router = Router()
 @router.message(F.text == "🎒 Mochila")
 async def handle_backpack_button(message: Message, session: AsyncSession):
     from backpack import mostrar_mochila_narrativa
-    await mostrar_mochila_narrativa(message)
+    await mostrar_mochila_narrativa(message, session)
 
 @router.message(F.text == "💰 Billetera")
 async def handle_wallet_button(message: Message, session: AsyncSession):
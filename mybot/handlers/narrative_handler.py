@@ -139,12 +139,12 @@ async def show_narrative_stats(message: Message, session: AsyncSession):
 🗺️ **Fragmentos Visitados**: {stats['fragments_visited']}
 🎯 **Total Accesible**: {stats['total_accessible']}
 
-🎪 **Decisiones Tomadas**: {len(stats['choices_made'])}"""
+🎪 **Decisiones Tomadas**: {stats['decisions_count']}"""
 
-            if stats['choices_made']:
+            if stats['recent_choices']:
                 stats_text += "\n\n🔍 **Últimas Decisiones**:"
-                for choice in stats['choices_made'][-3:]:  # Últimas 3 decisiones
-                    stats_text += f"\n• {choice.get('choice_text', 'Decisión desconocida')}"
+                for choice in reversed(stats['recent_choices']):  # Últimas 3 decisiones
+                    stats_text += f"\n• {choice.get('choice_text') or 'Decisión desconocida'}"
         else:
             stats_text = """📖 **Tu Historia Personal**
 
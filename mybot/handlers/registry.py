@@ -0,0 +1,127 @@
+"""
+Registro de routers del bot en el orden de prioridad de los handlers.
+Los routers poco usados (configuración inicial, administración de trivias y
+de subastas) se registran como ``LazyRouter``: su módulo no se importa hasta
+que llega un update que les corresponde, así el arranque no paga su coste.
+"""
+import importlib
+import logging
+from typing import List, Tuple
+
+from aiogram import Dispatcher
+
+from utils.lazy_router import LazyRouter
+
+logger = logging.getLogger(__name__)
+
+
+def _lazy_routers() -> dict:
+    return {
+        "handlers.admin.trivia_admin": LazyRouter(
+            "handlers.admin.trivia_admin",
+            callback_prefixes=("list_trivias", "create_trivia"),
+            texts=("🛠️ Administrar Trivias",),
+            state_prefixes=("CreateTrivia:",),
+        ),
+        "handlers.admin.auction_admin": LazyRouter(
+            "handlers.admin.auction_admin",
+            callback_prefixes=(
+                "admin_auction_",
+                "admin_create_auction",
+                "admin_list_active_auctions",
+                "admin_list_pending_auctions",
+                "manage_auction_",
+                "end_auction_",
+                "confirm_end_auction_",
+                "cancel_auction_",
+                "confirm_cancel_auction_",
+            ),
+            state_prefixes=("AdminAuctionStates:",),
+        ),
+        "handlers.setup": LazyRouter(
+            "handlers.setup",
+            commands=("setup",),
+            callback_prefixes=(
+                "setup_",
+                "start_setup",
+                "skip_setup",
+                "skip_to_admin",
+                "show_setup_guide",
+                "confirm_channel",
+                "detect_another",
+                "manual_channel_id",
+                "cancel_",
+                "admin_main",
+                "admin_kinky_game",
+            ),
+            state_prefixes=("SetupStates:",),
+        ),
+    }
+
+
+# Orden de inclusión; los módulos marcados en _lazy_routers() se cargan bajo demanda
+HANDLER_MODULES = [
+    "handlers.start",
+    "handlers.user.start_token",
+    "handlers.admin",
+    "handlers.admin.trivia_admin",
+    "handlers.admin.auction_admin",
+    "handlers.main_menu",
+    "handlers.free_user",
+    "handlers.vip.menu",
+    "handlers.vip.gamification",
+    "handlers.vip.auction_user",
+    "handlers.narrative_handler",
+    "handlers.narrative_handlers",
+    "handlers.admin_narrative_handlers",
+    "handlers.lore_handlers",
+    "backpack",
+    "combinar_pistas",
+    "handlers.missions_handler",
+    "handlers.daily_gift",
+    "handlers.minigames",
+    "handlers.trivia_handler",
+    "handlers.info_handler",
+    "handlers.reaction_callback",
+    "handlers.channel_access",
+    "handlers.free_channel_admin",
+    "handlers.setup",
+    "handlers.publication_test",
+]
+
+
+def register_routers(dp: Dispatcher, lazy: bool = True) -> Tuple[List[LazyRouter], List[str]]:
+    """Incluye los routers en ``dp``.
+
+    Devuelve los routers diferidos (para precargarlos más tarde) y los módulos
+    que no se pudieron importar, que se omiten para no tumbar el arranque.
+    """
+    lazy_routers = _lazy_routers() if lazy else {}
+    registered: List[LazyRouter] = []
+    skipped: List[str] = []
+    for module_name in HANDLER_MODULES:
+        if module_name in lazy_routers:
+            dp.include_router(lazy_routers[module_name])
+            registered.append(lazy_routers[module_name])
+            continue
+        try:
+            module = importlib.import_module(module_name)
+        except Exception as e:
+            logger.exception(f"No se pudo importar {module_name}")
+            skipped.append(f"{module_name} ({type(e).__name__}: {e})")
+            continue
+        for name, value in vars(module).items():
+            if name.endswith("router") and value.parent_router is None:
+                dp.include_router(value)
+    return registered, skipped
+
+
+def preload_lazy_routers(routers: List[LazyRouter]) -> None:
+    """Carga los routers diferidos que aún no se hayan usado."""
+    for router in routers:
+        if router.loaded:
+            continue
+        try:
+            router.load()
+        except Exception:
+            logger.exception(f"No se pudo cargar {router.module_path}")
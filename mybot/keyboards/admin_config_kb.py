@@ -24,11 +24,10 @@ def get_channel_type_kb():
 
 def get_scheduler_config_kb():
     builder = InlineKeyboardBuilder()
-    builder.button(text="⏲ Canal General", callback_data="set_channel_interval")
     builder.button(text="⏲ Canal VIP", callback_data="set_vip_interval")
     builder.button(text="▶️ Ejecutar Ahora", callback_data="run_schedulers_now")
     builder.button(text="↩️ Volver", callback_data="admin_config")
-    builder.adjust(2, 1, 1)
+    builder.adjust(1, 1, 1)
     return builder.as_markup()
 
 
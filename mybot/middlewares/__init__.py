@@ -1,7 +1,13 @@
+from .db_middleware import DBSessionMiddleware
+from .metrics_middleware import MetricsMiddleware, TelegramRequestMetrics, setup_metrics
 from .points_middleware import PointsMiddleware
 from .user_middleware import UserRegistrationMiddleware
 
 __all__ = [
+    "DBSessionMiddleware",
+    "MetricsMiddleware",
+    "TelegramRequestMetrics",
+    "setup_metrics",
     "PointsMiddleware",
     "UserRegistrationMiddleware",
 ]
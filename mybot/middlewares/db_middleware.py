@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict
+
+from aiogram import BaseMiddleware
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+class DBSessionMiddleware(BaseMiddleware):
+    """Abre una sesión de base de datos por update y la expone como ``session``."""
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession]):
+        self.session_factory = session_factory
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Any],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with self.session_factory() as session:
+            data["session"] = session
+            return await handler(event, data)
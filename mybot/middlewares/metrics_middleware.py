@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import Update
+
+from services.metrics import current_update_scope, finish_update_scope, record_telegram_call, start_update_scope
+
+logger = logging.getLogger(__name__)
+
+
+def _handler_name(handler) -> str:
+    callback = getattr(handler, "callback", handler)
+    module = getattr(callback, "__module__", "") or ""
+    name = getattr(callback, "__qualname__", None) or type(callback).__name__
+    return f"{module.rsplit('.', 1)[-1]}.{name}" if module else name
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Mide cada update: latencia, sentencias SQL y llamadas a Telegram.
+
+    Como middleware externo de ``dp.update`` abre el ámbito del update; como
+    middleware interno de un observador solo anota qué handler lo atendió.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Any],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            scope = current_update_scope()
+            if scope is not None and "handler" in data:
+                scope["handler"] = _handler_name(data["handler"])
+            return await handler(event, data)
+
+        token = start_update_scope(event.update_id)
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await handler(event, data)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            scope = finish_update_scope(token, event.event_type, elapsed, failed)
+            logger.debug(
+                "Update %s (%s) %s: %.1f ms, %s SQL (%.1f ms), %s Telegram calls",
+                event.update_id,
+                event.event_type,
+                scope["handler"],
+                elapsed * 1000,
+                scope["db_statements"],
+                scope["db_seconds"] * 1000,
+                scope["telegram_calls"],
+            )
+
+
+class TelegramRequestMetrics(BaseRequestMiddleware):
+    """Cuenta las llamadas salientes a la API de Telegram."""
+
+    async def __call__(self, make_request, bot: Bot, method):
+        record_telegram_call(type(method).__name__)
+        return await make_request(bot, method)
+
+
+def setup_metrics(dp: Dispatcher, bot: Bot | None = None) -> MetricsMiddleware:
+    """Registra la medición en el dispatcher (y en la sesión HTTP del bot)."""
+    middleware = MetricsMiddleware()
+    dp.update.outer_middleware(middleware)
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(middleware)
+    if bot is not None:
+        bot.session.middleware(TelegramRequestMetrics())
+    return middleware
@@ -14,8 +14,13 @@ from .raffle_service import RaffleService
 from .message_service import MessageService
 from .auction_service import AuctionService
 from .user_service import UserService
+from .user_search import UserSearchService
 from .lore_piece_service import LorePieceService
-from .scheduler import channel_request_scheduler, vip_subscription_scheduler, vip_membership_scheduler
+from .lore_unlock_service import LoreUnlockService
+from .vip_expiry_service import VipExpiryService
+from .job_runtime import Job, JobRuntime, get_job_runtime
+from .scheduler import register_scheduler_jobs
+from .narrative_watcher import NarrativeWatcher, narrative_watcher
 
 __all__ = [
     "AchievementService",
@@ -31,13 +36,19 @@ __all__ = [
     "ConfigService",
     "SubscriptionPlanService",
     "ChannelService",
-    "channel_request_scheduler",
-    "vip_subscription_scheduler",
-    "vip_membership_scheduler",
+    "Job",
+    "JobRuntime",
+    "get_job_runtime",
+    "register_scheduler_jobs",
+    "NarrativeWatcher",
+    "narrative_watcher",
     "EventService",
     "RaffleService",
     "MessageService",
     "AuctionService",
     "UserService",
+    "UserSearchService",
     "LorePieceService",
+    "LoreUnlockService",
+    "VipExpiryService",
 ]
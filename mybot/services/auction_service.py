@@ -2,11 +2,13 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from aiogram import Bot
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, func, and_, or_, event
+from sqlalchemy.orm import Bundle
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.models import (
@@ -18,9 +20,38 @@ from database.models import (
 )
 from utils.text_utils import anonymize_username, format_points, format_time_remaining
 from services.point_service import PointService
+from services.cluster import publish, subscribe
 
 logger = logging.getLogger(__name__)
 
+# Las subastas en vivo se refrescan a la vez por muchos espectadores: la parte
+# común de la vista se comparte unos segundos y se invalida en cada cambio.
+SNAPSHOT_TTL = 5
+# auction_id -> (datos, instante de expiración)
+_SNAPSHOTS: Dict[int, Tuple[dict, float]] = {}
+
+
+def invalidate_auction_snapshot(auction_id: int) -> None:
+    _SNAPSHOTS.pop(auction_id, None)
+
+
+@event.listens_for(Auction, "after_update")
+@event.listens_for(Auction, "after_delete")
+def _on_auction_changed(mapper, connection, target) -> None:
+    invalidate_auction_snapshot(target.id)
+    publish("auction_snapshot", target.id)
+
+
+@event.listens_for(Bid, "after_insert")
+@event.listens_for(AuctionParticipant, "after_insert")
+@event.listens_for(AuctionParticipant, "after_delete")
+def _on_auction_activity(mapper, connection, target) -> None:
+    invalidate_auction_snapshot(target.auction_id)
+    publish("auction_snapshot", target.auction_id)
+
+
+subscribe("auction_snapshot", invalidate_auction_snapshot)
+
 
 class AuctionService:
     def __init__(self, session: AsyncSession):
@@ -236,50 +267,85 @@ class AuctionService:
 
     async def get_auction_details(self, auction_id: int, viewer_user_id: int) -> Optional[dict]:
         """Get detailed auction information with anonymized participant data."""
-        auction = await self.session.get(Auction, auction_id)
-        if not auction:
+        snapshot = await self._get_snapshot(auction_id)
+        if not snapshot:
             return None
-        
-        # Get highest bidder info (anonymized)
-        highest_bidder = None
-        if auction.highest_bidder_id:
-            highest_bidder = await self.session.get(User, auction.highest_bidder_id)
-        
-        # Get recent bids (last 5)
-        stmt = select(Bid).where(Bid.auction_id == auction_id).order_by(Bid.timestamp.desc()).limit(5)
-        result = await self.session.execute(stmt)
-        recent_bids = result.scalars().all()
-        
-        # Get participant count
-        participant_count = await self._get_participant_count(auction_id)
-        
-        # Check if viewer is participating
-        is_participating = await self._is_participant(auction_id, viewer_user_id)
-        
-        # Get viewer's highest bid
-        viewer_highest_bid = await self._get_user_highest_bid(auction_id, viewer_user_id)
-        
+
+        auction = snapshot['auction']
+        highest_bidder = snapshot['highest_bidder']
         return {
             'auction': auction,
             'highest_bidder_display': anonymize_username(highest_bidder, viewer_user_id) if highest_bidder else None,
             'recent_bids': [
                 {
-                    'amount': bid.amount,
-                    'timestamp': bid.timestamp,
-                    'bidder_display': anonymize_username(
-                        await self.session.get(User, bid.user_id), 
-                        viewer_user_id
-                    )
+                    'amount': amount,
+                    'timestamp': timestamp,
+                    'bidder_display': anonymize_username(bidder, viewer_user_id),
                 }
-                for bid in recent_bids
+                for amount, timestamp, bidder in snapshot['recent_bids']
             ],
-            'participant_count': participant_count,
-            'is_participating': is_participating,
-            'viewer_highest_bid': viewer_highest_bid,
+            'participant_count': len(snapshot['bids_by_user']),
+            'is_participating': viewer_user_id in snapshot['bids_by_user'],
+            'viewer_highest_bid': snapshot['bids_by_user'].get(viewer_user_id),
             'time_remaining': format_time_remaining(auction.end_time),
             'min_next_bid': max(auction.initial_price, auction.current_highest_bid + auction.min_bid_increment)
         }
 
+    async def _get_snapshot(self, auction_id: int) -> Optional[dict]:
+        """Datos de la subasta comunes a todos los espectadores, en caché unos segundos."""
+        cached = _SNAPSHOTS.get(auction_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+        bidder = Bundle("bidder", User.id, User.username, User.first_name, User.last_name)
+        row = (
+            await self.session.execute(
+                select(Auction, bidder)
+                .outerjoin(User, User.id == Auction.highest_bidder_id)
+                .where(Auction.id == auction_id)
+            )
+        ).first()
+        if not row:
+            return None
+        auction, highest_bidder = row
+
+        bid_bidder = Bundle("bidder", User.id, User.username, User.first_name, User.last_name)
+        recent_bids = (
+            await self.session.execute(
+                select(Bid.amount, Bid.timestamp, bid_bidder)
+                .outerjoin(User, User.id == Bid.user_id)
+                .where(Bid.auction_id == auction_id)
+                .order_by(Bid.timestamp.desc(), Bid.id.desc())
+                .limit(5)
+            )
+        ).all()
+
+        # Participantes con su puja más alta (None si aún no pujaron)
+        participants = (
+            await self.session.execute(
+                select(AuctionParticipant.user_id, func.max(Bid.amount))
+                .outerjoin(
+                    Bid,
+                    and_(Bid.auction_id == AuctionParticipant.auction_id, Bid.user_id == AuctionParticipant.user_id),
+                )
+                .where(AuctionParticipant.auction_id == auction_id)
+                .group_by(AuctionParticipant.user_id)
+            )
+        ).all()
+
+        snapshot = {
+            # Copia sin sesión: la instancia original puede expirar si su sesión hace rollback
+            'auction': Auction(**{column.key: getattr(auction, column.key) for column in Auction.__table__.columns}),
+            'highest_bidder': highest_bidder if highest_bidder.id is not None else None,
+            'recent_bids': [
+                (amount, timestamp, bid_user if bid_user.id is not None else None)
+                for amount, timestamp, bid_user in recent_bids
+            ],
+            'bids_by_user': {user_id: highest for user_id, highest in participants},
+        }
+        _SNAPSHOTS[auction_id] = (snapshot, time.monotonic() + SNAPSHOT_TTL)
+        return snapshot
+
     async def get_user_auctions(self, user_id: int, include_ended: bool = False) -> List[Auction]:
         """Get auctions where user has participated."""
         stmt = select(Auction).join(AuctionParticipant).where(
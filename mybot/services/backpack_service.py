@@ -0,0 +1,161 @@
+"""
+Consultas de la mochila narrativa.
+El resumen por usuario (conteo por categoría y pistas recientes) sale de una
+sola consulta agregada y se guarda en una caché pequeña que se invalida al
+insertar un ``UserLorePiece``. Los listados proyectan solo las columnas que
+se muestran (sin ``content``) y se paginan por cursor.
+"""
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, event, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import LorePiece, UserLorePiece
+from services.cluster import publish, subscribe
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATEGORY = 'fragmentos'
+RECENT_HOURS = 24
+SUMMARY_TTL = 300  # segundos; acota el desfase del contador de recientes
+SUMMARY_CACHE_SIZE = 1024
+PAGE_SIZE = 10
+_CURSOR_FORMAT = "%Y%m%d%H%M%S%f"
+
+# user_id -> (resumen, instante de expiración)
+_SUMMARY_CACHE: "OrderedDict[int, Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+
+def invalidate_backpack_cache(user_id: int) -> None:
+    _SUMMARY_CACHE.pop(user_id, None)
+
+
+@event.listens_for(UserLorePiece, "after_insert")
+def _on_lore_piece_unlocked(mapper, connection, target) -> None:
+    invalidate_backpack_cache(target.user_id)
+    publish("backpack_summary", target.user_id)
+
+
+subscribe("backpack_summary", invalidate_backpack_cache)
+
+
+def encode_cursor(unlocked_at: Optional[datetime], lore_piece_id: int) -> str:
+    stamp = unlocked_at.strftime(_CURSOR_FORMAT) if unlocked_at else "0"
+    return f"{stamp}.{lore_piece_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    stamp, lore_piece_id = cursor.split(".")
+    unlocked_at = None if stamp == "0" else datetime.strptime(stamp, _CURSOR_FORMAT)
+    return unlocked_at, int(lore_piece_id)
+
+
+class BackpackService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_summary(self, user_id: int) -> Dict[str, Any]:
+        """Conteo por categoría, total y pistas desbloqueadas en las últimas 24h."""
+        cached = _SUMMARY_CACHE.get(user_id)
+        if cached and cached[1] > time.monotonic():
+            _SUMMARY_CACHE.move_to_end(user_id)
+            return cached[0]
+
+        recent_since = datetime.now() - timedelta(hours=RECENT_HOURS)
+        category = func.coalesce(LorePiece.category, DEFAULT_CATEGORY)
+        stmt = (
+            select(
+                category,
+                func.count(),
+                func.sum(case((UserLorePiece.unlocked_at >= recent_since, 1), else_=0)),
+            )
+            .select_from(UserLorePiece)
+            .join(LorePiece, LorePiece.id == UserLorePiece.lore_piece_id)
+            .where(UserLorePiece.user_id == user_id)
+            .group_by(category)
+        )
+        rows = (await self.session.execute(stmt)).all()
+
+        summary = {
+            "categories": {name: count for name, count, _ in rows},
+            "total": sum(count for _, count, _ in rows),
+            "recent": sum(recent or 0 for _, _, recent in rows),
+        }
+        _SUMMARY_CACHE[user_id] = (summary, time.monotonic() + SUMMARY_TTL)
+        _SUMMARY_CACHE.move_to_end(user_id)
+        while len(_SUMMARY_CACHE) > SUMMARY_CACHE_SIZE:
+            _SUMMARY_CACHE.popitem(last=False)
+        return summary
+
+    async def list_category(
+        self,
+        user_id: int,
+        category: str,
+        *,
+        after: Optional[str] = None,
+        limit: int = PAGE_SIZE,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Página de pistas de una categoría, de la más reciente a la más antigua.
+
+        Devuelve las filas y el cursor de la página siguiente (``None`` si no hay más).
+        """
+        stmt = (
+            select(
+                LorePiece.id,
+                LorePiece.title,
+                LorePiece.code_name,
+                UserLorePiece.unlocked_at,
+                UserLorePiece.context,
+            )
+            .join(UserLorePiece, LorePiece.id == UserLorePiece.lore_piece_id)
+            .where(UserLorePiece.user_id == user_id)
+        )
+        if category == DEFAULT_CATEGORY:
+            stmt = stmt.where(or_(LorePiece.category == category, LorePiece.category.is_(None)))
+        else:
+            stmt = stmt.where(LorePiece.category == category)
+
+        if after:
+            unlocked_at, lore_piece_id = decode_cursor(after)
+            if unlocked_at is None:
+                stmt = stmt.where(
+                    UserLorePiece.unlocked_at.is_(None), UserLorePiece.lore_piece_id < lore_piece_id
+                )
+            else:
+                stmt = stmt.where(
+                    or_(
+                        UserLorePiece.unlocked_at < unlocked_at,
+                        UserLorePiece.unlocked_at.is_(None),
+                        and_(
+                            UserLorePiece.unlocked_at == unlocked_at,
+                            UserLorePiece.lore_piece_id < lore_piece_id,
+                        ),
+                    )
+                )
+
+        stmt = stmt.order_by(
+            UserLorePiece.unlocked_at.is_(None),
+            UserLorePiece.unlocked_at.desc(),
+            UserLorePiece.lore_piece_id.desc(),
+        ).limit(limit + 1)
+        rows = (await self.session.execute(stmt)).all()
+
+        items = [
+            {
+                "id": piece_id,
+                "title": title,
+                "code_name": code_name,
+                "unlocked_at": unlocked_at,
+                "context": context,
+            }
+            for piece_id, title, code_name, unlocked_at, context in rows[:limit]
+        ]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last["unlocked_at"], last["id"])
+        return items, next_cursor
@@ -0,0 +1,107 @@
+"""
+Estado del proceso en modo multiproceso (``BOT_WORKERS`` > 1).
+Las actualizaciones se reparten por ``user_id % workers``, así que todas las de
+un usuario llegan al mismo worker. Las cachés en memoria y los plazos viven en
+cada proceso: cuando un worker cambia algo que otros tienen en caché lo publica
+en el bus (``publish``) y el supervisor lo reenvía a los demás, que llaman al
+manejador suscrito para ese tema (``subscribe``). Los plazos (aprobaciones del
+canal gratuito, vencimientos VIP) los atiende solo el worker planificador:
+``forward_to_scheduler`` le envía los que se programan en otro worker.
+
+Con un solo proceso ``publish`` no hace nada y todo queda como antes.
+"""
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+# Worker que ejecuta las tareas programadas y guarda los plazos
+SCHEDULER_WORKER = 0
+
+_STATE: Dict[str, Any] = {"index": 0, "workers": 1, "bus": None}
+# tema -> manejador local
+_HANDLERS: Dict[str, Callable[..., Any]] = {}
+
+
+def configure_worker(index: int, workers: int, bus) -> None:
+    """Lo llama cada worker al arrancar; ``bus`` es la cola hacia el supervisor."""
+    _STATE.update(index=index, workers=workers, bus=bus)
+
+
+def is_clustered() -> bool:
+    return _STATE["bus"] is not None
+
+
+def worker_index() -> int:
+    return _STATE["index"]
+
+
+def worker_count() -> int:
+    return _STATE["workers"]
+
+
+def is_scheduler_worker() -> bool:
+    return not is_clustered() or _STATE["index"] == SCHEDULER_WORKER
+
+
+def update_user_id(update: Update) -> int:
+    """Usuario que origina la actualización (o el chat si no hay usuario)."""
+    try:
+        event = update.event
+    except Exception:
+        return 0
+    user = getattr(event, "from_user", None) or getattr(event, "user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(event, "chat", None) or getattr(event, "actor_chat", None)
+    return chat.id if chat is not None else 0
+
+
+def shard_for(user_id: int, workers: int) -> int:
+    return user_id % workers
+
+
+def subscribe(topic: str, handler: Callable[..., Any]) -> None:
+    """Registra el manejador de ``topic``; uno nuevo reemplaza al anterior.
+
+    Un módulo importado dos veces con nombres distintos (``services.x`` y
+    ``mybot.services.x``, como hacen los scripts) se suscribe dos veces.
+    """
+    if topic in _HANDLERS:
+        logger.debug(f"Replacing cluster handler for {topic}")
+    _HANDLERS[topic] = handler
+
+
+def publish(topic: str, *args: Any, target: Optional[int] = None) -> None:
+    """Envía ``args`` al resto de workers (o solo a ``target``); sin bus no hace nada.
+
+    No bloquea: la cola hacia el supervisor no tiene límite, así que se puede
+    llamar desde eventos del mapper o código síncrono.
+    """
+    bus = _STATE["bus"]
+    if bus is None:
+        return
+    bus.put((topic, args, _STATE["index"], target))
+
+
+def forward_to_scheduler(topic: str, *args: Any) -> bool:
+    """Reenvía al worker planificador; False si este proceso ya lo es."""
+    if is_scheduler_worker():
+        return False
+    publish(topic, *args, target=SCHEDULER_WORKER)
+    return True
+
+
+def handle_message(topic: str, args: tuple) -> None:
+    """Ejecuta en este worker un mensaje recibido del bus."""
+    handler = _HANDLERS.get(topic)
+    if handler is None:
+        # El módulo que lo maneja no está cargado en este worker: no hay nada que invalidar
+        logger.debug(f"Cluster message without handler: {topic}")
+        return
+    try:
+        handler(*args)
+    except Exception:
+        logger.exception(f"Error handling cluster message {topic}")
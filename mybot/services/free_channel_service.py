@@ -4,6 +4,7 @@ Incluye aprobación automática, envío de mensajes y protección de contenido.
 """
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 from aiogram import Bot
@@ -17,17 +18,82 @@ from aiogram.types import (
     InputMediaDocument,
     InputMediaAudio
 )
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update
 
 from database.models import PendingChannelRequest, User, BotConfig
 from services.config_service import ConfigService
+from services.join_deadlines import schedule_join_approval
 from services.message_registry import store_message
+from services.retention_service import RetentionService, get_policy
+from utils.rate_limiter import TELEGRAM_LIMITER
 from utils.text_utils import sanitize_text
 
 logger = logging.getLogger(__name__)
 
+APPROVAL_CONCURRENCY = 8
+APPROVAL_COMMIT_BATCH = 25
+
+WELCOME_MESSAGE = (
+    f"🎉 **¡Bienvenido al Canal Gratuito!**\n\n"
+    f"Tu solicitud ha sido aprobada exitosamente.\n"
+    f"Ya puedes acceder a todo el contenido gratuito.\n\n"
+    f"¡Disfruta de la experiencia!"
+)
+
+_APPROVAL_METRICS: Dict[str, Any] = {
+    "approved_total": 0,
+    "already_resolved_total": 0,
+    "failed_total": 0,
+    "welcome_sent_total": 0,
+    "welcome_failed_total": 0,
+    "last_run_requests": 0,
+    "last_run_approved": 0,
+    "last_run_seconds": 0.0,
+    "last_run_per_second": 0.0,
+}
+
+_WELCOME_QUEUE: Optional[asyncio.Queue] = None
+_WELCOME_TASK: Optional[asyncio.Task] = None
+
+
+def get_approval_metrics() -> Dict[str, Any]:
+    """Contadores del flujo de aprobación y tamaño de la cola de bienvenidas."""
+    metrics = dict(_APPROVAL_METRICS)
+    metrics["welcome_backlog"] = _WELCOME_QUEUE.qsize() if _WELCOME_QUEUE else 0
+    return metrics
+
+
+def queue_welcome_message(bot: Bot, user_id: int) -> None:
+    """Encola la bienvenida; arranca el despachador si no está activo."""
+    global _WELCOME_QUEUE, _WELCOME_TASK
+    if _WELCOME_QUEUE is None:
+        _WELCOME_QUEUE = asyncio.Queue()
+    _WELCOME_QUEUE.put_nowait((bot, user_id))
+    if _WELCOME_TASK is None or _WELCOME_TASK.done():
+        _WELCOME_TASK = asyncio.create_task(_welcome_worker(_WELCOME_QUEUE))
+
+
+async def _welcome_worker(queue: asyncio.Queue) -> None:
+    while True:
+        bot, user_id = await queue.get()
+        try:
+            await TELEGRAM_LIMITER.acquire()
+            try:
+                await bot.send_message(user_id, WELCOME_MESSAGE, parse_mode="Markdown")
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                await bot.send_message(user_id, WELCOME_MESSAGE, parse_mode="Markdown")
+            _APPROVAL_METRICS["welcome_sent_total"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _APPROVAL_METRICS["welcome_failed_total"] += 1
+            logger.warning(f"Could not send welcome message to user {user_id}: {e}")
+        finally:
+            queue.task_done()
+
 
 class FreeChannelService:
     """
@@ -113,6 +179,10 @@ class FreeChannelService:
             
             # Notificar al usuario sobre el tiempo de espera
             wait_minutes = await self.get_wait_time_minutes()
+            schedule_join_approval(
+                pending_request.id,
+                pending_request.request_timestamp + timedelta(minutes=wait_minutes),
+            )
             
             if wait_minutes > 0:
                 wait_text = f"{wait_minutes} minutos"
@@ -158,69 +228,102 @@ class FreeChannelService:
     async def process_pending_requests(self) -> int:
         """
         Procesar solicitudes pendientes que han cumplido el tiempo de espera.
+        Las aprobaciones se hacen en paralelo (acotado y con límite de ritmo),
+        se confirman en la BD por lotes pequeños y las bienvenidas se encolan.
         Retorna el número de solicitudes procesadas.
         """
         wait_minutes = await self.get_wait_time_minutes()
         threshold_time = datetime.utcnow() - timedelta(minutes=wait_minutes)
         
         # Obtener solicitudes que han cumplido el tiempo de espera
-        stmt = select(PendingChannelRequest).where(
+        stmt = select(
+            PendingChannelRequest.id,
+            PendingChannelRequest.user_id,
+            PendingChannelRequest.chat_id,
+        ).where(
             PendingChannelRequest.approved == False,
             PendingChannelRequest.request_timestamp <= threshold_time
         )
         
         result = await self.session.execute(stmt)
-        pending_requests = result.scalars().all()
-        
+        return await self.approve_requests(result.all())
+
+    async def approve_requests(self, requests: List[Any]) -> int:
+        """Aprobar ``(id, user_id, chat_id)`` en Telegram y marcarlas como aprobadas."""
+        if not requests:
+            return 0
+
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(APPROVAL_CONCURRENCY)
+        # La sesión no admite uso concurrente: las escrituras van serializadas
+        db_lock = asyncio.Lock()
+        done: List[Any] = []
         processed_count = 0
-        
-        for request in pending_requests:
-            try:
-                # Aprobar la solicitud en Telegram
-                await self.bot.approve_chat_join_request(
-                    request.chat_id, 
-                    request.user_id
-                )
-                
-                # Marcar como aprobada en la base de datos
-                request.approved = True
-                
-                # Enviar mensaje de bienvenida
-                welcome_message = (
-                    f"🎉 **¡Bienvenido al Canal Gratuito!**\n\n"
-                    f"Tu solicitud ha sido aprobada exitosamente.\n"
-                    f"Ya puedes acceder a todo el contenido gratuito.\n\n"
-                    f"¡Disfruta de la experiencia!"
-                )
-                
-                try:
-                    await self.bot.send_message(
-                        request.user_id,
-                        welcome_message,
-                        parse_mode="Markdown"
-                    )
-                except Exception as e:
-                    logger.warning(f"Could not send welcome message to user {request.user_id}: {e}")
-                
-                processed_count += 1
-                logger.info(f"Approved join request for user {request.user_id} in channel {request.chat_id}")
-                
-            except TelegramBadRequest as e:
-                if "USER_ALREADY_PARTICIPANT" in str(e):
-                    # Usuario ya está en el canal, marcar como aprobado
-                    request.approved = True
-                    processed_count += 1
-                    logger.info(f"User {request.user_id} already in channel {request.chat_id}")
-                else:
-                    logger.error(f"Error approving join request for user {request.user_id}: {e}")
-            except Exception as e:
-                logger.error(f"Error processing join request for user {request.user_id}: {e}")
-        
-        if processed_count > 0:
+
+        async def flush() -> None:
+            nonlocal processed_count
+            batch = done[:]
+            done.clear()
+            if not batch:
+                return
+            await self.session.execute(
+                update(PendingChannelRequest)
+                .where(PendingChannelRequest.id.in_([request_id for request_id, _, _ in batch]))
+                .values(approved=True)
+            )
             await self.session.commit()
-            logger.info(f"Processed {processed_count} pending join requests")
-        
+            processed_count += len(batch)
+            for _, user_id, welcome in batch:
+                if welcome:
+                    queue_welcome_message(self.bot, user_id)
+
+        async def approve(request) -> None:
+            async with semaphore:
+                welcome = await self._approve_one(request)
+            if welcome is None:
+                return
+            async with db_lock:
+                done.append((request.id, request.user_id, welcome))
+                if len(done) >= APPROVAL_COMMIT_BATCH:
+                    await flush()
+
+        await asyncio.gather(*(approve(request) for request in requests))
+        async with db_lock:
+            await flush()
+
+        elapsed = time.monotonic() - started
+        _APPROVAL_METRICS["last_run_requests"] = len(requests)
+        _APPROVAL_METRICS["last_run_approved"] = processed_count
+        _APPROVAL_METRICS["last_run_seconds"] = round(elapsed, 3)
+        _APPROVAL_METRICS["last_run_per_second"] = round(processed_count / elapsed, 2) if elapsed else 0.0
+        if processed_count > 0:
+            logger.info(f"Processed {processed_count} pending join requests in {elapsed:.1f}s")
         return processed_count
+
+    async def _approve_one(self, request) -> Optional[bool]:
+        """Aprueba una solicitud. Devuelve si procede dar la bienvenida, o None si falló."""
+        try:
+            await TELEGRAM_LIMITER.acquire()
+            try:
+                await self.bot.approve_chat_join_request(request.chat_id, request.user_id)
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                await self.bot.approve_chat_join_request(request.chat_id, request.user_id)
+            _APPROVAL_METRICS["approved_total"] += 1
+            logger.info(f"Approved join request for user {request.user_id} in channel {request.chat_id}")
+            return True
+        except TelegramBadRequest as e:
+            # Reintentos idempotentes: la solicitud ya se resolvió en una ejecución anterior
+            if "USER_ALREADY_PARTICIPANT" in str(e) or "HIDE_REQUESTER_MISSING" in str(e):
+                _APPROVAL_METRICS["already_resolved_total"] += 1
+                logger.info(f"User {request.user_id} already in channel {request.chat_id}")
+                return False
+            _APPROVAL_METRICS["failed_total"] += 1
+            logger.error(f"Error approving join request for user {request.user_id}: {e}")
+        except Exception as e:
+            _APPROVAL_METRICS["failed_total"] += 1
+            logger.error(f"Error processing join request for user {request.user_id}: {e}")
+        return None
     
     async def create_invite_link(
         self, 
@@ -418,27 +521,15 @@ class FreeChannelService:
     
     async def cleanup_old_requests(self, days_old: int = 30) -> int:
         """
-        Limpiar solicitudes antiguas de la base de datos.
+        Limpiar solicitudes antiguas de la base de datos (borrado por lotes).
         Retorna el número de solicitudes eliminadas.
         """
-        cutoff_date = datetime.utcnow() - timedelta(days=days_old)
-        
         try:
-            # Obtener solicitudes antiguas
-            old_requests_stmt = select(PendingChannelRequest).where(
-                PendingChannelRequest.request_timestamp < cutoff_date
+            deleted = await RetentionService(self.session).purge(
+                get_policy("pending_channel_requests"), days=days_old
             )
-            result = await self.session.execute(old_requests_stmt)
-            old_requests = result.scalars().all()
-            
-            # Eliminar solicitudes antiguas
-            for request in old_requests:
-                await self.session.delete(request)
-            
-            await self.session.commit()
-            
-            logger.info(f"Cleaned up {len(old_requests)} old channel requests")
-            return len(old_requests)
+            logger.info(f"Cleaned up {deleted} old channel requests")
+            return deleted
             
         except Exception as e:
             logger.error(f"Error cleaning up old requests: {e}")
@@ -0,0 +1,149 @@
+"""
+Búsqueda indexada de combinaciones de pistas.
+Cada combinación se identifica por una clave canónica (códigos ordenados y sin
+duplicados) con índice único en BD. En memoria se mantiene un diccionario
+clave -> combinación y un índice invertido código -> combinaciones, de modo que
+comprobar un intento es una sola búsqueda O(1).
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.hint_combination import HintCombination
+from services.cluster import publish, subscribe
+
+logger = logging.getLogger(__name__)
+
+# Caché de proceso: clave canónica -> combinación (desligada de la sesión)
+_COMBINATIONS: Dict[str, HintCombination] = {}
+# Índice invertido: código de pista -> claves canónicas que lo requieren
+_HINT_INDEX: Dict[str, Set[str]] = {}
+_LOADED = False
+
+
+def split_hint_codes(codes: Iterable[str] | str) -> List[str]:
+    if isinstance(codes, str):
+        codes = codes.split(",")
+    return [code.strip() for code in codes if code and code.strip()]
+
+
+def canonical_hint_key(codes: Iterable[str] | str) -> str:
+    """Códigos ordenados, sin duplicados y unidos por comas."""
+    return ",".join(sorted(set(split_hint_codes(codes))))
+
+
+def _index_combination(combination: HintCombination) -> None:
+    key = combination.canonical_key
+    _COMBINATIONS[key] = combination
+    for code in key.split(","):
+        _HINT_INDEX.setdefault(code, set()).add(key)
+
+
+def invalidate_hint_combinations() -> None:
+    """Fuerza la recarga de la caché en el próximo acceso."""
+    global _LOADED
+    _COMBINATIONS.clear()
+    _HINT_INDEX.clear()
+    _LOADED = False
+
+
+subscribe("hint_combinations", invalidate_hint_combinations)
+
+
+class HintCombinationService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _ensure_cache(self) -> None:
+        global _LOADED
+        if _LOADED:
+            return
+        result = await self.session.execute(select(HintCombination))
+        combinations = result.scalars().all()
+
+        # Claves ya guardadas: una fila vieja no puede tomar la de otra (índice único)
+        taken = {c.canonical_key: c for c in combinations if c.canonical_key}
+        backfilled = False
+        for combination in combinations:
+            key = canonical_hint_key(combination.required_hints)
+            if combination.canonical_key != key:
+                owner = taken.get(key) or _COMBINATIONS.get(key)
+                if owner is not None and owner is not combination:
+                    logger.warning(
+                        f"Combinación {combination.combination_code} duplica los requisitos de "
+                        f"{owner.combination_code}; se ignora"
+                    )
+                    continue
+                # Filas anteriores a la clave canónica
+                if combination.canonical_key:
+                    taken.pop(combination.canonical_key, None)
+                combination.canonical_key = key
+                taken[key] = combination
+                backfilled = True
+            _index_combination(combination)
+        if backfilled:
+            await self.session.commit()
+            for combination in _COMBINATIONS.values():
+                await self.session.refresh(combination)
+        for combination in combinations:
+            self.session.expunge(combination)
+        _LOADED = True
+        logger.info(f"Caché de combinaciones cargada: {len(_COMBINATIONS)}")
+
+    async def find_combination(self, codes: Iterable[str] | str) -> Optional[HintCombination]:
+        """Devuelve la combinación que coincide exactamente con ``codes``."""
+        await self._ensure_cache()
+        return _COMBINATIONS.get(canonical_hint_key(codes))
+
+    async def get_combinations_for_hint(self, code: str) -> List[HintCombination]:
+        await self._ensure_cache()
+        return [_COMBINATIONS[key] for key in _HINT_INDEX.get(code, ())]
+
+    async def get_near_completions(
+        self, owned_codes: Iterable[str], *, max_missing: int = 1
+    ) -> List[Dict[str, object]]:
+        """Combinaciones a las que les faltan como mucho ``max_missing`` pistas.
+
+        Recorre solo las combinaciones que comparten algún código con las
+        pistas del usuario (índice invertido), ordenadas por pistas faltantes.
+        """
+        await self._ensure_cache()
+        owned = set(owned_codes)
+        matched: Dict[str, int] = {}
+        for code in owned:
+            for key in _HINT_INDEX.get(code, ()):
+                matched[key] = matched.get(key, 0) + 1
+
+        near = []
+        for key, count in matched.items():
+            required = key.split(",")
+            missing = len(required) - count
+            if missing <= max_missing:
+                near.append({
+                    "combination": _COMBINATIONS[key],
+                    "missing": [code for code in required if code not in owned],
+                })
+        near.sort(key=lambda item: len(item["missing"]))
+        return near
+
+    async def create_combination(
+        self, combination_code: str, required_hints: Iterable[str] | str, reward_code: str
+    ) -> HintCombination:
+        await self._ensure_cache()
+        codes = sorted(set(split_hint_codes(required_hints)))
+        combination = HintCombination(
+            combination_code=combination_code,
+            required_hints=",".join(codes),
+            canonical_key=",".join(codes),
+            reward_code=reward_code,
+        )
+        self.session.add(combination)
+        await self.session.commit()
+        await self.session.refresh(combination)
+        self.session.expunge(combination)
+        _index_combination(combination)
+        # Los demás workers recargan su caché en el próximo acceso
+        publish("hint_combinations")
+        return combination
@@ -0,0 +1,340 @@
+"""
+Runtime de tareas programadas.
+Cada trabajo registrado corre en su propia tarea con uno de dos disparadores:
+
+* intervalo: cada ``interval`` segundos más un ``jitter`` aleatorio;
+* plazo: ``next_due()`` devuelve los segundos hasta el próximo plazo (o None)
+  y ``wakeup`` despierta al trabajo cuando llega uno antes.
+
+Un trabajo nunca se solapa consigo mismo, y los que comparten ``group``
+tampoco entre sí. Un fallo no termina el trabajo: se reintenta con espera
+exponencial hasta ``max_backoff``. Las duraciones y resultados van al registro
+de ``services.metrics``. Los trabajos ``leader_only`` solo corren en el proceso
+que tenga el liderazgo (ver ``AlwaysLeader``, ``DatabaseLeaseLeader`` y, en
+modo multiproceso, ``FollowerLeader``).
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database.models import SchedulerLease
+from services.cluster import forward_to_scheduler, subscribe
+from services.metrics import inc_counter, observe_histogram, set_gauge
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE = 5
+MAX_BACKOFF = 600
+
+
+class Job:
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        *,
+        interval: Optional[float] = None,
+        next_due: Optional[Callable[[], Optional[float]]] = None,
+        wakeup: Optional[asyncio.Event] = None,
+        setup: Optional[Callable[[], Awaitable[Any]]] = None,
+        jitter: float = 0,
+        run_at_start: bool = True,
+        leader_only: bool = True,
+        group: Optional[str] = None,
+        max_backoff: float = MAX_BACKOFF,
+    ):
+        if (interval is None) == (next_due is None):
+            raise ValueError("Un trabajo necesita interval o next_due (solo uno)")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_due = next_due
+        self.wakeup = wakeup or asyncio.Event()
+        self.setup = setup
+        self.jitter = jitter
+        self.run_at_start = run_at_start
+        self.leader_only = leader_only
+        self.group = group
+        self.max_backoff = max_backoff
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.last_started: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.next_run: Optional[float] = None
+        self.forced = False
+
+    def _delay(self) -> Optional[float]:
+        """Segundos hasta la próxima ejecución según el disparador."""
+        if self.failures:
+            return min(BACKOFF_BASE * 2 ** (self.failures - 1), self.max_backoff)
+        if self.next_due is not None:
+            return self.next_due()
+        return self.interval + random.uniform(0, self.jitter)
+
+
+class AlwaysLeader:
+    """Un solo proceso: siempre es el líder."""
+
+    def __init__(self):
+        self.changed = asyncio.Event()
+
+    @property
+    def is_leader(self) -> bool:
+        return True
+
+    async def run(self) -> None:
+        return None
+
+
+class FollowerLeader:
+    """Worker que no es el planificador en modo multiproceso: nunca es líder."""
+
+    def __init__(self):
+        self.changed = asyncio.Event()
+
+    @property
+    def is_leader(self) -> bool:
+        return False
+
+    async def run(self) -> None:
+        return None
+
+
+class DatabaseLeaseLeader:
+    """Liderazgo por arrendamiento en la tabla ``scheduler_leases``.
+
+    El líder renueva su arrendamiento cada ``ttl / 3`` segundos; si deja de
+    hacerlo, otro proceso lo toma cuando caduca.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        name: str = "scheduler",
+        ttl: float = 60,
+        holder: Optional[str] = None,
+    ):
+        self.session_factory = session_factory
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+        self.changed = asyncio.Event()
+        self._leader = False
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader
+
+    async def try_acquire(self) -> bool:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now),
+                )
+                .values(holder=self.holder, expires_at=expires_at)
+            )
+            acquired = result.rowcount == 1
+            if not acquired:
+                try:
+                    await session.execute(
+                        insert(SchedulerLease).values(name=self.name, holder=self.holder, expires_at=expires_at)
+                    )
+                    acquired = True
+                except IntegrityError:
+                    await session.rollback()
+                    return False
+            await session.commit()
+        return acquired
+
+    async def run(self) -> None:
+        while True:
+            try:
+                leader = await self.try_acquire()
+            except Exception:
+                logger.exception("Error renewing scheduler lease")
+                leader = False
+            if leader != self._leader:
+                self._leader = leader
+                logger.info(f"Scheduler leadership {'acquired' if leader else 'lost'} by {self.holder}")
+                self.changed.set()
+            await asyncio.sleep(self.ttl / 3)
+
+
+class JobRuntime:
+    def __init__(self, leader=None):
+        self.leader = leader or AlwaysLeader()
+        self.jobs: Dict[str, Job] = {}
+        self._groups: Dict[str, asyncio.Lock] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(self, job: Job) -> Job:
+        if job.name in self.jobs:
+            raise ValueError(f"Ya existe un trabajo llamado {job.name}")
+        self.jobs[job.name] = job
+        if job.group is not None:
+            self._groups.setdefault(job.group, asyncio.Lock())
+        if self._tasks:
+            self._tasks.append(asyncio.create_task(self._job_loop(job), name=f"job:{job.name}"))
+        return job
+
+    def start(self) -> None:
+        self._tasks.append(asyncio.create_task(self.leader.run(), name="job:leader"))
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._job_loop(job), name=f"job:{job.name}"))
+        logger.info(f"Job runtime started with {len(self.jobs)} jobs")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def trigger(self, name: str) -> None:
+        """Ejecuta un trabajo cuanto antes (sin solaparlo con una ejecución en curso)."""
+        job = self.jobs[name]
+        if job.leader_only and forward_to_scheduler("job_trigger", name):
+            return
+        job.forced = True
+        job.next_run = time.monotonic()
+        job.wakeup.set()
+
+    def set_interval(self, name: str, seconds: float) -> None:
+        job = self.jobs[name]
+        if job.interval is None:
+            raise ValueError(f"{name} no es un trabajo de intervalo")
+        if forward_to_scheduler("job_interval", name, seconds):
+            return
+        job.interval = seconds
+        job.next_run = time.monotonic() + seconds
+        job.wakeup.set()
+
+    async def _wait_for_leadership(self) -> None:
+        while not self.leader.is_leader:
+            self.leader.changed.clear()
+            await self.leader.changed.wait()
+
+    async def _run_once(self, job: Job) -> None:
+        lock = self._groups.get(job.group)
+        if lock is not None:
+            await lock.acquire()
+        job.running = True
+        job.last_started = time.time()
+        started = time.perf_counter()
+        try:
+            await job.func()
+            job.failures = 0
+            job.last_error = None
+            outcome = "ok"
+            set_gauge("bot_job_last_success_timestamp_seconds", {"job": job.name}, job.last_started)
+        except Exception as e:
+            job.failures += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            outcome = "error"
+            logger.exception(f"Job {job.name} failed ({job.failures} in a row)")
+        finally:
+            job.running = False
+            if lock is not None:
+                lock.release()
+        job.runs += 1
+        job.last_duration = time.perf_counter() - started
+        observe_histogram("bot_job_duration_seconds", {"job": job.name}, job.last_duration)
+        inc_counter("bot_job_runs_total", {"job": job.name, "outcome": outcome})
+
+    async def _job_loop(self, job: Job) -> None:
+        ready = False
+        job.next_run = time.monotonic() if job.run_at_start else None
+        try:
+            while True:
+                if job.leader_only and not self.leader.is_leader:
+                    ready = False
+                    await self._wait_for_leadership()
+                if not ready and job.setup is not None:
+                    try:
+                        await job.setup()
+                    except Exception:
+                        logger.exception(f"Setup of job {job.name} failed")
+                        await asyncio.sleep(BACKOFF_BASE)
+                        continue
+                ready = True
+
+                job.wakeup.clear()
+                if job.next_run is None:
+                    delay = job._delay()
+                    job.next_run = None if delay is None else time.monotonic() + delay
+                timeout = None if job.next_run is None else job.next_run - time.monotonic()
+                if timeout is None or timeout > 0:
+                    try:
+                        await asyncio.wait_for(job.wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        continue
+                    # Un plazo nuevo puede ser anterior al que se esperaba: recalcular
+                    if job.next_due is not None and not job.failures and not job.forced:
+                        job.next_run = None
+                    continue
+
+                if job.leader_only and not self.leader.is_leader:
+                    continue
+                job.next_run = None
+                job.forced = False
+                await self._run_once(job)
+        except asyncio.CancelledError:
+            logger.info(f"Job {job.name} cancelled")
+            raise
+
+    def status(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "name": job.name,
+                "running": job.running,
+                "runs": job.runs,
+                "failures": job.failures,
+                "last_started": job.last_started,
+                "last_duration": job.last_duration,
+                "last_error": job.last_error,
+                "next_in": None if job.next_run is None else max(job.next_run - now, 0.0),
+                "leader_only": job.leader_only,
+            }
+            for job in self.jobs.values()
+        ]
+
+
+_RUNTIME: Optional[JobRuntime] = None
+
+
+def set_job_runtime(runtime: Optional[JobRuntime]) -> None:
+    global _RUNTIME
+    _RUNTIME = runtime
+
+
+def get_job_runtime() -> Optional[JobRuntime]:
+    return _RUNTIME
+
+
+def _remote_trigger(name: str) -> None:
+    if _RUNTIME is not None and name in _RUNTIME.jobs:
+        _RUNTIME.trigger(name)
+
+
+def _remote_set_interval(name: str, seconds: float) -> None:
+    if _RUNTIME is not None and name in _RUNTIME.jobs:
+        _RUNTIME.set_interval(name, seconds)
+
+
+subscribe("job_trigger", _remote_trigger)
+subscribe("job_interval", _remote_set_interval)
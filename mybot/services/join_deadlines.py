@@ -0,0 +1,103 @@
+"""
+Cola de plazos para aprobar solicitudes al canal gratuito.
+Cada solicitud conoce su hora de aprobación al registrarse
+(``request_timestamp + free_channel_wait_time_minutes``), así que se guarda en
+un montículo en memoria y el planificador duerme exactamente hasta el plazo
+más próximo. El montículo se reconstruye desde la tabla al arrancar y cuando
+cambia el tiempo de espera. En modo multiproceso vive en el worker planificador
+y los demás le reenvían los plazos nuevos.
+"""
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import BotConfig, PendingChannelRequest
+from services.cluster import forward_to_scheduler, subscribe
+
+logger = logging.getLogger(__name__)
+
+# (plazo, id de la solicitud)
+_DEADLINES: List[Tuple[datetime, int]] = []
+_WAKEUP: Optional[asyncio.Event] = None
+_REBUILD = False
+
+
+def get_wakeup_event() -> asyncio.Event:
+    global _WAKEUP
+    if _WAKEUP is None:
+        _WAKEUP = asyncio.Event()
+    return _WAKEUP
+
+
+def schedule_join_approval(request_id: int, deadline: datetime) -> None:
+    """Programa la aprobación; despierta al planificador si es el plazo más próximo."""
+    if forward_to_scheduler("join_deadline", request_id, deadline):
+        return
+    heapq.heappush(_DEADLINES, (deadline, request_id))
+    if _DEADLINES[0][1] == request_id:
+        get_wakeup_event().set()
+
+
+def request_deadline_rebuild() -> None:
+    global _REBUILD
+    if forward_to_scheduler("join_deadline_rebuild"):
+        return
+    _REBUILD = True
+    get_wakeup_event().set()
+
+
+def needs_rebuild() -> bool:
+    return _REBUILD
+
+
+subscribe("join_deadline", schedule_join_approval)
+subscribe("join_deadline_rebuild", request_deadline_rebuild)
+
+
+@event.listens_for(BotConfig, "after_insert")
+@event.listens_for(BotConfig, "after_update")
+def _on_config_updated(mapper, connection, target) -> None:
+    if inspect(target).attrs.free_channel_wait_time_minutes.history.has_changes():
+        request_deadline_rebuild()
+
+
+async def rebuild_join_deadlines(session: AsyncSession) -> int:
+    """Recarga los plazos de todas las solicitudes pendientes."""
+    global _REBUILD
+    _REBUILD = False
+    config = await session.get(BotConfig, 1)
+    wait = timedelta(minutes=(config.free_channel_wait_time_minutes or 0) if config else 0)
+    result = await session.execute(
+        select(PendingChannelRequest.id, PendingChannelRequest.request_timestamp).where(
+            PendingChannelRequest.approved == False
+        )
+    )
+    now = datetime.utcnow()
+    _DEADLINES[:] = [
+        ((request_timestamp or now) + wait, request_id) for request_id, request_timestamp in result.all()
+    ]
+    heapq.heapify(_DEADLINES)
+    get_wakeup_event().set()
+    logger.info(f"Join approval deadlines rebuilt: {len(_DEADLINES)} pending")
+    return len(_DEADLINES)
+
+
+def seconds_until_next() -> Optional[float]:
+    """Segundos hasta el próximo plazo (0 si ya venció), o None si no hay ninguno."""
+    if not _DEADLINES:
+        return None
+    return max(0.0, (_DEADLINES[0][0] - datetime.utcnow()).total_seconds())
+
+
+def pop_due(now: Optional[datetime] = None) -> List[int]:
+    """Extrae los ids de las solicitudes cuyo plazo ya venció."""
+    now = now or datetime.utcnow()
+    due: List[int] = []
+    while _DEADLINES and _DEADLINES[0][0] <= now:
+        due.append(heapq.heappop(_DEADLINES)[1])
+    return list(dict.fromkeys(due))
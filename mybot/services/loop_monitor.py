@@ -0,0 +1,190 @@
+"""
+Monitor del bucle de eventos.
+Una tarea se despierta cada ``TICK_INTERVAL`` segundos y mide cuánto tarda de
+más en hacerlo: ese retraso es el lag del bucle. Un hilo vigilante comprueba
+el último latido de esa tarea; si el bucle lleva bloqueado más del umbral,
+muestrea la pila del hilo del bucle hasta que se libera, y el episodio queda
+registrado con la duración, la tarea que lo causó y las pilas más vistas.
+Cada cierto tiempo se hace inventario de las tareas vivas agrupadas por origen
+(la corrutina que las creó). Todo se vuelca al registro de ``services.metrics``.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Optional
+
+from services.metrics import clear_gauge, inc_counter, observe_histogram, set_gauge
+from utils.config import LOOP_LAG_THRESHOLD_MS
+
+logger = logging.getLogger(__name__)
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TICK_INTERVAL = 0.1
+# Ticks entre inventarios de tareas
+INVENTORY_EVERY = 20
+STACK_DEPTH = 8
+MAX_STALLS = 50
+
+_STATE: Dict[str, Any] = {
+    "running": False,
+    "threshold": LOOP_LAG_THRESHOLD_MS / 1000,
+    "heartbeat": 0.0,
+    "lag_last": 0.0,
+    "lag_max": 0.0,
+    "lag_sum": 0.0,
+    "ticks": 0,
+    "tasks": Counter(),
+}
+_STALLS: Deque[Dict[str, Any]] = deque(maxlen=MAX_STALLS)
+# Episodio de bloqueo en curso, escrito por el hilo vigilante
+_CURRENT_STALL: Dict[str, Any] = {}
+_LOCK = threading.Lock()
+
+
+def _task_origin(task: Optional[asyncio.Task]) -> str:
+    if task is None:
+        return "callback"
+    coro = task.get_coro()
+    code = getattr(coro, "cr_code", None) or getattr(coro, "gi_code", None)
+    name = getattr(coro, "__qualname__", None) or type(coro).__name__
+    module = ""
+    if code is not None:
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}.{name}" if module else name
+
+
+def _format_stack(frame) -> str:
+    entries = traceback.extract_stack(frame)[-STACK_DEPTH:]
+    parts = []
+    for entry in reversed(entries):
+        filename = entry.filename
+        if filename.startswith(BOT_DIR):
+            filename = os.path.relpath(filename, BOT_DIR)
+        else:
+            filename = os.path.basename(filename)
+        parts.append(f"{filename}:{entry.lineno} {entry.name}")
+    return " <- ".join(parts)
+
+
+def _watchdog(loop: asyncio.AbstractEventLoop, loop_thread_id: int) -> None:
+    """Hilo vigilante: muestrea la pila del bucle mientras esté bloqueado."""
+    while _STATE["running"]:
+        interval = max(_STATE["threshold"] / 4, 0.005)
+        time.sleep(interval)
+        blocked = time.perf_counter() - _STATE["heartbeat"] - TICK_INTERVAL
+        if blocked < _STATE["threshold"]:
+            continue
+        frame = sys._current_frames().get(loop_thread_id)
+        if frame is None:
+            continue
+        stack = _format_stack(frame)
+        with _LOCK:
+            if not _CURRENT_STALL:
+                try:
+                    task = asyncio.current_task(loop)
+                except RuntimeError:
+                    task = None
+                _CURRENT_STALL.update(origin=_task_origin(task), samples=Counter())
+            _CURRENT_STALL["samples"][stack] += 1
+
+
+async def _inventory() -> None:
+    tasks = Counter(_task_origin(task) for task in asyncio.all_tasks() if not task.done())
+    _STATE["tasks"] = tasks
+    clear_gauge("bot_asyncio_tasks")
+    for origin, count in tasks.items():
+        set_gauge("bot_asyncio_tasks", {"origin": origin}, count)
+
+
+def _record_stall(lag: float) -> None:
+    with _LOCK:
+        stall = dict(_CURRENT_STALL)
+        _CURRENT_STALL.clear()
+    samples: Counter = stall.get("samples", Counter())
+    entry = {
+        "at": time.time(),
+        "seconds": lag,
+        "origin": stall.get("origin", "unknown"),
+        "stacks": samples.most_common(3),
+    }
+    _STALLS.append(entry)
+    inc_counter("bot_event_loop_stalls_total", {"origin": entry["origin"]})
+    top = entry["stacks"][0][0] if entry["stacks"] else "sin muestra"
+    logger.warning(f"Event loop blocked {lag * 1000:.0f} ms by {entry['origin']}: {top}")
+
+
+async def loop_monitor() -> None:
+    """Tarea de fondo: lag del bucle, bloqueos e inventario de tareas."""
+    loop = asyncio.get_running_loop()
+    _STATE["running"] = True
+    _STATE["heartbeat"] = time.perf_counter()
+    watchdog = threading.Thread(
+        target=_watchdog, args=(loop, threading.get_ident()), name="loop-monitor", daemon=True
+    )
+    watchdog.start()
+    logger.info(f"Loop monitor started (threshold {_STATE['threshold'] * 1000:.0f} ms)")
+    try:
+        while True:
+            expected = time.perf_counter() + TICK_INTERVAL
+            await asyncio.sleep(TICK_INTERVAL)
+            now = time.perf_counter()
+            _STATE["heartbeat"] = now
+            lag = max(now - expected, 0.0)
+            _STATE["lag_last"] = lag
+            _STATE["lag_sum"] += lag
+            _STATE["ticks"] += 1
+            if lag > _STATE["lag_max"]:
+                _STATE["lag_max"] = lag
+                set_gauge("bot_event_loop_lag_max_seconds", None, lag)
+            observe_histogram("bot_event_loop_lag_seconds", None, lag)
+            if lag >= _STATE["threshold"] or _CURRENT_STALL:
+                _record_stall(lag)
+            if _STATE["ticks"] % INVENTORY_EVERY == 0:
+                await _inventory()
+    except asyncio.CancelledError:
+        logger.info("Loop monitor cancelled")
+        raise
+    finally:
+        _STATE["running"] = False
+
+
+def set_lag_threshold(threshold_ms: float) -> None:
+    _STATE["threshold"] = threshold_ms / 1000
+
+
+def get_loop_report(limit: int = 10) -> Dict[str, Any]:
+    ticks = _STATE["ticks"] or 1
+    return {
+        "running": _STATE["running"],
+        "threshold_ms": _STATE["threshold"] * 1000,
+        "lag_last_ms": _STATE["lag_last"] * 1000,
+        "lag_avg_ms": _STATE["lag_sum"] / ticks * 1000,
+        "lag_max_ms": _STATE["lag_max"] * 1000,
+        "tasks_total": sum(_STATE["tasks"].values()),
+        "tasks": _STATE["tasks"].most_common(limit),
+        "stalls": list(_STALLS)[-limit:][::-1],
+    }
+
+
+def format_loop_report(limit: int = 10) -> str:
+    report = get_loop_report(limit)
+    lines = [
+        f"Lag del bucle: último {report['lag_last_ms']:.1f} ms, medio {report['lag_avg_ms']:.1f} ms, "
+        f"máx {report['lag_max_ms']:.1f} ms (umbral {report['threshold_ms']:.0f} ms)",
+        "",
+        f"Tareas vivas: {report['tasks_total']}",
+    ]
+    lines.extend(f"  {count:5d}  {origin}" for origin, count in report["tasks"])
+    lines.append("")
+    lines.append(f"Bloqueos recientes: {len(report['stalls'])}")
+    for stall in report["stalls"]:
+        when = time.strftime("%H:%M:%S", time.localtime(stall["at"]))
+        lines.append(f"  {when} {stall['seconds'] * 1000:.0f} ms en {stall['origin']}")
+        for stack, samples in stall["stacks"]:
+            lines.append(f"    [{samples}] {stack}")
+    return "\n".join(lines)
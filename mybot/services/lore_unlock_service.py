@@ -0,0 +1,220 @@
+"""
+Desbloqueo unificado de pistas de lore.
+Todas las vías (niveles, misiones, combinaciones, comandos de admin) conceden
+pistas aquí: el código se resuelve con un mapa en memoria, la inserción usa
+``INSERT ... ON CONFLICT DO NOTHING`` y admite lotes de usuarios. El envío del
+contenido al usuario se encola y lo despacha una tarea en segundo plano.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import LorePiece, UserLorePiece
+from notificaciones import send_narrative_notification
+from services.backpack_service import invalidate_backpack_cache
+from services.cluster import publish, subscribe
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# Telegram admite ~30 mensajes/s por bot; se deja margen
+DELIVERY_INTERVAL = 1 / 25
+# Segundos que se esperan al apagar para enviar las pistas pendientes
+DELIVERY_DRAIN_TIMEOUT = 10
+
+# Modos de entrega
+DELIVERY_CONTENT = "content"  # envía la imagen, vídeo o texto de la pista
+DELIVERY_NOTICE = "notice"  # aviso breve de Lucien con el título
+
+# code_name -> datos mínimos de la pista (sin cargar en cada desbloqueo)
+_LORE_BY_CODE: Dict[str, Dict[str, Any]] = {}
+_LORE_LOADED = False
+
+_DELIVERY_QUEUE: Optional[asyncio.Queue] = None
+_DELIVERY_TASK: Optional[asyncio.Task] = None
+
+
+def invalidate_lore_cache() -> None:
+    global _LORE_LOADED
+    _LORE_BY_CODE.clear()
+    _LORE_LOADED = False
+
+
+@event.listens_for(LorePiece, "after_insert")
+@event.listens_for(LorePiece, "after_update")
+@event.listens_for(LorePiece, "after_delete")
+def _on_lore_piece_changed(mapper, connection, target) -> None:
+    invalidate_lore_cache()
+    publish("lore_cache")
+
+
+subscribe("lore_cache", invalidate_lore_cache)
+
+
+def _insert_for(session: AsyncSession):
+    if session.bind.dialect.name == "postgresql":
+        return pg_insert
+    return sqlite_insert
+
+
+class LoreUnlockService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _ensure_cache(self) -> None:
+        global _LORE_LOADED
+        if _LORE_LOADED:
+            return
+        result = await self.session.execute(
+            select(
+                LorePiece.id,
+                LorePiece.code_name,
+                LorePiece.title,
+                LorePiece.content_type,
+                LorePiece.content,
+            )
+        )
+        _LORE_BY_CODE.clear()
+        for piece_id, code_name, title, content_type, content in result.all():
+            _LORE_BY_CODE[code_name] = {
+                "id": piece_id,
+                "code_name": code_name,
+                "title": title,
+                "content_type": content_type,
+                "content": content,
+            }
+        _LORE_LOADED = True
+
+    async def get_piece(self, code: str) -> Optional[Dict[str, Any]]:
+        await self._ensure_cache()
+        return _LORE_BY_CODE.get(code)
+
+    async def unlock(
+        self,
+        user_id: int,
+        code: str,
+        *,
+        context: Optional[Dict[str, Any]] = None,
+        bot: Optional[Bot] = None,
+        delivery: Optional[str] = DELIVERY_CONTENT,
+        commit: bool = True,
+    ) -> bool:
+        """Concede ``code`` a un usuario. Devuelve False si no existe o ya la tenía."""
+        granted = await self.unlock_for_users(
+            [user_id], code, context=context, bot=bot, delivery=delivery, commit=commit
+        )
+        return bool(granted)
+
+    async def unlock_for_users(
+        self,
+        user_ids: Iterable[int],
+        code: str,
+        *,
+        context: Optional[Dict[str, Any]] = None,
+        bot: Optional[Bot] = None,
+        delivery: Optional[str] = DELIVERY_CONTENT,
+        commit: bool = True,
+    ) -> List[int]:
+        """Concede ``code`` a varios usuarios y devuelve los que no la tenían.
+
+        Con ``commit=False`` la inserción queda en la transacción del llamador.
+        """
+        piece = await self.get_piece(code)
+        if not piece:
+            logger.warning(f"Pista de lore no encontrada: {code}")
+            return []
+
+        insert = _insert_for(self.session)
+        user_ids = list(dict.fromkeys(user_ids))
+        granted: List[int] = []
+        for start in range(0, len(user_ids), BATCH_SIZE):
+            rows = [
+                {"user_id": user_id, "lore_piece_id": piece["id"], "context": context or {}}
+                for user_id in user_ids[start:start + BATCH_SIZE]
+            ]
+            stmt = (
+                insert(UserLorePiece)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=["user_id", "lore_piece_id"])
+                .returning(UserLorePiece.user_id)
+            )
+            result = await self.session.execute(stmt)
+            granted.extend(result.scalars().all())
+            if commit:
+                await self.session.commit()
+
+        # La inserción core no dispara los eventos del mapper (ni su aviso a otros workers)
+        for user_id in granted:
+            invalidate_backpack_cache(user_id)
+            publish("backpack_summary", user_id)
+
+        if granted:
+            source = (context or {}).get("source", "unknown")
+            logger.info(f"Pista {code} desbloqueada para {len(granted)} usuario(s) (origen: {source})")
+            if bot and delivery:
+                for user_id in granted:
+                    queue_lore_delivery(bot, user_id, piece, delivery, source)
+        return granted
+
+
+def queue_lore_delivery(
+    bot: Bot, user_id: int, piece: Dict[str, Any], delivery: str, source: str = "Sistema"
+) -> None:
+    """Encola el envío de una pista; arranca el despachador si no está activo."""
+    global _DELIVERY_QUEUE, _DELIVERY_TASK
+    if _DELIVERY_QUEUE is None:
+        _DELIVERY_QUEUE = asyncio.Queue()
+    _DELIVERY_QUEUE.put_nowait((bot, user_id, piece, delivery, source))
+    if _DELIVERY_TASK is None or _DELIVERY_TASK.done():
+        _DELIVERY_TASK = asyncio.create_task(_delivery_worker(_DELIVERY_QUEUE))
+
+
+async def stop_lore_delivery(timeout: float = DELIVERY_DRAIN_TIMEOUT) -> None:
+    """Al apagar: espera a que salgan las pistas en cola (hasta ``timeout``) y para el despachador."""
+    global _DELIVERY_TASK
+    task = _DELIVERY_TASK
+    if task is None or task.done():
+        return
+    try:
+        await asyncio.wait_for(_DELIVERY_QUEUE.join(), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"{_DELIVERY_QUEUE.qsize()} pistas sin enviar al apagar")
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    _DELIVERY_TASK = None
+
+
+async def _deliver(bot: Bot, user_id: int, piece: Dict[str, Any], delivery: str, source: str) -> None:
+    if delivery == DELIVERY_NOTICE:
+        await send_narrative_notification(bot, user_id, piece["title"], source)
+    elif piece["content_type"] == "image":
+        await bot.send_photo(user_id, piece["content"], caption=f"📖 {piece['title']}")
+    elif piece["content_type"] == "video":
+        await bot.send_video(user_id, piece["content"], caption=f"📖 {piece['title']}")
+    else:
+        await bot.send_message(user_id, f"📖 {piece['title']}\n\n{piece['content']}")
+
+
+async def _delivery_worker(queue: asyncio.Queue) -> None:
+    while True:
+        bot, user_id, piece, delivery, source = await queue.get()
+        try:
+            try:
+                await _deliver(bot, user_id, piece, delivery, source)
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                await _deliver(bot, user_id, piece, delivery, source)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error enviando la pista {piece['code_name']} a {user_id}: {e}")
+        finally:
+            queue.task_done()
+        await asyncio.sleep(DELIVERY_INTERVAL)
@@ -0,0 +1,238 @@
+"""
+Registro de métricas en proceso.
+Cada update de Telegram abre un ámbito (``contextvars``) donde se acumulan las
+sentencias SQL, el tiempo en base de datos y las llamadas salientes a la API
+de Telegram; al terminar se vuelcan a contadores e histogramas etiquetados por
+tipo de update y handler. ``render_metrics`` devuelve el formato de texto de
+Prometheus y ``get_update_summary`` un resumen para el panel de admin.
+"""
+import logging
+import time
+from bisect import bisect_left
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# nombre -> (tipo, ayuda)
+_METADATA: Dict[str, Tuple[str, str]] = {
+    "bot_updates_total": ("counter", "Updates processed"),
+    "bot_update_duration_seconds": ("histogram", "Wall time per update"),
+    "bot_update_db_statements_total": ("counter", "SQL statements executed while handling updates"),
+    "bot_update_db_seconds_total": ("counter", "Time spent in SQL statements while handling updates"),
+    "bot_update_telegram_calls_total": ("counter", "Telegram API calls made while handling updates"),
+    "bot_update_errors_total": ("counter", "Updates whose handler raised"),
+    "bot_db_statements_total": ("counter", "SQL statements executed by the process"),
+    "bot_db_seconds_total": ("counter", "Time spent in SQL statements by the process"),
+    "bot_telegram_calls_total": ("counter", "Telegram API calls made by the process"),
+    "bot_event_loop_lag_seconds": ("histogram", "Delay of the event loop monitor tick"),
+    "bot_event_loop_lag_max_seconds": ("gauge", "Largest event loop lag seen"),
+    "bot_event_loop_stalls_total": ("counter", "Times the event loop was blocked beyond the threshold"),
+    "bot_asyncio_tasks": ("gauge", "Live asyncio tasks by origin"),
+    "bot_job_duration_seconds": ("histogram", "Run time of scheduled jobs"),
+    "bot_job_runs_total": ("counter", "Scheduled job runs by outcome"),
+    "bot_job_last_success_timestamp_seconds": ("gauge", "Unix time of the last successful run of each job"),
+    "bot_webhook_updates_total": ("counter", "Webhook updates by outcome (queued, coalesced, rejected)"),
+    "bot_webhook_queue_depth": ("gauge", "Updates waiting in the webhook ingress queue"),
+}
+_COUNTERS: Dict[Tuple[str, Labels], float] = {}
+_GAUGES: Dict[Tuple[str, Labels], float] = {}
+# (nombre, etiquetas) -> [conteos por bucket..., suma, total]
+_HISTOGRAMS: Dict[Tuple[str, Labels], List[float]] = {}
+
+# Ámbito del update en curso: handler, sentencias, tiempo BD, llamadas a Telegram
+_CURRENT_UPDATE: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_update", default=None)
+# Reciben (tipo de update, segundos, ámbito) al cerrar cada update
+_UPDATE_LISTENERS: List[Callable[[str, float, Dict[str, Any]], None]] = []
+
+
+def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+
+def inc_counter(name: str, labels: Optional[Dict[str, str]] = None, amount: float = 1) -> None:
+    key = (name, _labels(labels))
+    _COUNTERS[key] = _COUNTERS.get(key, 0) + amount
+
+
+def set_gauge(name: str, labels: Optional[Dict[str, str]], value: float) -> None:
+    _GAUGES[(name, _labels(labels))] = value
+
+
+def clear_gauge(name: str) -> None:
+    """Elimina todas las series de un gauge (p. ej. orígenes de tareas que ya no existen)."""
+    for key in [key for key in _GAUGES if key[0] == name]:
+        del _GAUGES[key]
+
+
+def observe_histogram(name: str, labels: Optional[Dict[str, str]], value: float) -> None:
+    key = (name, _labels(labels))
+    values = _HISTOGRAMS.get(key)
+    if values is None:
+        values = _HISTOGRAMS[key] = [0.0] * (len(LATENCY_BUCKETS) + 2)
+    index = bisect_left(LATENCY_BUCKETS, value)
+    if index < len(LATENCY_BUCKETS):
+        values[index] += 1
+    values[-2] += value
+    values[-1] += 1
+
+
+def reset_metrics() -> None:
+    _COUNTERS.clear()
+    _GAUGES.clear()
+    _HISTOGRAMS.clear()
+
+
+# --- ámbito por update -------------------------------------------------------
+
+def start_update_scope(update_id: Optional[int] = None) -> Token:
+    return _CURRENT_UPDATE.set(
+        {
+            "update_id": update_id,
+            "handler": "unhandled",
+            "db_statements": 0,
+            "db_seconds": 0.0,
+            "telegram_calls": 0,
+        }
+    )
+
+
+def current_update_scope() -> Optional[Dict[str, Any]]:
+    return _CURRENT_UPDATE.get()
+
+
+def finish_update_scope(token: Token, update_type: str, elapsed: float, failed: bool = False) -> Dict[str, Any]:
+    """Cierra el ámbito y vuelca sus valores al registro."""
+    scope = _CURRENT_UPDATE.get()
+    _CURRENT_UPDATE.reset(token)
+    labels = {"update_type": update_type, "handler": scope["handler"]}
+    inc_counter("bot_updates_total", labels)
+    observe_histogram("bot_update_duration_seconds", labels, elapsed)
+    inc_counter("bot_update_db_statements_total", labels, scope["db_statements"])
+    inc_counter("bot_update_db_seconds_total", labels, scope["db_seconds"])
+    inc_counter("bot_update_telegram_calls_total", labels, scope["telegram_calls"])
+    if failed:
+        inc_counter("bot_update_errors_total", labels)
+    scope["failed"] = failed
+    for listener in _UPDATE_LISTENERS:
+        listener(update_type, elapsed, scope)
+    return scope
+
+
+def add_update_listener(listener: Callable[[str, float, Dict[str, Any]], None]) -> None:
+    """Registra una función que recibe cada update medido (p. ej. el benchmark)."""
+    _UPDATE_LISTENERS.append(listener)
+
+
+def record_telegram_call(method: str) -> None:
+    inc_counter("bot_telegram_calls_total", {"method": method})
+    scope = _CURRENT_UPDATE.get()
+    if scope is not None:
+        scope["telegram_calls"] += 1
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info.get("metrics_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    inc_counter("bot_db_statements_total")
+    inc_counter("bot_db_seconds_total", amount=elapsed)
+    # El contexto del update llega hasta aquí porque SQLAlchemy lo propaga al greenlet
+    scope = _CURRENT_UPDATE.get()
+    if scope is not None:
+        scope["db_statements"] += 1
+        scope["db_seconds"] += elapsed
+
+
+# --- exposición --------------------------------------------------------------
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render_metrics() -> str:
+    """Todas las métricas en el formato de texto de Prometheus."""
+    lines: List[str] = []
+    for name, (kind, help_text) in _METADATA.items():
+        if kind == "histogram":
+            series = sorted((labels, values) for (metric, labels), values in _HISTOGRAMS.items() if metric == name)
+        elif kind == "gauge":
+            series = sorted((labels, value) for (metric, labels), value in _GAUGES.items() if metric == name)
+        else:
+            series = sorted((labels, value) for (metric, labels), value in _COUNTERS.items() if metric == name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0.0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, value):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', str(bound)))} {_format_value(cumulative)}")
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {_format_value(value[-1])}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-2])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_format_value(value[-1])}")
+    return "\n".join(lines) + "\n"
+
+
+def _quantile(values: List[float], q: float) -> float:
+    """Cuantil aproximado: límite superior del bucket que lo contiene."""
+    target = values[-1] * q
+    cumulative = 0.0
+    for bound, bucket_count in zip(LATENCY_BUCKETS, values):
+        cumulative += bucket_count
+        if cumulative >= target:
+            return bound
+    return float("inf")
+
+
+def get_update_summary(limit: int = 10) -> List[Dict[str, Any]]:
+    """Handlers con más tiempo acumulado, con medias por update."""
+    rows = []
+    for (name, labels), values in _HISTOGRAMS.items():
+        if name != "bot_update_duration_seconds" or not values[-1]:
+            continue
+        count = values[-1]
+        rows.append(
+            {
+                **dict(labels),
+                "count": int(count),
+                "total_seconds": values[-2],
+                "avg_ms": values[-2] / count * 1000,
+                "p95_ms": _quantile(values, 0.95) * 1000,
+                "avg_db_statements": _COUNTERS.get(("bot_update_db_statements_total", labels), 0) / count,
+                "avg_db_ms": _COUNTERS.get(("bot_update_db_seconds_total", labels), 0) / count * 1000,
+                "avg_telegram_calls": _COUNTERS.get(("bot_update_telegram_calls_total", labels), 0) / count,
+                "errors": int(_COUNTERS.get(("bot_update_errors_total", labels), 0)),
+            }
+        )
+    rows.sort(key=lambda row: -row["total_seconds"])
+    return rows[:limit]
@@ -9,9 +9,8 @@ from database.models import (
     UserMissionEntry,
     Challenge,
     UserChallengeProgress,
-    LorePiece,
-    UserLorePiece,
 )
+from services.lore_unlock_service import LoreUnlockService
 from utils.text_utils import sanitize_text
 import logging
 
@@ -137,19 +136,13 @@ class MissionService:
         if not unlock_code and mission.action_data:
             unlock_code = mission.action_data.get("unlocks_lore_piece_code")
         if unlock_code:
-            lore_stmt = select(LorePiece).where(LorePiece.code_name == unlock_code)
-            lore_piece = (await self.session.execute(lore_stmt)).scalar_one_or_none()
-            if lore_piece:
-                check_stmt = select(UserLorePiece).where(
-                    UserLorePiece.user_id == user_id,
-                    UserLorePiece.lore_piece_id == lore_piece.id,
-                )
-                exists = (await self.session.execute(check_stmt)).scalar_one_or_none()
-                if not exists:
-                    self.session.add(UserLorePiece(user_id=user_id, lore_piece_id=lore_piece.id))
-                    logger.info(
-                        f"User {user_id} unlocked lore piece {unlock_code} via mission {mission_id}"
-                    )
+            # Sin commit: la pista entra en la misma transacción que la misión
+            await LoreUnlockService(self.session).unlock(
+                user_id,
+                unlock_code,
+                context={"source": f"mission {mission_id}"},
+                commit=False,
+            )
 
         # Ensure JSON field updates are marked for SQLAlchemy
         self.session.add(user) # Mark user as modified
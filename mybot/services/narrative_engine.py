@@ -5,9 +5,14 @@ Maneja la lógica de fragmentos, decisiones y progresión de historia.
 import logging
 from typing import Optional, Dict, Any, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, delete, func, update
 from database.models import User
-from database.narrative_models import StoryFragment, NarrativeChoice, UserNarrativeState
+from database.narrative_models import (
+    StoryFragment,
+    NarrativeChoice,
+    UserNarrativeState,
+    UserNarrativeDecision,
+)
 from services.point_service import PointService
 from datetime import datetime
 
@@ -55,9 +60,13 @@ class NarrativeEngine:
         if not await self._check_access_conditions(user_id, start_fragment):
             return None
         
-        # Configurar estado inicial
+        # Configurar estado inicial; reiniciar borra el registro de decisiones
+        await self.session.execute(
+            delete(UserNarrativeDecision).where(UserNarrativeDecision.user_id == user_id)
+        )
         user_state.current_fragment_key = start_fragment.key
-        user_state.choices_made = []
+        user_state.choices_made = None
+        user_state.decisions_count = 0
         user_state.narrative_started_at = datetime.utcnow()
         
         # Procesar recompensas del fragmento inicial
@@ -98,17 +107,9 @@ class NarrativeEngine:
             logger.info(f"Usuario {user_id} no cumple condiciones para fragmento {next_fragment.key}")
             return None
         
-        # Registrar la decisión
+        # Registrar la decisión: una fila nueva, el estado solo guarda contadores
         user_state = await self._get_or_create_user_state(user_id)
-        if not user_state.choices_made:
-            user_state.choices_made = []
-        
-        user_state.choices_made.append({
-            "fragment_key": current_fragment.key,
-            "choice_index": choice_index,
-            "choice_text": selected_choice.text,
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        await self._record_decision(user_state, current_fragment.key, choice_index)
         
         # Avanzar al siguiente fragmento
         user_state.current_fragment_key = next_fragment.key
@@ -142,8 +143,108 @@ class NarrativeEngine:
             "fragments_visited": user_state.fragments_visited,
             "total_accessible": total_fragments,
             "progress_percentage": min(progress_percentage, 100),
-            "choices_made": user_state.choices_made or []
+            "decisions_count": user_state.decisions_count or 0,
+            "recent_choices": await self.get_decision_history(user_id, limit=3, with_text=True),
         }
+
+    async def get_decision_history(
+        self,
+        user_id: int,
+        *,
+        before_seq: Optional[int] = None,
+        limit: int = 20,
+        with_text: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Historial de decisiones, de la más reciente a la más antigua.
+
+        Paginación por cursor: pasar como ``before_seq`` el ``seq`` del último
+        elemento de la página anterior.
+        """
+        stmt = select(
+            UserNarrativeDecision.seq,
+            UserNarrativeDecision.fragment_key,
+            UserNarrativeDecision.choice_index,
+            UserNarrativeDecision.created_at,
+        ).where(UserNarrativeDecision.user_id == user_id)
+        if before_seq is not None:
+            stmt = stmt.where(UserNarrativeDecision.seq < before_seq)
+        stmt = stmt.order_by(UserNarrativeDecision.seq.desc()).limit(limit)
+        rows = (await self.session.execute(stmt)).all()
+
+        history = [
+            {
+                "seq": seq,
+                "fragment_key": fragment_key,
+                "choice_index": choice_index,
+                "timestamp": created_at,
+            }
+            for seq, fragment_key, choice_index, created_at in rows
+        ]
+        if with_text and history:
+            texts = await self._get_choice_texts({item["fragment_key"] for item in history})
+            for item in history:
+                choices = texts.get(item["fragment_key"], [])
+                index = item["choice_index"]
+                item["choice_text"] = choices[index] if 0 <= index < len(choices) else None
+        return history
+
+    async def _get_choice_texts(self, fragment_keys) -> Dict[str, List[str]]:
+        """Textos de las decisiones de varios fragmentos en una sola consulta."""
+        stmt = (
+            select(StoryFragment.key, NarrativeChoice.text)
+            .join(NarrativeChoice, NarrativeChoice.source_fragment_id == StoryFragment.id)
+            .where(StoryFragment.key.in_(fragment_keys))
+            .order_by(NarrativeChoice.id)
+        )
+        texts: Dict[str, List[str]] = {}
+        for key, text in (await self.session.execute(stmt)).all():
+            texts.setdefault(key, []).append(text)
+        return texts
+
+    async def _record_decision(
+        self, user_state: UserNarrativeState, fragment_key: str, choice_index: int
+    ) -> None:
+        """Añade la decisión al registro con coste constante.
+
+        El ``seq`` se reserva con un UPDATE ... RETURNING sobre el contador, así
+        dos pulsaciones simultáneas no pueden obtener el mismo.
+        """
+        if user_state.choices_made and not user_state.decisions_count:
+            self._migrate_legacy_choices(user_state)
+            await self.session.flush()
+        stmt = (
+            update(UserNarrativeState)
+            .where(UserNarrativeState.user_id == user_state.user_id)
+            .values(decisions_count=func.coalesce(UserNarrativeState.decisions_count, 0) + 1)
+            .returning(UserNarrativeState.decisions_count)
+            .execution_options(synchronize_session="fetch")
+        )
+        seq = (await self.session.execute(stmt)).scalar_one()
+        self.session.add(
+            UserNarrativeDecision(
+                user_id=user_state.user_id,
+                seq=seq,
+                fragment_key=fragment_key,
+                choice_index=choice_index,
+                created_at=datetime.utcnow(),
+            )
+        )
+
+    def _migrate_legacy_choices(self, user_state: UserNarrativeState) -> None:
+        """Pasa una única vez el JSON heredado ``choices_made`` al registro."""
+        for seq, choice in enumerate(user_state.choices_made, start=1):
+            timestamp = choice.get("timestamp")
+            self.session.add(
+                UserNarrativeDecision(
+                    user_id=user_state.user_id,
+                    seq=seq,
+                    fragment_key=choice.get("fragment_key", ""),
+                    choice_index=choice.get("choice_index", 0),
+                    created_at=datetime.fromisoformat(timestamp) if timestamp else None,
+                )
+            )
+        user_state.decisions_count = len(user_state.choices_made)
+        user_state.choices_made = None
     
     async def _get_or_create_user_state(self, user_id: int) -> UserNarrativeState:
         """Obtiene o crea el estado narrativo del usuario."""
@@ -155,7 +256,7 @@ class NarrativeEngine:
             user_state = UserNarrativeState(
                 user_id=user_id,
                 current_fragment_key=None,
-                choices_made=[],
+                decisions_count=0,
                 fragments_visited=0
             )
             self.session.add(user_state)
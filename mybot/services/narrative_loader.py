@@ -2,13 +2,19 @@
 Cargador de contenido narrativo desde archivos JSON.
 Permite cargar y actualizar fragmentos narrativos fácilmente.
 """
-import json
 import os
 import logging
 from typing import Dict, Any, List
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from database.narrative_models import StoryFragment, NarrativeChoice
+from services.story_graph import (
+    StoryGraph,
+    format_report,
+    load_story_graph,
+    read_fragment_file,
+    set_story_graph,
+)
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -19,52 +25,91 @@ class NarrativeLoader:
     def __init__(self, session: AsyncSession):
         self.session = session
     
-    async def load_fragments_from_directory(self, directory_path: str = "mybot/narrative_fragments"):
-        """Carga todos los fragmentos JSON de un directorio."""
+    async def load_fragments_from_directory(
+        self,
+        directory_path: str = "mybot/narrative_fragments",
+        *,
+        strict: bool = False,
+    ):
+        """Carga todos los fragmentos JSON de un directorio.
+
+        Antes de escribir se analiza el grafo resultante (contenido existente
+        más el del directorio). Con ``strict`` no se carga nada si hay errores.
+        """
         if not os.path.exists(directory_path):
             logger.warning(f"Directorio de narrativa no encontrado: {directory_path}")
             return
         
-        loaded_count = 0
-        for filename in os.listdir(directory_path):
+        files: Dict[str, List[Dict[str, Any]]] = {}
+        for filename in sorted(os.listdir(directory_path)):
             if filename.endswith('.json'):
                 filepath = os.path.join(directory_path, filename)
                 try:
-                    await self.load_fragment_from_file(filepath)
-                    loaded_count += 1
+                    files[filepath] = read_fragment_file(filepath)
                 except Exception as e:
                     logger.error(f"Error cargando {filepath}: {e}")
+
+        all_fragments = [data for fragments in files.values() for data in fragments]
+        graph = await self._build_graph(all_fragments)
+        report = self._log_report(graph)
+        if report["errors"] and strict:
+            logger.error("Narrativa rechazada por el validador:\n%s", format_report(report))
+            return
+
+        # Un único commit por archivo: si un fragmento falla se descarta el
+        # archivo entero y los demás siguen cargándose.
+        loaded_count = 0
+        for filepath, fragments in files.items():
+            try:
+                for fragment_data in fragments:
+                    await self.upsert_fragment(fragment_data, commit=False)
+                await self.session.commit()
+                loaded_count += 1
+            except Exception as e:
+                await self.session.rollback()
+                logger.error(f"Error cargando {filepath}: {e}")
+        set_story_graph(graph)
         
         logger.info(f"Cargados {loaded_count} fragmentos narrativos")
+
+    async def validate_fragments(self, fragments: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Analiza el grafo que resultaría de cargar ``fragments`` sobre el contenido actual."""
+        return self._log_report(await self._build_graph(fragments))
+
+    async def _build_graph(self, fragments: List[Dict[str, Any]]) -> StoryGraph:
+        graph = await load_story_graph(self.session)
+        incoming = StoryGraph()
+        for fragment_data in fragments:
+            key = incoming.add_fragment(fragment_data)
+            if key:
+                graph.add_fragment(fragment_data, replace=True)
+        graph.duplicates = incoming.duplicates
+        graph.invalid = incoming.invalid
+        return graph
+
+    def _log_report(self, graph: StoryGraph) -> Dict[str, Any]:
+        report = graph.analyze()
+        if report["errors"] or report["warnings"]:
+            logger.warning("Informe del grafo narrativo:\n%s", format_report(report))
+        return report
     
     async def load_fragment_from_file(self, filepath: str):
         """Carga fragmentos desde un archivo JSON."""
         try:
-            with open(filepath, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-            
-            # Manejar diferentes formatos de archivo
-            if isinstance(data, dict):
-                if "fragments" in data:
-                    # Archivo con múltiples fragmentos
-                    for fragment_data in data["fragments"]:
-                        await self.upsert_fragment(fragment_data)
-                else:
-                    # Archivo con un solo fragmento
-                    await self.upsert_fragment(data)
-            elif isinstance(data, list):
-                # Lista de fragmentos
-                for fragment_data in data:
-                    await self.upsert_fragment(fragment_data)
-            else:
-                logger.error(f"Formato de archivo no válido en {filepath}")
-                
+            for fragment_data in read_fragment_file(filepath):
+                await self.upsert_fragment(fragment_data, commit=False)
+            await self.session.commit()
         except Exception as e:
+            await self.session.rollback()
             logger.error(f"Error cargando fragmento desde {filepath}: {e}")
             raise
         
-    async def upsert_fragment(self, fragment_data: Dict[str, Any]):
-        """Inserta o actualiza un fragmento narrativo."""
+    async def upsert_fragment(self, fragment_data: Dict[str, Any], commit: bool = True):
+        """Inserta o actualiza un fragmento narrativo.
+
+        Con ``commit=False`` solo se hace flush y el commit queda en manos
+        del llamador.
+        """
         # Mapear campos del JSON a campos de la base de datos
         fragment_key = fragment_data.get('fragment_id') or fragment_data.get('key')
         if not fragment_key:
@@ -76,14 +121,22 @@ class NarrativeLoader:
         fragment = result.scalar_one_or_none()
         
         if fragment:
-            await self._update_fragment(fragment, fragment_data)
+            await self._update_fragment(fragment, fragment_data, commit=commit)
         else:
-            fragment = await self._create_fragment(fragment_data)
+            fragment = await self._create_fragment(fragment_data, commit=commit)
         
         if fragment:
-            await self._process_fragment_decisions(fragment, fragment_data.get('decisions', []))
+            await self._process_fragment_decisions(
+                fragment, fragment_data.get('decisions', []), commit=commit
+            )
+
+    async def _save(self, commit: bool):
+        if commit:
+            await self.session.commit()
+        else:
+            await self.session.flush()
 
-    async def _create_fragment(self, data: Dict[str, Any]) -> StoryFragment:
+    async def _create_fragment(self, data: Dict[str, Any], commit: bool = True) -> StoryFragment:
         """Crea un nuevo fragmento narrativo."""
         fragment_key = data.get('fragment_id') or data.get('key')
         if not fragment_key:
@@ -103,13 +156,13 @@ class NarrativeLoader:
         )
         
         self.session.add(fragment)
-        await self.session.commit()
+        await self._save(commit)
         await self.session.refresh(fragment)
         
         logger.info(f"Fragmento creado: {fragment_key}")
         return fragment
 
-    async def _update_fragment(self, fragment: StoryFragment, data: Dict[str, Any]):
+    async def _update_fragment(self, fragment: StoryFragment, data: Dict[str, Any], commit: bool = True):
         """Actualiza un fragmento existente."""
         fragment.text = data.get('content') or data.get('text', fragment.text)
         fragment.character = data.get('character', fragment.character)
@@ -120,10 +173,12 @@ class NarrativeLoader:
         fragment.unlocks_achievement_id = data.get('unlocks_achievement_id', fragment.unlocks_achievement_id)
         fragment.auto_next_fragment_key = data.get('auto_next_fragment_key', fragment.auto_next_fragment_key)
         
-        await self.session.commit()
+        await self._save(commit)
         logger.info(f"Fragmento actualizado: {fragment.key}")
 
-    async def _process_fragment_decisions(self, fragment: StoryFragment, decisions: List[Dict[str, Any]]):
+    async def _process_fragment_decisions(
+        self, fragment: StoryFragment, decisions: List[Dict[str, Any]], commit: bool = True
+    ):
         """Procesa las decisiones de un fragmento."""
         # Eliminar decisiones existentes
         stmt = select(NarrativeChoice).where(NarrativeChoice.source_fragment_id == fragment.id)
@@ -133,7 +188,7 @@ class NarrativeLoader:
         for choice in existing_choices:
             await self.session.delete(choice)
         
-        await self.session.commit()
+        await self._save(commit)
 
         # Crear nuevas decisiones
         for decision in decisions:
@@ -150,7 +205,7 @@ class NarrativeLoader:
             )
             self.session.add(choice)
         
-        await self.session.commit()
+        await self._save(commit)
     
     async def load_default_narrative(self):
         """Carga la narrativa por defecto si no existe contenido."""
@@ -359,7 +414,10 @@ class NarrativeLoader:
             }
         ]
         
+        graph = await self._build_graph(default_fragments)
+        self._log_report(graph)
         for fragment_data in default_fragments:
             await self.upsert_fragment(fragment_data)
+        set_story_graph(graph)
         
         logger.info("Narrativa por defecto cargada exitosamente")
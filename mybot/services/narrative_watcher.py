@@ -0,0 +1,292 @@
+"""
+Recarga en caliente de fragmentos narrativos.
+Vigila el directorio de fragmentos con inotify (Linux) o, si no está
+disponible, comparando mtime/tamaño periódicamente. Solo se vuelven a leer
+los archivos modificados y solo se escriben los fragmentos que cambiaron,
+tanto en la base de datos como en el grafo narrativo en memoria.
+
+Con varios workers solo vigila el planificador, que es el único que escribe en
+la base de datos; los demás aplican los cambios a su grafo en memoria cuando
+llega el aviso ``story_graph`` del bus.
+"""
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from services.cluster import publish, subscribe
+from services.narrative_loader import NarrativeLoader
+from services.story_graph import (
+    format_report,
+    get_story_graph,
+    load_story_graph,
+    read_fragment_file,
+    set_story_graph,
+)
+from utils.config import NARRATIVE_FRAGMENTS_DIR, NARRATIVE_POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Margen para agrupar las ráfagas de eventos que generan los editores al guardar
+DEBOUNCE_SECONDS = 0.5
+
+
+class _Inotify:
+    """Envoltorio mínimo de inotify vía ctypes, sin dependencias externas."""
+
+    def __init__(self, directory: str):
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc no encontrada")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify no disponible")
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch falló para {directory}")
+
+    def read_names(self) -> Set[str]:
+        names: Set[str] = set()
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buffer):
+            _wd, _mask, _cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name:
+                names.add(os.fsdecode(name))
+        return names
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def apply_story_graph_changes(changed: Dict[str, Dict[str, Any]], removed: Iterable[str]) -> None:
+    """Aplica al grafo en memoria una recarga hecha en otro worker (sin tocar la BD)."""
+    graph = get_story_graph()
+    if graph is None:
+        return
+    candidate = graph.copy()
+    for data in changed.values():
+        candidate.add_fragment(data, replace=True)
+    for key in removed:
+        candidate.remove_fragment(key)
+    set_story_graph(candidate)
+
+
+subscribe("story_graph", apply_story_graph_changes)
+
+
+class NarrativeWatcher:
+    """Detecta cambios en los JSON narrativos y los aplica de forma incremental."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        directory: str = NARRATIVE_FRAGMENTS_DIR,
+        *,
+        poll_interval: float = NARRATIVE_POLL_INTERVAL,
+        strict: bool = False,
+    ):
+        self.session_factory = session_factory
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.strict = strict
+        # ruta -> (firma del archivo, {clave: datos del fragmento})
+        self._files: Dict[str, Tuple[Tuple[int, int], Dict[str, Dict[str, Any]]]] = {}
+
+    def _signature(self, path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _json_paths(self) -> Set[str]:
+        return {
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".json")
+        }
+
+    async def prime(self) -> None:
+        """Registra el estado actual de los archivos y compila el grafo en memoria."""
+        for path in self._json_paths():
+            try:
+                fragments = self._index(read_fragment_file(path))
+            except Exception as e:
+                logger.error(f"Error leyendo {path}: {e}")
+                fragments = {}
+            self._files[path] = (self._signature(path), fragments)
+
+        if get_story_graph() is None:
+            async with self.session_factory() as session:
+                set_story_graph(await load_story_graph(session))
+
+    @staticmethod
+    def _index(fragments: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        indexed = {}
+        for data in fragments:
+            key = data.get('fragment_id') or data.get('key')
+            if key:
+                indexed[key] = data
+        return indexed
+
+    async def reload_paths(self, paths: Iterable[str]) -> int:
+        """Vuelve a leer ``paths`` y aplica solo los fragmentos que cambiaron."""
+        changed: Dict[str, Dict[str, Any]] = {}
+        removed: Set[str] = set()
+        # Los nuevos estados solo se guardan si la recarga se aplica
+        updates: Dict[str, Optional[Tuple[Tuple[int, int], Dict[str, Dict[str, Any]]]]] = {}
+
+        for path in paths:
+            signature = self._signature(path)
+            previous_signature, previous = self._files.get(path, (None, {}))
+            if signature is not None and signature == previous_signature:
+                continue
+            if signature is None:
+                current: Dict[str, Dict[str, Any]] = {}
+                updates[path] = None
+            else:
+                try:
+                    current = self._index(read_fragment_file(path))
+                except Exception as e:
+                    # Archivo a medio escribir o JSON inválido: se conserva la versión anterior
+                    logger.error(f"Error leyendo {path}, se mantiene la versión anterior: {e}")
+                    continue
+                updates[path] = (signature, current)
+
+            for key, data in current.items():
+                if previous.get(key) != data:
+                    changed[key] = data
+            removed.update(key for key in previous if key not in current)
+
+        files = dict(self._files)
+        files.update(updates)
+        files = {path: state for path, state in files.items() if state is not None}
+        # Un fragmento movido a otro archivo no se considera eliminado
+        removed -= {key for _, fragments in files.values() for key in fragments}
+        if not changed and not removed:
+            self._files = files
+            return 0
+
+        graph = get_story_graph()
+        candidate = graph.copy() if graph else None
+        if candidate is not None:
+            for data in changed.values():
+                candidate.add_fragment(data, replace=True)
+            for key in removed:
+                candidate.remove_fragment(key)
+            report = candidate.analyze()
+            if report["errors"] or report["warnings"]:
+                logger.warning("Informe del grafo tras la recarga:\n%s", format_report(report))
+            if report["errors"] and self.strict:
+                logger.error("Recarga narrativa rechazada por el validador")
+                # Se recuerda la firma para no reintentar, pero se compara con lo último aplicado
+                for path, state in updates.items():
+                    if state is not None:
+                        self._files[path] = (state[0], self._files.get(path, (None, {}))[1])
+                return 0
+
+        async with self.session_factory() as session:
+            loader = NarrativeLoader(session)
+            for data in changed.values():
+                await loader.upsert_fragment(data)
+
+        self._files = files
+        if candidate is not None:
+            set_story_graph(candidate)
+        publish("story_graph", changed, sorted(removed))
+        if removed:
+            # No se borran de la base de datos: puede haber usuarios situados en ellos
+            logger.warning(f"Fragmentos eliminados de los archivos (se conservan en BD): {sorted(removed)}")
+        logger.info(f"Recarga narrativa: {len(changed)} fragmentos actualizados")
+        return len(changed)
+
+    async def run(self) -> None:
+        """Bucle principal: inotify si está disponible, sondeo en caso contrario."""
+        if not os.path.isdir(self.directory):
+            logger.warning(f"Directorio de narrativa no encontrado: {self.directory}")
+            return
+        await self.prime()
+        try:
+            inotify = _Inotify(self.directory)
+        except OSError as e:
+            logger.info(f"inotify no disponible ({e}), usando sondeo cada {self.poll_interval}s")
+            await self._run_polling()
+            return
+        try:
+            await self._run_inotify(inotify)
+        finally:
+            inotify.close()
+
+    async def _run_inotify(self, inotify: _Inotify) -> None:
+        logger.info(f"Vigilando {self.directory} con inotify")
+        loop = asyncio.get_running_loop()
+        pending: Set[str] = set()
+        wakeup = asyncio.Event()
+
+        def on_readable() -> None:
+            pending.update(name for name in inotify.read_names() if name.endswith(".json"))
+            if pending:
+                wakeup.set()
+
+        loop.add_reader(inotify.fd, on_readable)
+        try:
+            while True:
+                await wakeup.wait()
+                await asyncio.sleep(DEBOUNCE_SECONDS)
+                wakeup.clear()
+                names = set(pending)
+                pending.clear()
+                try:
+                    await self.reload_paths(os.path.join(self.directory, name) for name in names)
+                except Exception:
+                    logger.exception("Error aplicando la recarga narrativa")
+        finally:
+            loop.remove_reader(inotify.fd)
+
+    async def _run_polling(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                paths = self._json_paths() | set(self._files)
+                stale = [path for path in paths if self._signature(path) != self._files.get(path, (None,))[0]]
+                if stale:
+                    await self.reload_paths(stale)
+            except Exception:
+                logger.exception("Error aplicando la recarga narrativa")
+
+
+async def narrative_watcher(session_factory: async_sessionmaker[AsyncSession]):
+    """Background task for narrative hot-reload."""
+    logger.info("Narrative watcher started")
+    try:
+        await NarrativeWatcher(session_factory).run()
+    except asyncio.CancelledError:
+        logger.info("Narrative watcher cancelled")
+        raise
+    except Exception:
+        logger.exception("Unhandled error in narrative watcher")
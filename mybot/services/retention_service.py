@@ -0,0 +1,126 @@
+"""
+Retención de datos: borrado periódico de filas antiguas por tabla.
+Cada política define qué filas sobran y se borran en lotes acotados con
+``DELETE ... WHERE id IN (SELECT id ... LIMIT n)``, confirmando cada lote por
+separado para no mantener bloqueos de escritura largos (en SQLite bloquean
+toda la base de datos).
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import (
+    Auction,
+    AuctionStatus,
+    Bid,
+    ButtonReaction,
+    InviteToken,
+    MiniGamePlay,
+    PendingChannelRequest,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+# Pausa entre lotes para dejar pasar otras escrituras
+BATCH_PAUSE_SECONDS = 0.05
+
+
+# Cada política: nombre, modelo (con ``id`` entero), días de retención y la
+# condición de borrado en función de (ahora, días).
+RETENTION_POLICIES: List[Dict[str, Any]] = [
+    {
+        "name": "pending_channel_requests",
+        "model": PendingChannelRequest,
+        "days": 30,
+        "where": lambda now, days: PendingChannelRequest.request_timestamp < now - timedelta(days=days),
+    },
+    {
+        # Las reacciones evitan recompensas duplicadas: se conservan mientras el post sea relevante
+        "name": "button_reactions",
+        "model": ButtonReaction,
+        "days": 180,
+        "where": lambda now, days: ButtonReaction.created_at < now - timedelta(days=days),
+    },
+    {
+        "name": "minigame_play",
+        "model": MiniGamePlay,
+        "days": 90,
+        "where": lambda now, days: MiniGamePlay.used_at < now - timedelta(days=days),
+    },
+    {
+        # Solo pujas perdedoras de subastas cerradas; la ganadora queda como historial
+        "name": "bids",
+        "model": Bid,
+        "days": 30,
+        "where": lambda now, days: Bid.is_winning.is_(False) & Bid.auction_id.in_(
+            select(Auction.id).where(
+                Auction.status.in_([AuctionStatus.ENDED, AuctionStatus.CANCELLED]),
+                Auction.end_time < now - timedelta(days=days),
+            )
+        ),
+    },
+    {
+        # Los tokens usados cuentan para los logros de invitación
+        "name": "invite_tokens",
+        "model": InviteToken,
+        "days": 7,
+        "where": lambda now, days: InviteToken.used_by.is_(None)
+        & InviteToken.expires_at.is_not(None)
+        & (InviteToken.expires_at < now - timedelta(days=days)),
+    },
+]
+
+
+def get_policy(name: str) -> Dict[str, Any]:
+    for policy in RETENTION_POLICIES:
+        if policy["name"] == name:
+            return policy
+    raise ValueError(f"Unknown retention policy: {name}")
+
+
+class RetentionService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def purge(
+        self,
+        policy: Dict[str, Any],
+        *,
+        days: Optional[int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> int:
+        """Borra en lotes las filas que cumplen la política; devuelve cuántas."""
+        model = policy["model"]
+        condition = policy["where"](datetime.utcnow(), policy["days"] if days is None else days)
+        total = 0
+        while True:
+            chunk = select(model.id).where(condition).order_by(model.id).limit(batch_size)
+            result = await self.session.execute(
+                delete(model).where(model.id.in_(chunk)).execution_options(synchronize_session=False)
+            )
+            await self.session.commit()
+            deleted = result.rowcount or 0
+            total += deleted
+            if deleted < batch_size:
+                break
+            await asyncio.sleep(BATCH_PAUSE_SECONDS)
+        if total:
+            logger.info(f"Retention {policy['name']}: deleted {total} rows")
+        return total
+
+    async def run_all(self) -> Dict[str, int]:
+        """Aplica todas las políticas; un fallo en una tabla no detiene las demás."""
+        results: Dict[str, int] = {}
+        for policy in RETENTION_POLICIES:
+            try:
+                results[policy["name"]] = await self.purge(policy)
+            except Exception as e:
+                await self.session.rollback()
+                logger.error(f"Retention {policy['name']} failed: {e}")
+                results[policy["name"]] = 0
+        return results
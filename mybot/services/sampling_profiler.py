@@ -0,0 +1,174 @@
+"""
+Profiler de muestreo para el proceso en marcha.
+Un hilo toma cada ``interval`` segundos la pila del hilo del bucle de eventos
+con ``sys._current_frames`` (sin ``sys.setprofile``, que cuesta en cada
+llamada) y cuenta las pilas repetidas. El resultado se exporta en formato
+"collapsed stack" (``marco;marco;marco N``) que entienden flamegraph.pl y
+speedscope, y se resume por handler y por método de servicio.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INTERVAL = 0.005
+MAX_SECONDS = 600
+IDLE = "(idle)"
+
+_STATE: Dict[str, Any] = {"thread": None, "stop": None, "result": None}
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(BOT_DIR):
+        module = os.path.splitext(os.path.relpath(filename, BOT_DIR))[0].replace(os.sep, ".")
+    else:
+        module = os.path.splitext(os.path.basename(filename))[0]
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{module}.{name}".replace(";", ":")
+
+
+def _collapse(frame) -> tuple:
+    """Pila de la raíz a la hoja, sin la maquinaria del bucle de asyncio."""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    # Todo lo anterior a Handle._run es el propio bucle; si no hay callback en curso, está ocioso
+    start = None
+    for index, item in enumerate(frames):
+        if item.f_code.co_name == "_run" and item.f_code.co_filename.endswith(os.path.join("asyncio", "events.py")):
+            start = index + 1
+    if start is None:
+        return (IDLE,)
+    return tuple(_label(item) for item in frames[start:]) or (IDLE,)
+
+
+def _sampler(thread_id: int, interval: float, stop: threading.Event, samples: Counter) -> None:
+    while not stop.wait(interval):
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            samples[_collapse(frame)] += 1
+
+
+def is_profiling() -> bool:
+    return _STATE["thread"] is not None
+
+
+def start_profiling(interval: float = DEFAULT_INTERVAL, thread_id: Optional[int] = None) -> None:
+    """Empieza a muestrear el hilo indicado (por defecto, el que llama)."""
+    if is_profiling():
+        raise ValueError("Ya hay un perfil en curso")
+    stop = threading.Event()
+    samples: Counter = Counter()
+    thread = threading.Thread(
+        target=_sampler,
+        args=(thread_id or threading.get_ident(), interval, stop, samples),
+        name="sampling-profiler",
+        daemon=True,
+    )
+    _STATE.update(thread=thread, stop=stop, samples=samples, started=time.perf_counter(), interval=interval)
+    thread.start()
+    logger.info(f"Sampling profiler started ({interval * 1000:g} ms interval)")
+
+
+def stop_profiling() -> Dict[str, Any]:
+    if not is_profiling():
+        raise ValueError("No hay un perfil en curso")
+    _STATE["stop"].set()
+    _STATE["thread"].join()
+    samples: Counter = _STATE["samples"]
+    result = {
+        "seconds": time.perf_counter() - _STATE["started"],
+        "interval": _STATE["interval"],
+        "total": sum(samples.values()),
+        "stacks": samples,
+    }
+    _STATE.update(thread=None, stop=None, result=result)
+    logger.info(f"Sampling profiler stopped: {result['total']} samples in {result['seconds']:.1f} s")
+    return result
+
+
+async def profile_for(seconds: float, interval: float = DEFAULT_INTERVAL) -> Dict[str, Any]:
+    """Muestrea el bucle de eventos actual durante ``seconds`` segundos."""
+    if not 0 < seconds <= MAX_SECONDS:
+        raise ValueError(f"La duración debe estar entre 0 y {MAX_SECONDS} segundos")
+    start_profiling(interval)
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        result = stop_profiling()
+    return result
+
+
+async def profile_to_file(seconds: float, path: str) -> None:
+    """Perfil al arrancar (SAMPLING_PROFILER_SECONDS): escribe el collapsed stack en ``path``."""
+    try:
+        result = await profile_for(seconds)
+    except ValueError as e:
+        logger.error(f"Sampling profiler not started: {e}")
+        return
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write(format_collapsed(result))
+    logger.info(f"Sampling profile written to {path}\n{format_profile_summary(result)}")
+
+
+def last_profile() -> Optional[Dict[str, Any]]:
+    return _STATE["result"]
+
+
+def format_collapsed(result: Dict[str, Any]) -> str:
+    return "\n".join(f"{';'.join(stack)} {count}" for stack, count in result["stacks"].most_common()) + "\n"
+
+
+def _first_in(stack: tuple, package: str) -> Optional[str]:
+    for label in reversed(stack):
+        if label.startswith(package):
+            return label[len(package):]
+    return None
+
+
+def summarize_profile(result: Dict[str, Any], limit: int = 10) -> Dict[str, List]:
+    """Muestras por handler y por método de servicio (el más interno de cada pila)."""
+    handlers: Counter = Counter()
+    services: Counter = Counter()
+    idle = 0
+    for stack, count in result["stacks"].items():
+        if stack == (IDLE,):
+            idle += count
+            continue
+        if any(label.startswith(__name__) for label in stack):
+            continue
+        handler = _first_in(stack, "handlers.")
+        if handler:
+            handlers[handler] += count
+        service = _first_in(stack, "services.")
+        if service:
+            services[service] += count
+    return {
+        "idle": idle,
+        "handlers": handlers.most_common(limit),
+        "services": services.most_common(limit),
+    }
+
+
+def format_profile_summary(result: Dict[str, Any], limit: int = 5) -> str:
+    summary = summarize_profile(result, limit)
+    total = result["total"] or 1
+    lines = [
+        f"{result['total']} muestras en {result['seconds']:.0f} s · ocioso {summary['idle'] * 100 / total:.0f}%",
+    ]
+    for title, key in (("Handlers", "handlers"), ("Servicios", "services")):
+        if summary[key]:
+            lines.append(f"{title}:")
+            lines.extend(f"  {count * 100 / total:4.1f}% {name}" for name, count in summary[key])
+    return "\n".join(lines)
@@ -1,16 +1,26 @@
-import asyncio
 import logging
 from datetime import datetime, timedelta
+from typing import Optional
+
 from aiogram import Bot
 from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
 from sqlalchemy import select
 
 from database.models import PendingChannelRequest, BotConfig, User
-from utils.config import CHANNEL_SCHEDULER_INTERVAL, VIP_SCHEDULER_INTERVAL
+from utils.config import JOIN_SAFETY_SCAN_INTERVAL, VIP_SAFETY_SCAN_INTERVAL, VIP_SCHEDULER_INTERVAL
 from services.config_service import ConfigService
 from services.auction_service import AuctionService
 from services.free_channel_service import FreeChannelService
+from services.retention_service import RetentionService
 from services.subscription_service import SubscriptionService
+from services.vip_expiry_service import DB_FAILED, KICK_FAILED, VipExpiryService
+from services import join_deadlines, vip_deadlines
+from services.job_runtime import Job, JobRuntime
+
+# Segundos antes de reintentar una aprobación fallida
+JOIN_APPROVAL_RETRY_DELAY = 60
+# Segundos antes de reintentar una expiración VIP fallida
+VIP_EXPIRY_RETRY_DELAY = 60
 
 
 async def run_channel_request_check(bot: Bot, session_factory: async_sessionmaker[AsyncSession]):
@@ -23,74 +33,38 @@ async def run_channel_request_check(bot: Bot, session_factory: async_sessionmake
             logging.info(f"Processed {processed_count} pending channel requests")
 
 
-async def channel_request_scheduler(bot: Bot, session_factory: async_sessionmaker[AsyncSession]):
-    """Background task processing channel join requests."""
-    logging.info("Channel request scheduler started")
-    interval = CHANNEL_SCHEDULER_INTERVAL
-    try:
-        while True:
-            await run_channel_request_check(bot, session_factory)
-            async with session_factory() as session:
-                config_service = ConfigService(session)
-                value = await config_service.get_value("channel_scheduler_interval")
-                if value and value.isdigit():
-                    interval = int(value)
-            await asyncio.sleep(interval)
-    except asyncio.CancelledError:
-        logging.info("Channel request scheduler cancelled")
-        raise
-    except Exception:
-        logging.exception("Unhandled error in channel request scheduler")
+async def run_due_join_approvals(bot: Bot, session_factory: async_sessionmaker[AsyncSession]) -> int:
+    """Approve the requests whose deadline has passed; failures are retried later."""
+    due_ids = join_deadlines.pop_due()
+    if not due_ids:
+        return 0
+    async with session_factory() as session:
+        stmt = select(
+            PendingChannelRequest.id,
+            PendingChannelRequest.user_id,
+            PendingChannelRequest.chat_id,
+        ).where(PendingChannelRequest.id.in_(due_ids), PendingChannelRequest.approved == False)
+        requests = (await session.execute(stmt)).all()
+        processed = await FreeChannelService(session, bot).approve_requests(requests)
+
+        still_pending = await session.execute(
+            select(PendingChannelRequest.id).where(
+                PendingChannelRequest.id.in_([request.id for request in requests]),
+                PendingChannelRequest.approved == False,
+            )
+        )
+        retry_at = datetime.utcnow() + timedelta(seconds=JOIN_APPROVAL_RETRY_DELAY)
+        for request_id in still_pending.scalars().all():
+            join_deadlines.schedule_join_approval(request_id, retry_at)
+    if processed:
+        logging.info(f"Processed {processed} pending channel requests")
+    return processed
 
 
 async def run_vip_subscription_check(bot: Bot, session_factory: async_sessionmaker[AsyncSession]):
     """Check VIP expirations and send reminders once."""
     async with session_factory() as session:
-        now = datetime.utcnow()
-        remind_threshold = now + timedelta(hours=24)
-        config_service = ConfigService(session)
-        reminder_msg = await config_service.get_value("vip_reminder_message")
-        farewell_msg = await config_service.get_value("vip_farewell_message")
-        if not reminder_msg:
-            reminder_msg = "Tu suscripción VIP expira pronto."
-        if not farewell_msg:
-            farewell_msg = "Tu suscripción VIP ha expirado."
-        stmt = select(User).where(
-            User.role == "vip",
-            User.vip_expires_at <= remind_threshold,
-            User.vip_expires_at > now,
-            (User.last_reminder_sent_at.is_(None))
-            | (User.last_reminder_sent_at <= now - timedelta(hours=24)),
-        )
-        result = await session.execute(stmt)
-        users = result.scalars().all()
-        for user in users:
-            try:
-                await bot.send_message(user.id, reminder_msg)
-                user.last_reminder_sent_at = now
-                logging.info("Sent VIP expiry reminder to %s", user.id)
-            except Exception as e:
-                logging.exception("Failed to send reminder to %s: %s", user.id, e)
-
-        stmt = select(User).where(
-            User.role == "vip",
-            User.vip_expires_at.is_not(None),
-            User.vip_expires_at <= now,
-        )
-        result = await session.execute(stmt)
-        expired_users = result.scalars().all()
-        vip_channel_id = await ConfigService(session).get_vip_channel_id()
-        for user in expired_users:
-            try:
-                if vip_channel_id:
-                    await bot.ban_chat_member(vip_channel_id, user.id)
-                    await bot.unban_chat_member(vip_channel_id, user.id)
-            except Exception as e:
-                logging.exception("Failed to remove %s from VIP channel: %s", user.id, e)
-            user.role = "free"
-            await bot.send_message(user.id, farewell_msg)
-            logging.info("VIP expired for %s", user.id)
-        await session.commit()
+        return await VipExpiryService(session, bot).run()
 
 
 async def run_vip_membership_check(bot: Bot, session_factory: async_sessionmaker[AsyncSession]):
@@ -120,95 +94,128 @@ async def run_vip_membership_check(bot: Bot, session_factory: async_sessionmaker
             logging.info("Synced %s users to VIP role via channel", updated)
 
 
-async def vip_subscription_scheduler(bot: Bot, session_factory: async_sessionmaker[AsyncSession]):
-    """Background task checking VIP subscriptions."""
-    logging.info("VIP subscription scheduler started")
-    interval = VIP_SCHEDULER_INTERVAL
-    try:
-        while True:
-            await run_vip_subscription_check(bot, session_factory)
-            async with session_factory() as session:
-                config_service = ConfigService(session)
-                value = await config_service.get_value("vip_scheduler_interval")
-                if value and value.isdigit():
-                    interval = int(value)
-            await asyncio.sleep(interval)
-    except asyncio.CancelledError:
-        logging.info("VIP subscription scheduler cancelled")
-        raise
-    except Exception:
-        logging.exception("Unhandled error in VIP subscription scheduler")
-
-
-async def vip_membership_scheduler(bot: Bot, session_factory: async_sessionmaker[AsyncSession]):
-    """Background task syncing VIP roles based on channel membership."""
-    logging.info("VIP membership scheduler started")
-    interval = VIP_SCHEDULER_INTERVAL
-    try:
-        while True:
-            await run_vip_membership_check(bot, session_factory)
-            async with session_factory() as session:
-                config_service = ConfigService(session)
-                value = await config_service.get_value("vip_scheduler_interval")
-                if value and value.isdigit():
-                    interval = int(value)
-            await asyncio.sleep(interval)
-    except asyncio.CancelledError:
-        logging.info("VIP membership scheduler cancelled")
-        raise
-    except Exception:
-        logging.exception("Unhandled error in VIP membership scheduler")
+async def run_due_vip_deadlines(bot: Bot, session_factory: async_sessionmaker[AsyncSession]):
+    """Send the reminders and expire the subscriptions whose deadline has passed."""
+    remind_ids, expire_ids = vip_deadlines.pop_due()
+    if not remind_ids and not expire_ids:
+        return {}
+    async with session_factory() as session:
+        results = await VipExpiryService(session, bot).run(remind_ids=remind_ids, expire_ids=expire_ids)
+    retry_at = datetime.utcnow() + timedelta(seconds=VIP_EXPIRY_RETRY_DELAY)
+    for user_id, outcome in results["expirations"].items():
+        if outcome in (KICK_FAILED, DB_FAILED):
+            vip_deadlines.retry_vip_expiry(user_id, retry_at)
+    return results
 
 
 async def run_auction_monitor_check(bot: Bot, session_factory: async_sessionmaker[AsyncSession]):
     """Check for expired auctions and end them automatically."""
     async with session_factory() as session:
-        auction_service = AuctionService(session)
-        try:
-            expired_auctions = await auction_service.check_expired_auctions(bot)
-            if expired_auctions:
-                logging.info(f"Auto-ended {len(expired_auctions)} expired auctions")
-        except Exception as e:
-            logging.exception("Error in auction monitor check: %s", e)
-
-
-async def auction_monitor_scheduler(bot: Bot, session_factory: async_sessionmaker[AsyncSession]):
-    """Background task monitoring auction expirations."""
-    logging.info("Auction monitor scheduler started")
-    interval = 60  # Check every minute for auction expirations
-    try:
-        while True:
-            await run_auction_monitor_check(bot, session_factory)
-            await asyncio.sleep(interval)
-    except asyncio.CancelledError:
-        logging.info("Auction monitor scheduler cancelled")
-        raise
-    except Exception:
-        logging.exception("Unhandled error in auction monitor scheduler")
-
-
-async def run_free_channel_cleanup(bot: Bot, session_factory: async_sessionmaker[AsyncSession]):
-    """Clean up old channel requests periodically."""
+        expired_auctions = await AuctionService(session).check_expired_auctions(bot)
+        if expired_auctions:
+            logging.info(f"Auto-ended {len(expired_auctions)} expired auctions")
+
+
+async def run_retention_jobs(session_factory: async_sessionmaker[AsyncSession]) -> dict:
+    """Apply every retention policy once (old requests, reactions, plays, bids, tokens)."""
     async with session_factory() as session:
-        free_service = FreeChannelService(session, bot)
-        try:
-            cleaned_count = await free_service.cleanup_old_requests(days_old=30)
-            if cleaned_count > 0:
-                logging.info(f"Cleaned up {cleaned_count} old channel requests")
-        except Exception as e:
-            logging.exception("Error in free channel cleanup: %s", e)
-
-
-async def free_channel_cleanup_scheduler(bot: Bot, session_factory: async_sessionmaker[AsyncSession]):
-    """Background task for cleaning up old channel requests."""
-    logging.info("Free channel cleanup scheduler started")
-    interval = 86400  # Run once per day
-    try:
-        while True:
-            await run_free_channel_cleanup(bot, session_factory)
-            await asyncio.sleep(interval)
-    except asyncio.CancelledError:
-        logging.info("Free channel cleanup scheduler cancelled")
-        raise
-    except Exception:
-        logging.exception("Unhandled error in free channel cleanup scheduler")
+        results = await RetentionService(session).run_all()
+        if any(results.values()):
+            logging.info("Retention jobs deleted: %s", results)
+        return results
+
+
+async def rebuild_join_deadlines(session_factory: async_sessionmaker[AsyncSession]) -> None:
+    async with session_factory() as session:
+        await join_deadlines.rebuild_join_deadlines(session)
+
+
+async def rebuild_vip_deadlines(session_factory: async_sessionmaker[AsyncSession]) -> None:
+    async with session_factory() as session:
+        await vip_deadlines.rebuild_vip_deadlines(session)
+
+
+def _next_join_deadline() -> Optional[float]:
+    # Un cambio de configuración obliga a reconstruir el montículo cuanto antes
+    return 0 if join_deadlines.needs_rebuild() else join_deadlines.seconds_until_next()
+
+
+async def register_scheduler_jobs(
+    runtime: JobRuntime, bot: Bot, session_factory: async_sessionmaker[AsyncSession]
+) -> None:
+    """Registra las tareas periódicas y por plazo del bot en ``runtime``."""
+
+    async def join_approvals():
+        if join_deadlines.needs_rebuild():
+            await rebuild_join_deadlines(session_factory)
+        await run_due_join_approvals(bot, session_factory)
+
+    async def join_safety_scan():
+        # Solicitudes registradas por otro proceso (o perdidas en un relevo de líder)
+        # no están en el montículo de este: se recargan desde la tabla
+        await rebuild_join_deadlines(session_factory)
+        await run_due_join_approvals(bot, session_factory)
+
+    async def vip_safety_scan():
+        await run_vip_subscription_check(bot, session_factory)
+        await rebuild_vip_deadlines(session_factory)
+
+    async with session_factory() as session:
+        value = await ConfigService(session).get_value("vip_scheduler_interval")
+    membership_interval = int(value) if value and value.isdigit() else VIP_SCHEDULER_INTERVAL
+
+    runtime.add_job(
+        Job(
+            "join_approvals",
+            join_approvals,
+            next_due=_next_join_deadline,
+            wakeup=join_deadlines.get_wakeup_event(),
+            setup=lambda: rebuild_join_deadlines(session_factory),
+            group="join_approvals",
+        )
+    )
+    runtime.add_job(
+        Job(
+            "join_safety_scan",
+            join_safety_scan,
+            interval=JOIN_SAFETY_SCAN_INTERVAL,
+            jitter=JOIN_SAFETY_SCAN_INTERVAL * 0.1,
+            run_at_start=False,
+            group="join_approvals",
+        )
+    )
+    # Plazos exactos y revisión completa de respaldo no deben procesar al mismo usuario a la vez
+    runtime.add_job(
+        Job(
+            "vip_deadlines",
+            lambda: run_due_vip_deadlines(bot, session_factory),
+            next_due=vip_deadlines.seconds_until_next,
+            wakeup=vip_deadlines.get_wakeup_event(),
+            setup=lambda: rebuild_vip_deadlines(session_factory),
+            group="vip_expiry",
+        )
+    )
+    runtime.add_job(
+        Job(
+            "vip_safety_scan",
+            vip_safety_scan,
+            interval=VIP_SAFETY_SCAN_INTERVAL,
+            jitter=VIP_SAFETY_SCAN_INTERVAL * 0.05,
+            run_at_start=False,
+            group="vip_expiry",
+        )
+    )
+    runtime.add_job(
+        Job(
+            "vip_membership",
+            lambda: run_vip_membership_check(bot, session_factory),
+            interval=membership_interval,
+            jitter=membership_interval * 0.1,
+        )
+    )
+    runtime.add_job(
+        Job("auction_monitor", lambda: run_auction_monitor_check(bot, session_factory), interval=60, jitter=5)
+    )
+    runtime.add_job(
+        Job("retention", lambda: run_retention_jobs(session_factory), interval=86400, jitter=600)
+    )
@@ -0,0 +1,189 @@
+"""
+Registro de consultas lentas (modo diagnóstico).
+Con el modo activo, cada sentencia que supera el umbral se registra con sus
+parámetros y el método de la aplicación que la lanzó, y la primera vez que se
+ve una sentencia se captura su plan: ``EXPLAIN QUERY PLAN`` en SQLite y
+``EXPLAIN (ANALYZE, BUFFERS)`` en PostgreSQL (solo ``ANALYZE`` para SELECT,
+para no repetir escrituras). Los datos se agregan por sentencia para un informe
+de las N más costosas.
+"""
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils.config import SLOW_QUERY_THRESHOLD_MS
+
+try:
+    import greenlet
+except ImportError:  # pragma: no cover - SQLAlchemy async siempre lo instala
+    greenlet = None
+
+logger = logging.getLogger(__name__)
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_PARAMS_REPR = 300
+
+_STATE: Dict[str, Any] = {"enabled": False, "threshold": 0.0, "explain": True}
+# sentencia -> agregados
+_SLOW_QUERIES: Dict[str, Dict[str, Any]] = {}
+
+
+def enable_slow_query_log(threshold_ms: float = 100, *, explain: bool = True) -> None:
+    _STATE.update(threshold=threshold_ms / 1000, explain=explain)
+    if not _STATE["enabled"]:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _STATE["enabled"] = True
+    logger.info(f"Slow query log enabled (>{threshold_ms} ms, explain={explain})")
+
+
+def disable_slow_query_log() -> None:
+    if _STATE["enabled"]:
+        event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+        _STATE["enabled"] = False
+    logger.info("Slow query log disabled")
+
+
+def is_slow_query_log_enabled() -> bool:
+    return _STATE["enabled"]
+
+
+def reset_slow_queries() -> None:
+    _SLOW_QUERIES.clear()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info.get("slow_query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if elapsed < _STATE["threshold"] or statement.lstrip().upper().startswith("EXPLAIN"):
+        return
+
+    caller = _caller()
+    params = _params_repr(parameters)
+    entry = _SLOW_QUERIES.get(statement)
+    if entry is None:
+        entry = _SLOW_QUERIES[statement] = {
+            "statement": statement,
+            "count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "callers": Counter(),
+            "last_params": None,
+            "plan": None,
+        }
+        if _STATE["explain"] and not executemany:
+            entry["plan"] = _explain(conn, statement, parameters)
+    entry["count"] += 1
+    entry["total_ms"] += elapsed * 1000
+    entry["max_ms"] = max(entry["max_ms"], elapsed * 1000)
+    entry["callers"][caller] += 1
+    entry["last_params"] = params
+    logger.warning(f"Slow query {elapsed * 1000:.1f} ms in {caller}: {' '.join(statement.split())} params={params}")
+
+
+def _params_repr(parameters: Any) -> str:
+    text = repr(parameters)
+    return text if len(text) <= MAX_PARAMS_REPR else text[:MAX_PARAMS_REPR] + "…"
+
+
+def _frames():
+    frame = sys._getframe(2)
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+    # Con el motor async la sentencia se ejecuta en un greenlet; la pila de la
+    # corrutina que la pidió cuelga del greenlet padre.
+    if greenlet is not None:
+        parent = greenlet.getcurrent().parent
+        frame = parent.gr_frame if parent is not None else None
+        while frame is not None:
+            yield frame
+            frame = frame.f_back
+
+
+def _caller() -> str:
+    """Primer método de la aplicación en la pila (preferentemente de ``services``)."""
+    fallback = None
+    for frame in _frames():
+        filename = frame.f_code.co_filename
+        if not filename.startswith(BOT_DIR) or filename == __file__ or "site-packages" in filename:
+            continue
+        name = getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+        location = f"{os.path.relpath(filename, BOT_DIR)}:{name}:{frame.f_lineno}"
+        if os.sep + "services" + os.sep in filename:
+            return location
+        fallback = fallback or location
+    return fallback or "unknown"
+
+
+def _explain(conn, statement: str, parameters: Any) -> Optional[str]:
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif dialect == "postgresql":
+        is_select = statement.lstrip().upper().startswith(("SELECT", "WITH"))
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if is_select else "EXPLAIN "
+    else:
+        return None
+    try:
+        # Cursor propio sobre la conexión DBAPI: no reentra en los eventos del motor
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    except Exception as e:
+        logger.debug(f"EXPLAIN failed: {e}")
+        return None
+    if dialect == "sqlite":
+        # (id, parent, notused, detail)
+        return "\n".join(str(row[-1]) for row in rows)
+    return "\n".join(str(row[0]) for row in rows)
+
+
+def get_slow_query_report(limit: int = 10) -> List[Dict[str, Any]]:
+    """Sentencias lentas ordenadas por tiempo total, con su plan y llamadores."""
+    entries = sorted(_SLOW_QUERIES.values(), key=lambda entry: -entry["total_ms"])[:limit]
+    return [
+        {
+            **entry,
+            "avg_ms": entry["total_ms"] / entry["count"],
+            "callers": entry["callers"].most_common(3),
+        }
+        for entry in entries
+    ]
+
+
+def format_slow_query_report(limit: int = 10) -> str:
+    lines = []
+    for position, entry in enumerate(get_slow_query_report(limit), 1):
+        lines.append(
+            f"#{position} {entry['count']}× total {entry['total_ms']:.0f} ms, "
+            f"media {entry['avg_ms']:.1f} ms, máx {entry['max_ms']:.1f} ms"
+        )
+        lines.append("  " + " ".join(entry["statement"].split()))
+        lines.append(f"  params: {entry['last_params']}")
+        for caller, count in entry["callers"]:
+            lines.append(f"  desde {caller} ({count})")
+        if entry["plan"]:
+            lines.extend("  | " + line for line in entry["plan"].splitlines())
+        lines.append("")
+    return "\n".join(lines)
+
+
+if SLOW_QUERY_THRESHOLD_MS > 0:
+    enable_slow_query_log(SLOW_QUERY_THRESHOLD_MS)
@@ -0,0 +1,205 @@
+"""
+Contadores incrementales para las estadísticas del panel de admin.
+Los eventos del mapper (alta de usuarios, cambios de suscripción, activación
+de tokens) actualizan los contadores en memoria, de modo que una instantánea
+no consulta la base de datos. Como los eventos se disparan durante el flush
+(antes del commit) y cada proceso tiene su propia copia, los contadores se
+reconcilian con la base de datos cada ``RECONCILE_INTERVAL`` segundos.
+"""
+import time
+import logging
+from bisect import bisect_right, insort
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import Tariff, Token, User, VipSubscription
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL = 600
+SERIES_DAYS = 30
+
+_STATS: Dict[str, Any] = {
+    "users_total": 0,
+    "subscriptions_total": 0,
+    "subscriptions_unlimited": 0,
+    "revenue_total": 0,
+}
+# Vencimientos de las suscripciones con fecha, ordenados (activas = posteriores a ahora)
+_EXPIRIES: List[datetime] = []
+# tariff_id -> precio
+_TARIFF_PRICES: Dict[int, int] = {}
+# fecha -> valor, últimos SERIES_DAYS días
+_DAILY_USERS: Dict[date, int] = {}
+_DAILY_REVENUE: Dict[date, int] = {}
+_RECONCILED_AT: Optional[float] = None
+
+
+def _today() -> date:
+    return datetime.utcnow().date()
+
+
+def _bump_daily(series: Dict[date, int], amount: int) -> None:
+    today = _today()
+    series[today] = series.get(today, 0) + amount
+    cutoff = today - timedelta(days=SERIES_DAYS)
+    for day in [day for day in series if day <= cutoff]:
+        del series[day]
+
+
+def _add_expiry(expires_at: Optional[datetime]) -> None:
+    if expires_at is None:
+        _STATS["subscriptions_unlimited"] += 1
+    else:
+        insort(_EXPIRIES, expires_at)
+
+
+def _remove_expiry(expires_at: Optional[datetime]) -> None:
+    if expires_at is None:
+        _STATS["subscriptions_unlimited"] = max(0, _STATS["subscriptions_unlimited"] - 1)
+        return
+    index = bisect_right(_EXPIRIES, expires_at) - 1
+    if index >= 0 and _EXPIRIES[index] == expires_at:
+        del _EXPIRIES[index]
+
+
+@event.listens_for(User, "after_insert")
+def _on_user_created(mapper, connection, target) -> None:
+    _STATS["users_total"] += 1
+    _bump_daily(_DAILY_USERS, 1)
+
+
+@event.listens_for(VipSubscription, "after_insert")
+def _on_subscription_created(mapper, connection, target) -> None:
+    _STATS["subscriptions_total"] += 1
+    _add_expiry(target.expires_at)
+
+
+@event.listens_for(VipSubscription, "after_update")
+def _on_subscription_updated(mapper, connection, target) -> None:
+    history = inspect(target).attrs.expires_at.history
+    if not history.has_changes():
+        return
+    for old in history.deleted:
+        _remove_expiry(old)
+    _add_expiry(target.expires_at)
+
+
+@event.listens_for(VipSubscription, "after_delete")
+def _on_subscription_deleted(mapper, connection, target) -> None:
+    _STATS["subscriptions_total"] = max(0, _STATS["subscriptions_total"] - 1)
+    _remove_expiry(target.expires_at)
+
+
+@event.listens_for(Token, "after_update")
+def _on_token_updated(mapper, connection, target) -> None:
+    history = inspect(target).attrs.is_used.history
+    if target.is_used and history.has_changes() and not any(history.deleted):
+        price = _TARIFF_PRICES.get(target.tariff_id)
+        if price is None:
+            # Tarifa desconocida: la próxima instantánea reconcilia
+            mark_stats_stale()
+            return
+        _STATS["revenue_total"] += price
+        _bump_daily(_DAILY_REVENUE, price)
+
+
+@event.listens_for(Tariff, "after_insert")
+@event.listens_for(Tariff, "after_update")
+def _on_tariff_saved(mapper, connection, target) -> None:
+    _TARIFF_PRICES[target.id] = target.price or 0
+
+
+@event.listens_for(Tariff, "after_delete")
+def _on_tariff_deleted(mapper, connection, target) -> None:
+    _TARIFF_PRICES.pop(target.id, None)
+
+
+def mark_stats_stale() -> None:
+    global _RECONCILED_AT
+    _RECONCILED_AT = None
+
+
+async def reconcile_stats(session: AsyncSession) -> None:
+    """Recalcula todos los contadores y series desde la base de datos."""
+    global _RECONCILED_AT
+    since = datetime.utcnow() - timedelta(days=SERIES_DAYS)
+
+    users_total = (await session.execute(select(func.count()).select_from(User))).scalar() or 0
+    expiries = (await session.execute(select(VipSubscription.expires_at))).scalars().all()
+    tariffs = (await session.execute(select(Tariff.id, Tariff.price))).all()
+    revenue_total = (
+        await session.execute(
+            select(func.sum(Tariff.price))
+            .select_from(Token)
+            .join(Tariff, Token.tariff_id == Tariff.id)
+            .where(Token.is_used.is_(True))
+        )
+    ).scalar() or 0
+
+    user_day = func.date(User.created_at)
+    daily_users = (
+        await session.execute(
+            select(user_day, func.count()).where(User.created_at >= since).group_by(user_day)
+        )
+    ).all()
+    token_day = func.date(Token.activated_at)
+    daily_revenue = (
+        await session.execute(
+            select(token_day, func.sum(Tariff.price))
+            .select_from(Token)
+            .join(Tariff, Token.tariff_id == Tariff.id)
+            .where(Token.is_used.is_(True), Token.activated_at >= since)
+            .group_by(token_day)
+        )
+    ).all()
+
+    _STATS.update(
+        users_total=users_total,
+        subscriptions_total=len(expiries),
+        subscriptions_unlimited=sum(1 for expires_at in expiries if expires_at is None),
+        revenue_total=revenue_total,
+    )
+    _EXPIRIES[:] = sorted(expires_at for expires_at in expiries if expires_at is not None)
+    _TARIFF_PRICES.clear()
+    _TARIFF_PRICES.update({tariff_id: price or 0 for tariff_id, price in tariffs})
+    _DAILY_USERS.clear()
+    _DAILY_USERS.update({_as_date(day): count for day, count in daily_users if day})
+    _DAILY_REVENUE.clear()
+    _DAILY_REVENUE.update({_as_date(day): amount or 0 for day, amount in daily_revenue if day})
+    _RECONCILED_AT = time.monotonic()
+
+
+def _as_date(value: Any) -> date:
+    # SQLite devuelve DATE() como texto
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _series(values: Dict[date, int], days: int) -> List[Tuple[date, int]]:
+    today = _today()
+    return [
+        (day, values.get(day, 0))
+        for day in (today - timedelta(days=offset) for offset in range(days - 1, -1, -1))
+    ]
+
+
+async def get_stats_snapshot(session: AsyncSession, *, days: int = 7) -> Dict[str, Any]:
+    """Instantánea de los contadores; solo consulta la BD si toca reconciliar."""
+    if _RECONCILED_AT is None or time.monotonic() - _RECONCILED_AT > RECONCILE_INTERVAL:
+        await reconcile_stats(session)
+
+    now = datetime.utcnow()
+    active = _STATS["subscriptions_unlimited"] + len(_EXPIRIES) - bisect_right(_EXPIRIES, now)
+    return {
+        "subscriptions_total": _STATS["subscriptions_total"],
+        "subscriptions_active": active,
+        "subscriptions_expired": _STATS["subscriptions_total"] - active,
+        "users_total": _STATS["users_total"],
+        "revenue_total": _STATS["revenue_total"],
+        "tariff_count": len(_TARIFF_PRICES),
+        "users_daily": _series(_DAILY_USERS, days),
+        "revenue_daily": _series(_DAILY_REVENUE, days),
+    }
@@ -0,0 +1,370 @@
+"""
+Análisis estático del grafo narrativo.
+Detecta destinos inexistentes, fragmentos inalcanzables, ciclos sin salida y
+condiciones de besitos/rol imposibles antes de que el contenido llegue al
+motor narrativo. Todas las pasadas son lineales en fragmentos + decisiones.
+"""
+import json
+import logging
+import os
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+START_FRAGMENT_KEY = "start"
+KNOWN_ROLES = {"free", "vip", "admin"}
+
+# Grafo compartido en memoria, mantenido por el cargador y el recargador en caliente
+_STORY_GRAPH: Optional["StoryGraph"] = None
+
+
+def get_story_graph() -> Optional["StoryGraph"]:
+    """Devuelve el grafo narrativo en memoria, si ya se ha compilado."""
+    return _STORY_GRAPH
+
+
+def set_story_graph(graph: Optional["StoryGraph"]) -> None:
+    global _STORY_GRAPH
+    _STORY_GRAPH = graph
+
+
+def read_fragment_file(filepath: str) -> List[Dict[str, Any]]:
+    """Lee un archivo JSON de fragmentos y devuelve la lista de fragmentos."""
+    with open(filepath, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+
+    if isinstance(data, dict):
+        if "fragments" in data:
+            return list(data["fragments"])
+        return [data]
+    if isinstance(data, list):
+        return data
+    raise ValueError(f"Formato de archivo no válido en {filepath}")
+
+
+class StoryGraph:
+    """Grafo compilado de fragmentos (nodos) y decisiones (aristas)."""
+
+    def __init__(self):
+        self.fragments: Dict[str, Dict[str, Any]] = {}
+        self.edges: Dict[str, List[Dict[str, Any]]] = {}
+        self.duplicates: List[str] = []
+        self.invalid: int = 0
+
+    def add_fragment(self, data: Dict[str, Any], *, replace: bool = False) -> Optional[str]:
+        """Normaliza un fragmento (JSON o storyboard) y lo añade al grafo."""
+        key = data.get('fragment_id') or data.get('key')
+        if not key:
+            self.invalid += 1
+            return None
+        if key in self.fragments and not replace:
+            self.duplicates.append(key)
+
+        self.fragments[key] = {
+            "key": key,
+            "min_besitos": data.get('required_besitos', data.get('min_besitos', 0)) or 0,
+            "required_role": data.get('required_role'),
+            "reward_besitos": data.get('reward_besitos', 0) or 0,
+        }
+
+        edges = []
+        for index, decision in enumerate(data.get('decisions') or data.get('choices') or []):
+            destination = decision.get('next_fragment') or decision.get('destination_key')
+            if not destination:
+                continue
+            edges.append({
+                "choice": index,
+                "destination": destination,
+                "required_besitos": decision.get('required_besitos', 0) or 0,
+                "required_role": decision.get('required_role'),
+            })
+        auto_next = data.get('auto_next_fragment_key')
+        if auto_next:
+            edges.append({
+                "choice": "auto",
+                "destination": auto_next,
+                "required_besitos": 0,
+                "required_role": None,
+            })
+        self.edges[key] = edges
+        return key
+
+    def remove_fragment(self, key: str) -> None:
+        self.fragments.pop(key, None)
+        self.edges.pop(key, None)
+
+    def copy(self) -> "StoryGraph":
+        """Copia superficial; los nodos se reemplazan, nunca se mutan."""
+        graph = StoryGraph()
+        graph.fragments = dict(self.fragments)
+        graph.edges = dict(self.edges)
+        return graph
+
+    @classmethod
+    def from_fragment_dicts(cls, fragments: Iterable[Dict[str, Any]]) -> "StoryGraph":
+        graph = cls()
+        for data in fragments:
+            graph.add_fragment(data)
+        return graph
+
+    @classmethod
+    def from_directory(cls, directory_path: str = "mybot/narrative_fragments") -> "StoryGraph":
+        """Construye el grafo a partir de todos los JSON de un directorio."""
+        graph = cls()
+        for filename in sorted(os.listdir(directory_path)):
+            if filename.endswith('.json'):
+                for data in read_fragment_file(os.path.join(directory_path, filename)):
+                    graph.add_fragment(data)
+        return graph
+
+    def analyze(self, start_key: str = START_FRAGMENT_KEY) -> Dict[str, Any]:
+        """Ejecuta todas las comprobaciones y devuelve un informe."""
+        impossible = self._find_impossible_gates()
+        negative_besitos = self._find_negative_besitos()
+        blocked = {(item["source"], item["choice"]) for item in impossible}
+
+        dangling = []
+        adjacency: Dict[str, List[Dict[str, Any]]] = {}
+        for source, edges in self.edges.items():
+            valid = []
+            for edge in edges:
+                if edge["destination"] not in self.fragments:
+                    dangling.append({
+                        "source": source,
+                        "choice": edge["choice"],
+                        "destination": edge["destination"],
+                    })
+                elif (source, edge["choice"]) not in blocked:
+                    valid.append(edge)
+            adjacency[source] = valid
+
+        missing_start = start_key not in self.fragments
+        if missing_start:
+            # Sin fragmento inicial se toman como raíz los fragmentos sin entradas
+            targets = {edge["destination"] for edges in adjacency.values() for edge in edges}
+            roots = [key for key in self.fragments if key not in targets]
+        else:
+            roots = [start_key]
+
+        paths = self._shortest_paths(roots, adjacency)
+        unreachable = [key for key in self.fragments if key not in paths]
+        dead_end_cycles = self._find_dead_end_cycles(adjacency)
+
+        return {
+            "fragments": len(self.fragments),
+            "choices": sum(len(edges) for edges in self.edges.values()),
+            "start": start_key,
+            "missing_start": missing_start,
+            "duplicates": list(self.duplicates),
+            "invalid": self.invalid,
+            "dangling": dangling,
+            "impossible_gates": impossible,
+            "negative_besitos": negative_besitos,
+            "unreachable": unreachable,
+            "dead_end_cycles": dead_end_cycles,
+            "paths": paths,
+            "errors": len(dangling) + len(impossible) + len(self.duplicates) + self.invalid,
+            "warnings": len(unreachable) + len(dead_end_cycles) + len(negative_besitos) + int(missing_start),
+        }
+
+    def _find_impossible_gates(self) -> List[Dict[str, Any]]:
+        """Aristas cuyas condiciones no puede cumplir ningún usuario no admin."""
+        issues = []
+        for source, edges in self.edges.items():
+            for edge in edges:
+                destination = self.fragments.get(edge["destination"])
+                reason = None
+                choice_role = edge["required_role"]
+                dest_role = destination["required_role"] if destination else None
+                if choice_role and choice_role not in KNOWN_ROLES:
+                    reason = f"rol desconocido en la decisión: {choice_role}"
+                elif dest_role and dest_role not in KNOWN_ROLES:
+                    reason = f"rol desconocido en el destino: {dest_role}"
+                elif choice_role and dest_role and "admin" not in (choice_role, dest_role) and choice_role != dest_role:
+                    reason = f"roles incompatibles: {choice_role} -> {dest_role}"
+                if reason:
+                    issues.append({
+                        "source": source,
+                        "choice": edge["choice"],
+                        "destination": edge["destination"],
+                        "reason": reason,
+                    })
+        return issues
+
+    def _find_negative_besitos(self) -> List[str]:
+        """Fragmentos y decisiones con besitos requeridos negativos (dato erróneo, siempre se cumple)."""
+        issues = [key for key, fragment in self.fragments.items() if fragment["min_besitos"] < 0]
+        for source, edges in self.edges.items():
+            for edge in edges:
+                if edge["required_besitos"] < 0:
+                    issues.append(f"{source}[{edge['choice']}]")
+        return issues
+
+    def _shortest_paths(
+        self, roots: List[str], adjacency: Dict[str, List[Dict[str, Any]]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """BFS desde las raíces; acumula el coste de la ruta más corta a cada fragmento."""
+        paths: Dict[str, Dict[str, Any]] = {}
+        queue = deque()
+        for root in roots:
+            fragment = self.fragments[root]
+            paths[root] = {
+                "depth": 0,
+                "min_besitos": fragment["min_besitos"],
+                "reward_besitos": fragment["reward_besitos"],
+                "requires_vip": fragment["required_role"] == "vip",
+            }
+            queue.append(root)
+
+        while queue:
+            current = queue.popleft()
+            info = paths[current]
+            for edge in adjacency.get(current, []):
+                destination = edge["destination"]
+                if destination in paths:
+                    continue
+                fragment = self.fragments[destination]
+                paths[destination] = {
+                    "depth": info["depth"] + 1,
+                    "min_besitos": max(info["min_besitos"], edge["required_besitos"], fragment["min_besitos"]),
+                    "reward_besitos": info["reward_besitos"] + fragment["reward_besitos"],
+                    "requires_vip": info["requires_vip"]
+                    or "vip" in (edge["required_role"], fragment["required_role"]),
+                }
+                queue.append(destination)
+        return paths
+
+    def _find_dead_end_cycles(self, adjacency: Dict[str, List[Dict[str, Any]]]) -> List[List[str]]:
+        """Componentes fuertemente conexas cíclicas de las que no sale ninguna arista (Tarjan iterativo)."""
+        index_of: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        on_stack = set()
+        stack: List[str] = []
+        components: List[List[str]] = []
+        counter = 0
+
+        for root in self.fragments:
+            if root in index_of:
+                continue
+            work = [(root, 0)]
+            while work:
+                node, position = work.pop()
+                if position == 0:
+                    index_of[node] = lowlink[node] = counter
+                    counter += 1
+                    stack.append(node)
+                    on_stack.add(node)
+                edges = adjacency.get(node, [])
+                recurse = False
+                while position < len(edges):
+                    child = edges[position]["destination"]
+                    position += 1
+                    if child not in index_of:
+                        work.append((node, position))
+                        work.append((child, 0))
+                        recurse = True
+                        break
+                    if child in on_stack:
+                        lowlink[node] = min(lowlink[node], index_of[child])
+                if recurse:
+                    continue
+                if lowlink[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+        dead_ends = []
+        for component in components:
+            members = set(component)
+            cyclic = len(component) > 1 or any(
+                edge["destination"] == component[0] for edge in adjacency.get(component[0], [])
+            )
+            if not cyclic:
+                continue
+            has_exit = any(
+                edge["destination"] not in members
+                for member in component
+                for edge in adjacency.get(member, [])
+            )
+            if not has_exit:
+                dead_ends.append(sorted(component))
+        return dead_ends
+
+
+async def load_story_graph(session: AsyncSession) -> StoryGraph:
+    """Compila el grafo desde la base de datos con dos consultas."""
+    # Import diferido: el análisis de archivos no necesita la capa de datos
+    from database.narrative_models import StoryFragment, NarrativeChoice
+
+    graph = StoryGraph()
+    fragments = (await session.execute(select(StoryFragment))).scalars().all()
+    choices = (
+        await session.execute(select(NarrativeChoice).order_by(NarrativeChoice.id))
+    ).scalars().all()
+
+    decisions_by_fragment: Dict[int, List[Dict[str, Any]]] = {}
+    for choice in choices:
+        decisions_by_fragment.setdefault(choice.source_fragment_id, []).append({
+            "destination_key": choice.destination_fragment_key,
+            "required_besitos": choice.required_besitos,
+            "required_role": choice.required_role,
+        })
+
+    for fragment in fragments:
+        graph.add_fragment({
+            "key": fragment.key,
+            "min_besitos": fragment.min_besitos,
+            "required_role": fragment.required_role,
+            "reward_besitos": fragment.reward_besitos,
+            "auto_next_fragment_key": fragment.auto_next_fragment_key,
+            "choices": decisions_by_fragment.get(fragment.id, []),
+        })
+    return graph
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Resumen legible del informe para logs y scripts."""
+    lines = [
+        f"Fragmentos: {report['fragments']} | Decisiones: {report['choices']} | "
+        f"Errores: {report['errors']} | Avisos: {report['warnings']}"
+    ]
+    if report["missing_start"]:
+        lines.append(f"Fragmento inicial '{report['start']}' no encontrado")
+    for key in report["duplicates"]:
+        lines.append(f"Clave duplicada: {key}")
+    if report["invalid"]:
+        lines.append(f"Fragmentos sin fragment_id/key: {report['invalid']}")
+    for item in report["dangling"]:
+        lines.append(f"Destino inexistente: {item['source']}[{item['choice']}] -> {item['destination']}")
+    for item in report["impossible_gates"]:
+        lines.append(
+            f"Condición imposible: {item['source']}[{item['choice']}] -> {item['destination']} ({item['reason']})"
+        )
+    if report["negative_besitos"]:
+        lines.append(f"Besitos requeridos negativos: {', '.join(report['negative_besitos'])}")
+    if report["unreachable"]:
+        lines.append(f"Inalcanzables: {', '.join(report['unreachable'])}")
+    for cycle in report["dead_end_cycles"]:
+        lines.append(f"Ciclo sin salida: {' -> '.join(cycle)}")
+    paths = report["paths"]
+    if paths:
+        deepest = max(paths.values(), key=lambda info: info["depth"])
+        costliest = max(paths.values(), key=lambda info: info["min_besitos"])
+        vip_only = sum(1 for info in paths.values() if info["requires_vip"])
+        lines.append(
+            f"Rutas: profundidad máx. {deepest['depth']}, besitos máx. requeridos "
+            f"{costliest['min_besitos']}, fragmentos solo VIP {vip_only}"
+        )
+    return "\n".join(lines)
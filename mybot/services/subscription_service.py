@@ -6,8 +6,10 @@ from sqlalchemy import select, func
 from aiogram import Bot
 
 from services.config_service import ConfigService
+from services.stats_registry import get_stats_snapshot
+from services.vip_deadlines import cancel_vip_expiry, schedule_vip_expiry
 
-from database.models import VipSubscription, User, Token, Tariff
+from database.models import VipSubscription, User
 import logging
 
 logger = logging.getLogger(__name__)
@@ -101,6 +103,8 @@ class SubscriptionService:
             user.last_reminder_sent_at = None
 
         await self.session.commit()
+        if user:
+            schedule_vip_expiry(user_id, user.vip_expires_at)
         logger.info(f"Extended VIP subscription for user {user_id} by {days} days")
         return sub
 
@@ -127,6 +131,7 @@ class SubscriptionService:
                     logger.exception("Failed to remove %s from VIP channel: %s", user_id, e)
 
         await self.session.commit()
+        cancel_vip_expiry(user_id)
         logger.info(f"Revoked VIP subscription for user {user_id}")
 
     async def set_subscription_expiration(
@@ -151,6 +156,10 @@ class SubscriptionService:
                 user.vip_expires_at = expires_at
 
         await self.session.commit()
+        if user and user.role == "vip":
+            schedule_vip_expiry(user_id, expires_at)
+        else:
+            cancel_vip_expiry(user_id)
         logger.info(
             "Set VIP expiration for user %s to %s", user_id, expires_at
         )
@@ -169,29 +178,9 @@ class SubscriptionService:
 
 
 async def get_admin_statistics(session: AsyncSession) -> dict:
-    """Return statistics for the admin panel."""
-
-    sub_service = SubscriptionService(session)
-    total_subs, active_subs, expired_subs = await sub_service.get_statistics()
-
-    user_count_stmt = select(func.count()).select_from(User)
-    user_count_res = await session.execute(user_count_stmt)
-    total_users = user_count_res.scalar() or 0
-
-    # Calculate revenue from used tokens
-    revenue_stmt = (
-        select(func.sum(Tariff.price))
-        .select_from(Token)
-        .join(Tariff, Token.tariff_id == Tariff.id)
-        .where(Token.is_used.is_(True))
-    )
-    revenue_res = await session.execute(revenue_stmt)
-    total_revenue = revenue_res.scalar() or 0
-
-    return {
-        "subscriptions_total": total_subs,
-        "subscriptions_active": active_subs,
-        "subscriptions_expired": expired_subs,
-        "users_total": total_users,
-        "revenue_total": total_revenue,
-    }
+    """Return statistics for the admin panel.
+
+    Served from the incremental counters in ``stats_registry``; the database is
+    only queried when the counters are due for reconciliation.
+    """
+    return await get_stats_snapshot(session)
@@ -9,6 +9,7 @@ from sqlalchemy import select
 from database.models import ConfigEntry, User, Tariff
 from services.config_service import ConfigService
 from services.channel_service import ChannelService
+from services.stats_registry import get_stats_snapshot
 from utils.text_utils import sanitize_text
 
 logger = logging.getLogger(__name__)
@@ -317,16 +318,10 @@ class TenantService:
             vip_channel_id = await self.config_service.get_vip_channel_id()
             free_channel_id = await self.config_service.get_free_channel_id()
             
-            # Get tariff count
-            stmt = select(Tariff)
-            result = await self.session.execute(stmt)
-            tariff_count = len(result.scalars().all())
-            
-            # Get user count
-            from sqlalchemy import func
-            user_count_stmt = select(func.count()).select_from(User)
-            user_count_result = await self.session.execute(user_count_stmt)
-            total_users = user_count_result.scalar() or 0
+            # Tariff and user counts from the incremental stats registry
+            stats = await get_stats_snapshot(self.session)
+            tariff_count = stats["tariff_count"]
+            total_users = stats["users_total"]
             
             return {
                 "admin_user_id": admin_user_id,
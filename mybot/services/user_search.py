@@ -0,0 +1,273 @@
+"""
+Búsqueda de usuarios para administradores.
+Mantiene en memoria un índice de trigramas (al estilo de pg_trgm) sobre
+username, first_name y last_name. Se construye una vez desde la base de datos
+y se actualiza de forma incremental al confirmar cambios de ``User``.
+Las coincidencias dentro de una palabra que no llegan al umbral de trigramas
+("toe" en "carlostoek") también se devuelven, como hacía ILIKE; se buscan solo
+entre los usuarios que tienen todos los trigramas interiores de la consulta. Con
+``USER_SEARCH_BACKEND=pg_trgm`` en PostgreSQL la búsqueda se delega en un
+índice GIN de pg_trgm.
+"""
+import logging
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, inspect, literal, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from database.models import User
+from services.cluster import publish, subscribe
+from utils.config import USER_SEARCH_BACKEND
+
+logger = logging.getLogger(__name__)
+
+# Fracción mínima de trigramas de la consulta que debe tener un usuario
+SIMILARITY_THRESHOLD = 0.5
+LOAD_CHUNK = 5000
+
+# user_id -> (username, first_name, last_name) normalizados
+_USERS: Dict[int, Tuple[str, str, str]] = {}
+# user_id -> trigramas del usuario
+_USER_GRAMS: Dict[int, Set[str]] = {}
+# trigrama -> user_ids
+_GRAM_INDEX: Dict[str, Set[int]] = {}
+_LOADED = False
+_PG_INDEX_READY = False
+
+
+def normalize(value: Optional[str]) -> str:
+    """Minúsculas, sin acentos ni '@' inicial."""
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKD", value.lower().lstrip("@"))
+    return "".join(ch for ch in value if not unicodedata.combining(ch)).strip()
+
+
+def trigrams(value: str) -> Set[str]:
+    """Trigramas por palabra con el mismo relleno que pg_trgm ("  w" ... "d ")."""
+    grams: Set[str] = set()
+    for word in value.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def index_user(
+    user_id: int,
+    username: Optional[str] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+) -> None:
+    """Añade o actualiza un usuario en el índice (no hace nada si aún no se cargó)."""
+    _index_local(user_id, username, first_name, last_name)
+    publish("user_search", user_id, username, first_name, last_name)
+
+
+def _index_local(
+    user_id: int, username: Optional[str], first_name: Optional[str], last_name: Optional[str]
+) -> None:
+    if not _LOADED:
+        return
+    _add(user_id, username, first_name, last_name)
+
+
+subscribe("user_search", _index_local)
+
+
+# Los cambios se anotan en la sesión al hacer flush y se indexan al confirmar:
+# una transacción revertida no deja nombres en el índice ni en otros workers
+_PENDING_KEY = "user_search_pending"
+
+
+def _remember(target: User) -> None:
+    session = object_session(target)
+    if session is None:
+        return
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    pending[target.id] = (target.username, target.first_name, target.last_name)
+
+
+@event.listens_for(User, "after_insert")
+def _on_user_inserted(mapper, connection, target) -> None:
+    _remember(target)
+
+
+@event.listens_for(User, "after_update")
+def _on_user_updated(mapper, connection, target) -> None:
+    # La tabla users se actualiza a menudo (puntos, rol...); solo interesan los nombres
+    attrs = inspect(target).attrs
+    if any(attrs[name].history.has_changes() for name in ("username", "first_name", "last_name")):
+        _remember(target)
+
+
+@event.listens_for(Session, "after_commit")
+def _on_commit(session) -> None:
+    for user_id, names in session.info.pop(_PENDING_KEY, {}).items():
+        index_user(user_id, *names)
+
+
+@event.listens_for(Session, "after_rollback")
+def _on_rollback(session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _add(user_id: int, username: Optional[str], first_name: Optional[str], last_name: Optional[str]) -> None:
+    fields = (normalize(username), normalize(first_name), normalize(last_name))
+    if _USERS.get(user_id) == fields:
+        return
+    _remove(user_id)
+    grams = trigrams(" ".join(fields))
+    _USERS[user_id] = fields
+    _USER_GRAMS[user_id] = grams
+    for gram in grams:
+        _GRAM_INDEX.setdefault(gram, set()).add(user_id)
+
+
+def _remove(user_id: int) -> None:
+    _USERS.pop(user_id, None)
+    for gram in _USER_GRAMS.pop(user_id, ()):
+        holders = _GRAM_INDEX.get(gram)
+        if holders:
+            holders.discard(user_id)
+            if not holders:
+                del _GRAM_INDEX[gram]
+
+
+def _score(user_id: int, query: str, query_grams: Set[str], shared: int) -> float:
+    score = shared / len(query_grams)
+    fields = _USERS[user_id]
+    if query in fields:
+        score += 1.0
+    elif any(word.startswith(query) for field in fields for word in field.split()):
+        score += 0.5
+    elif any(query in field for field in fields):
+        score += 0.25
+    return score
+
+
+def _infix_candidates(query_grams: Set[str]) -> Set[int]:
+    """Usuarios con todos los trigramas interiores de la consulta (sin relleno).
+
+    Quien contiene la consulta dentro de una palabra los tiene todos; se cruzan
+    empezando por el menos frecuente. Consultas de menos de tres letras no
+    tienen trigramas interiores y no buscan subcadenas.
+    """
+    inner = sorted(
+        (_GRAM_INDEX.get(gram, set()) for gram in query_grams if " " not in gram),
+        key=len,
+    )
+    if not inner:
+        return set()
+    candidates = set(inner[0])
+    for holders in inner[1:]:
+        if not candidates:
+            break
+        candidates &= holders
+    return candidates
+
+
+class UserSearchService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    def _use_pg_trgm(self) -> bool:
+        return USER_SEARCH_BACKEND == "pg_trgm" and self.session.bind.dialect.name == "postgresql"
+
+    async def _ensure_index(self) -> None:
+        global _LOADED
+        if _LOADED:
+            return
+        stmt = select(User.id, User.username, User.first_name, User.last_name).order_by(User.id)
+        last_id = None
+        while True:
+            page = stmt if last_id is None else stmt.where(User.id > last_id)
+            rows = (await self.session.execute(page.limit(LOAD_CHUNK))).all()
+            for user_id, username, first_name, last_name in rows:
+                _add(user_id, username, first_name, last_name)
+            if len(rows) < LOAD_CHUNK:
+                break
+            last_id = rows[-1][0]
+        _LOADED = True
+        logger.info(f"Índice de búsqueda de usuarios cargado: {len(_USERS)} usuarios")
+
+    async def search(self, query: str, *, offset: int = 0, limit: int = 10) -> Tuple[List[User], int]:
+        """Usuarios que coinciden con ``query`` ordenados por relevancia, y el total."""
+        query = query.strip()
+        if query.isdigit():
+            user = await self.session.get(User, int(query))
+            return ([user], 1) if user else ([], 0)
+        if self._use_pg_trgm():
+            return await self._search_pg_trgm(query, offset, limit)
+
+        ranked = await self.rank(query)
+        ids = [user_id for user_id, _ in ranked[offset:offset + limit]]
+        if not ids:
+            return [], len(ranked)
+        users = (await self.session.execute(select(User).where(User.id.in_(ids)))).scalars().all()
+        by_id = {user.id: user for user in users}
+        return [by_id[user_id] for user_id in ids if user_id in by_id], len(ranked)
+
+    async def rank(self, query: str) -> List[Tuple[int, float]]:
+        """(user_id, puntuación) de todas las coincidencias, de mejor a peor."""
+        await self._ensure_index()
+        query = normalize(query)
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        counts: Counter = Counter()
+        for gram in query_grams:
+            counts.update(_GRAM_INDEX.get(gram, ()))
+        needed = SIMILARITY_THRESHOLD * len(query_grams)
+        ranked = [
+            (user_id, _score(user_id, query, query_grams, shared))
+            for user_id, shared in counts.items()
+            if shared >= needed
+        ]
+        for user_id in _infix_candidates(query_grams):
+            # Bajo el umbral solo entran las subcadenas ("toe" en "carlostoek")
+            shared = counts[user_id]
+            if shared < needed and any(query in field for field in _USERS[user_id]):
+                ranked.append((user_id, _score(user_id, query, query_grams, shared)))
+        ranked.sort(key=lambda item: (-item[1], item[0]))
+        return ranked
+
+    async def _ensure_pg_index(self) -> None:
+        global _PG_INDEX_READY
+        if _PG_INDEX_READY:
+            return
+        await self.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await self.session.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users USING gin "
+                "((coalesce(username, '') || ' ' || coalesce(first_name, '') || ' ' "
+                "|| coalesce(last_name, '')) gin_trgm_ops)"
+            )
+        )
+        await self.session.commit()
+        _PG_INDEX_READY = True
+
+    async def _search_pg_trgm(self, query: str, offset: int, limit: int) -> Tuple[List[User], int]:
+        await self._ensure_pg_index()
+        # Debe coincidir con la expresión del índice para que el planificador lo use
+        document = (
+            func.coalesce(User.username, "")
+            .op("||")(" ")
+            .op("||")(func.coalesce(User.first_name, ""))
+            .op("||")(" ")
+            .op("||")(func.coalesce(User.last_name, ""))
+        )
+        term = literal(query.lstrip("@"))
+        matches = term.op("<%")(document)
+        total = (await self.session.execute(select(func.count()).select_from(User).where(matches))).scalar_one()
+        stmt = (
+            select(User)
+            .where(matches)
+            .order_by(func.word_similarity(term, document).desc(), User.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        users = (await self.session.execute(stmt)).scalars().all()
+        return list(users), total
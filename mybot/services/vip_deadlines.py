@@ -0,0 +1,121 @@
+"""
+Plazos de las suscripciones VIP: recordatorio 24 h antes y expulsión al vencer.
+Se guardan en un montículo en memoria reconstruido desde
+``users.vip_expires_at`` al arrancar, y ``SubscriptionService`` lo actualiza al
+extender, revocar o fijar una expiración. Las entradas antiguas no se borran
+del montículo: se descartan al extraerlas si el vencimiento ya no coincide.
+En modo multiproceso el montículo vive en el worker planificador y los demás
+le reenvían los cambios.
+"""
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import User
+from services.cluster import forward_to_scheduler, subscribe
+
+logger = logging.getLogger(__name__)
+
+REMIND = "remind"
+EXPIRE = "expire"
+REMINDER_LEAD = timedelta(hours=24)
+
+# (momento, user_id, acción, vencimiento al programarla)
+_DEADLINES: List[Tuple[datetime, int, str, datetime]] = []
+# user_id -> vencimiento vigente
+_EXPIRES: Dict[int, datetime] = {}
+_WAKEUP: Optional[asyncio.Event] = None
+
+
+def get_wakeup_event() -> asyncio.Event:
+    global _WAKEUP
+    if _WAKEUP is None:
+        _WAKEUP = asyncio.Event()
+    return _WAKEUP
+
+
+def _push(when: datetime, user_id: int, action: str, expires_at: datetime) -> None:
+    heapq.heappush(_DEADLINES, (when, user_id, action, expires_at))
+    if _DEADLINES[0][1] == user_id:
+        get_wakeup_event().set()
+
+
+def schedule_vip_expiry(user_id: int, expires_at: Optional[datetime], *, remind: bool = True) -> None:
+    """Programa recordatorio y vencimiento; sin fecha (o ya vencida) solo cancela."""
+    if forward_to_scheduler("vip_deadline", user_id, expires_at, remind):
+        return
+    if expires_at is None:
+        cancel_vip_expiry(user_id)
+        return
+    _EXPIRES[user_id] = expires_at
+    now = datetime.utcnow()
+    if remind and expires_at > now:
+        _push(max(now, expires_at - REMINDER_LEAD), user_id, REMIND, expires_at)
+    _push(expires_at, user_id, EXPIRE, expires_at)
+
+
+def cancel_vip_expiry(user_id: int) -> None:
+    if forward_to_scheduler("vip_deadline", user_id, None, False):
+        return
+    _EXPIRES.pop(user_id, None)
+
+
+subscribe("vip_deadline", lambda user_id, expires_at, remind: schedule_vip_expiry(user_id, expires_at, remind=remind))
+
+
+async def rebuild_vip_deadlines(session: AsyncSession) -> int:
+    """Recarga los plazos de todos los VIP con fecha de vencimiento."""
+    result = await session.execute(
+        select(User.id, User.vip_expires_at, User.last_reminder_sent_at).where(
+            User.role == "vip", User.vip_expires_at.is_not(None)
+        )
+    )
+    _DEADLINES.clear()
+    _EXPIRES.clear()
+    now = datetime.utcnow()
+    for user_id, expires_at, reminded_at in result.all():
+        _EXPIRES[user_id] = expires_at
+        if expires_at > now and (reminded_at is None or reminded_at <= now - REMINDER_LEAD):
+            _DEADLINES.append((max(now, expires_at - REMINDER_LEAD), user_id, REMIND, expires_at))
+        _DEADLINES.append((expires_at, user_id, EXPIRE, expires_at))
+    heapq.heapify(_DEADLINES)
+    get_wakeup_event().set()
+    logger.info(f"VIP deadlines rebuilt: {len(_EXPIRES)} subscriptions")
+    return len(_EXPIRES)
+
+
+def seconds_until_next() -> Optional[float]:
+    """Segundos hasta el próximo plazo (0 si ya venció), o None si no hay ninguno."""
+    if not _DEADLINES:
+        return None
+    return max(0.0, (_DEADLINES[0][0] - datetime.utcnow()).total_seconds())
+
+
+def pop_due(now: Optional[datetime] = None) -> Tuple[List[int], List[int]]:
+    """Extrae los plazos vencidos; devuelve (ids a recordar, ids a expirar)."""
+    now = now or datetime.utcnow()
+    remind: Dict[int, None] = {}
+    expire: Dict[int, None] = {}
+    while _DEADLINES and _DEADLINES[0][0] <= now:
+        _, user_id, action, expires_at = heapq.heappop(_DEADLINES)
+        if _EXPIRES.get(user_id) != expires_at:
+            continue
+        if action == EXPIRE:
+            expire[user_id] = None
+            remind.pop(user_id, None)
+        elif user_id not in expire:
+            remind[user_id] = None
+    for user_id in expire:
+        _EXPIRES.pop(user_id, None)
+    return list(remind), list(expire)
+
+
+def retry_vip_expiry(user_id: int, when: datetime) -> None:
+    """Reprograma una expiración que no pudo completarse."""
+    expires_at = _EXPIRES.setdefault(user_id, when)
+    _push(when, user_id, EXPIRE, expires_at)
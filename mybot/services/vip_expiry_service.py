@@ -0,0 +1,213 @@
+"""
+Procesamiento de vencimientos VIP: recordatorios antes de expirar y expulsión
+del canal al vencer. Los usuarios se recorren por id en lotes; en cada lote los
+envíos a Telegram van en paralelo (acotados por semáforo y por el limitador
+global) y el cambio de estado se confirma por lote, registrando el resultado
+de cada usuario para que un fallo no deshaga el de los demás.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import User
+from services.config_service import ConfigService
+from utils.user_roles import clear_role_cache
+from utils.rate_limiter import TELEGRAM_LIMITER
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_CHUNK_SIZE = 100
+EXPIRY_CONCURRENCY = 8
+REMINDER_WINDOW = timedelta(hours=24)
+
+DEFAULT_REMINDER_MESSAGE = "Tu suscripción VIP expira pronto."
+DEFAULT_FAREWELL_MESSAGE = "Tu suscripción VIP ha expirado."
+
+# Resultados por usuario
+REMINDED = "reminded"
+REMINDER_FAILED = "reminder_failed"
+EXPIRED = "expired"
+KICK_FAILED = "kick_failed"
+FAREWELL_FAILED = "farewell_failed"
+DB_FAILED = "db_failed"
+
+
+async def _telegram_call(method, *args) -> None:
+    await TELEGRAM_LIMITER.acquire()
+    try:
+        await method(*args)
+    except TelegramRetryAfter as e:
+        await asyncio.sleep(e.retry_after)
+        await TELEGRAM_LIMITER.acquire()
+        await method(*args)
+
+
+class VipExpiryService:
+    def __init__(self, session: AsyncSession, bot: Bot):
+        self.session = session
+        self.bot = bot
+        self._semaphore = asyncio.Semaphore(EXPIRY_CONCURRENCY)
+
+    async def _chunks(self, *conditions):
+        """Ids de usuario que cumplen ``conditions``, en lotes por orden de id."""
+        stmt = select(User.id).where(*conditions).order_by(User.id).limit(EXPIRY_CHUNK_SIZE)
+        last_id = None
+        while True:
+            page = stmt if last_id is None else stmt.where(User.id > last_id)
+            ids = (await self.session.execute(page)).scalars().all()
+            if not ids:
+                return
+            yield ids
+            if len(ids) < EXPIRY_CHUNK_SIZE:
+                return
+            last_id = ids[-1]
+
+    async def _commit_chunk(self, stmt, ids: List[int], results: Dict[int, str], failed: str) -> bool:
+        try:
+            await self.session.execute(stmt.execution_options(synchronize_session=False))
+            await self.session.commit()
+            return True
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Failed to store VIP expiry chunk of {len(ids)} users: {e}")
+            for user_id in ids:
+                results[user_id] = failed
+            return False
+
+    async def _send_reminder(self, user_id: int, text: str) -> bool:
+        async with self._semaphore:
+            try:
+                await _telegram_call(self.bot.send_message, user_id, text)
+                return True
+            except Exception as e:
+                logger.warning(f"Failed to send VIP reminder to {user_id}: {e}")
+                return False
+
+    async def send_reminders(
+        self,
+        now: Optional[datetime] = None,
+        text: Optional[str] = None,
+        user_ids: Optional[List[int]] = None,
+    ) -> Dict[int, str]:
+        """Recuerda a los VIP que vencen en las próximas 24 h (como mucho uno al día)."""
+        now = now or datetime.utcnow()
+        results: Dict[int, str] = {}
+        conditions = (
+            User.role == "vip",
+            User.vip_expires_at > now,
+            User.vip_expires_at <= now + REMINDER_WINDOW,
+            User.last_reminder_sent_at.is_(None) | (User.last_reminder_sent_at <= now - REMINDER_WINDOW),
+        )
+        if user_ids is not None:
+            conditions += (User.id.in_(user_ids),)
+        async for ids in self._chunks(*conditions):
+            sent = await asyncio.gather(*(self._send_reminder(user_id, text) for user_id in ids))
+            reminded = [user_id for user_id, ok in zip(ids, sent) if ok]
+            results.update({user_id: REMINDER_FAILED for user_id, ok in zip(ids, sent) if not ok})
+            if not reminded:
+                continue
+            stmt = update(User).where(User.id.in_(reminded)).values(last_reminder_sent_at=now)
+            if await self._commit_chunk(stmt, reminded, results, DB_FAILED):
+                results.update({user_id: REMINDED for user_id in reminded})
+        return results
+
+    async def _kick(self, user_id: int, channel_id: Optional[int]) -> bool:
+        if not channel_id:
+            return True
+        async with self._semaphore:
+            try:
+                await _telegram_call(self.bot.ban_chat_member, channel_id, user_id)
+                await _telegram_call(self.bot.unban_chat_member, channel_id, user_id)
+                return True
+            except TelegramBadRequest as e:
+                # Ya no estaba en el canal: se puede degradar igualmente
+                if "USER_NOT_PARTICIPANT" in str(e) or "PARTICIPANT_ID_INVALID" in str(e):
+                    return True
+                logger.warning(f"Failed to remove {user_id} from VIP channel: {e}")
+                return False
+            except Exception as e:
+                logger.warning(f"Failed to remove {user_id} from VIP channel: {e}")
+                return False
+
+    async def _send_farewell(self, user_id: int, text: str) -> bool:
+        async with self._semaphore:
+            try:
+                await _telegram_call(self.bot.send_message, user_id, text)
+                return True
+            except Exception as e:
+                logger.warning(f"Failed to send VIP farewell to {user_id}: {e}")
+                return False
+
+    async def expire_subscriptions(
+        self,
+        now: Optional[datetime] = None,
+        text: Optional[str] = None,
+        channel_id: Optional[int] = None,
+        user_ids: Optional[List[int]] = None,
+    ) -> Dict[int, str]:
+        """Expulsa del canal y pasa a ``free`` a los VIP vencidos.
+
+        Solo se degrada a quien salió del canal; si la expulsión falla el usuario
+        sigue como VIP y se reintenta en la siguiente ejecución (de lo contrario
+        la sincronización por membresía lo volvería a promover).
+        """
+        now = now or datetime.utcnow()
+        results: Dict[int, str] = {}
+        conditions = (User.role == "vip", User.vip_expires_at.is_not(None), User.vip_expires_at <= now)
+        if user_ids is not None:
+            conditions += (User.id.in_(user_ids),)
+        async for ids in self._chunks(*conditions):
+            kicked = await asyncio.gather(*(self._kick(user_id, channel_id) for user_id in ids))
+            removed = [user_id for user_id, ok in zip(ids, kicked) if ok]
+            results.update({user_id: KICK_FAILED for user_id, ok in zip(ids, kicked) if not ok})
+            if not removed:
+                continue
+            stmt = update(User).where(User.id.in_(removed), User.role == "vip").values(role="free")
+            if not await self._commit_chunk(stmt, removed, results, DB_FAILED):
+                continue
+            # El UPDATE no pasa por el ORM: la caché de roles no se entera sola
+            for user_id in removed:
+                clear_role_cache(user_id)
+            sent = await asyncio.gather(*(self._send_farewell(user_id, text) for user_id in removed))
+            results.update(
+                {user_id: EXPIRED if ok else FAREWELL_FAILED for user_id, ok in zip(removed, sent)}
+            )
+        return results
+
+    async def run(
+        self,
+        now: Optional[datetime] = None,
+        *,
+        remind_ids: Optional[List[int]] = None,
+        expire_ids: Optional[List[int]] = None,
+    ) -> Dict[str, Dict[int, str]]:
+        """Recordatorios y vencimientos en una pasada; devuelve el resultado por usuario.
+
+        Sin ids se revisan todos los VIP; con ids solo esos usuarios (una lista
+        vacía omite esa fase).
+        """
+        now = now or datetime.utcnow()
+        config_service = ConfigService(self.session)
+        reminder_msg = await config_service.get_value("vip_reminder_message") or DEFAULT_REMINDER_MESSAGE
+        farewell_msg = await config_service.get_value("vip_farewell_message") or DEFAULT_FAREWELL_MESSAGE
+        channel_id = await config_service.get_vip_channel_id()
+
+        reminders: Dict[int, str] = {}
+        expirations: Dict[int, str] = {}
+        if remind_ids is None or remind_ids:
+            reminders = await self.send_reminders(now, reminder_msg, remind_ids)
+        if expire_ids is None or expire_ids:
+            expirations = await self.expire_subscriptions(now, farewell_msg, channel_id, expire_ids)
+        for label, results in (("reminders", reminders), ("expirations", expirations)):
+            if results:
+                counts: Dict[str, int] = {}
+                for outcome in results.values():
+                    counts[outcome] = counts.get(outcome, 0) + 1
+                logger.info(f"VIP {label}: {counts}")
+        return {"reminders": reminders, "expirations": expirations}
@@ -0,0 +1,241 @@
+"""
+Supervisor del modo multiproceso (``BOT_WORKERS`` > 1).
+Recibe las actualizaciones por polling (o por webhook, ver ``webhook``) y pone
+cada una en la cola del worker que le corresponde a su usuario
+(``services.cluster.shard_for``), así que las de un mismo usuario las procesa
+siempre el mismo worker y en orden. Un hilo reenvía los mensajes del bus
+(invalidaciones de caché, plazos) entre workers por una cola de control aparte,
+sin límite, para que nunca esperen detrás de las actualizaciones. Si un worker muere se
+relanza, con una espera creciente si muere nada más arrancar. Cuando la cola
+de un worker se llena, la recepción espera.
+"""
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.types import Update
+
+from services.cluster import shard_for, update_user_id
+from webhook import WebhookServer
+
+logger = logging.getLogger(__name__)
+
+POLL_TIMEOUT = 30
+# Segundos que debe vivir un worker para que su muerte no cuente como fallo seguido
+STABLE_AFTER = 60
+MAX_RESTART_DELAY = 30
+SHUTDOWN_TIMEOUT = 30
+
+
+class Supervisor:
+    def __init__(
+        self,
+        bot: Bot,
+        workers: int,
+        worker_target: Callable,
+        allowed_updates: Optional[List[str]] = None,
+        queue_size: int = 1000,
+        webhook: Optional[Dict[str, Any]] = None,
+    ):
+        self.bot = bot
+        self.workers = workers
+        self.worker_target = worker_target
+        self.allowed_updates = allowed_updates
+        self.queue_size = queue_size
+        # spawn: cada worker arranca un intérprete limpio, sin hilos ni bucles heredados
+        self._ctx = multiprocessing.get_context("spawn")
+        self.bus = self._ctx.Queue()
+        self.inboxes = [self._ctx.Queue(maxsize=queue_size) for _ in range(workers)]
+        # Mensajes del bus: sin límite, el hilo de reenvío nunca se bloquea
+        self.controls = [self._ctx.Queue() for _ in range(workers)]
+        self._controls_lock = threading.Lock()
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self._started_at = [0.0] * workers
+        self._failures = [0] * workers
+        self._restart_at: List[Optional[float]] = [None] * workers
+        self.webhook: Optional[WebhookServer] = None
+        self._webhook_options: Dict[str, Any] = {}
+        if webhook:
+            options = dict(webhook)
+            self.webhook = WebhookServer(
+                bot,
+                self.dispatch,
+                update_user_id,
+                path=options.pop("path"),
+                secret=options.pop("secret"),
+                queue_size=options.pop("queue_size"),
+                coalesce=options.pop("coalesce"),
+                status=self._worker_status,
+            )
+            self._webhook_options = options
+
+    def _start_worker(self, index: int) -> None:
+        process = self._ctx.Process(
+            target=self.worker_target,
+            args=(index, self.workers, self.inboxes[index], self.controls[index], self.bus),
+            name=f"bot-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[index] = process
+        self._started_at[index] = time.monotonic()
+        self._restart_at[index] = None
+        logger.info(f"Worker {index} started (pid {process.pid})")
+
+    def _move_pending(self, old, new, index: int, kind: str) -> None:
+        moved = 0
+        while True:
+            try:
+                new.put_nowait(old.get(timeout=0.05))
+            except (queue.Empty, queue.Full):
+                break
+            moved += 1
+        if moved:
+            logger.info(f"Moved {moved} queued {kind} to the new worker {index}")
+
+    def _replace_queues(self, index: int) -> None:
+        """Da al worker relanzado colas nuevas con lo que quedaba en las anteriores.
+
+        Un proceso que muere mientras lee puede dejar tomado el cerrojo de la
+        cola; en ese caso lo pendiente se pierde en lugar de bloquear al nuevo.
+        """
+        old = self.inboxes[index]
+        self.inboxes[index] = self._ctx.Queue(maxsize=self.queue_size)
+        self._move_pending(old, self.inboxes[index], index, "updates")
+        with self._controls_lock:
+            old = self.controls[index]
+            self.controls[index] = self._ctx.Queue()
+            self._move_pending(old, self.controls[index], index, "bus messages")
+
+    def _check_workers(self) -> None:
+        now = time.monotonic()
+        for index, process in enumerate(self.processes):
+            if process.is_alive():
+                continue
+            if self._restart_at[index] is None:
+                lived = now - self._started_at[index]
+                self._failures[index] = 0 if lived > STABLE_AFTER else self._failures[index] + 1
+                delay = min(2 ** self._failures[index] - 1, MAX_RESTART_DELAY)
+                logger.error(f"Worker {index} exited with code {process.exitcode}; restarting in {delay} s")
+                self._restart_at[index] = now + delay
+            if now >= self._restart_at[index]:
+                self._replace_queues(index)
+                self._start_worker(index)
+
+    def _relay(self) -> None:
+        """Hilo: reparte los mensajes del bus a su destino o al resto de workers."""
+        while True:
+            message = self.bus.get()
+            if message is None:
+                return
+            topic, args, origin, target = message
+            targets = [target] if target is not None else [i for i in range(self.workers) if i != origin]
+            with self._controls_lock:
+                for index in targets:
+                    self.controls[index].put((topic, args))
+
+    def _worker_status(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "workers_alive": sum(1 for process in self.processes if process is not None and process.is_alive()),
+            "worker_queue_depth": [inbox.qsize() for inbox in self.inboxes],
+            "worker_control_depth": [control.qsize() for control in self.controls],
+        }
+
+    async def dispatch(self, update: Update) -> None:
+        index = shard_for(update_user_id(update), self.workers)
+        item = ("update", update.model_dump_json(exclude_unset=True))
+        try:
+            self.inboxes[index].put_nowait(item)
+        except queue.Full:
+            # Backpressure: no se piden más actualizaciones hasta que el worker avance
+            await asyncio.get_running_loop().run_in_executor(None, self.inboxes[index].put, item)
+
+    async def _poll(self) -> None:
+        offset = None
+        failures = 0
+        while True:
+            try:
+                updates = await self.bot.get_updates(
+                    offset=offset,
+                    timeout=POLL_TIMEOUT,
+                    allowed_updates=self.allowed_updates,
+                    request_timeout=POLL_TIMEOUT + 10,
+                )
+            except Exception as e:
+                failures += 1
+                logger.error(f"Polling failed ({failures} in a row): {e}")
+                await asyncio.sleep(min(failures, 5))
+                continue
+            failures = 0
+            for update in updates:
+                await self.dispatch(update)
+                offset = update.update_id + 1
+
+    def _shutdown_workers(self) -> None:
+        for control in self.controls:
+            control.put(None)
+        for index, inbox in enumerate(self.inboxes):
+            try:
+                inbox.put(None, timeout=5)
+            except queue.Full:
+                logger.warning(f"Worker {index} queue full at shutdown")
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for process in self.processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning(f"Worker {process.name} did not stop in time; terminating")
+                process.terminate()
+                process.join()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        for index in range(self.workers):
+            self._start_worker(index)
+        relay = threading.Thread(target=self._relay, name="cluster-relay", daemon=True)
+        relay.start()
+        if self.webhook is None:
+            receiver = asyncio.create_task(self._poll())
+        else:
+            receiver = asyncio.create_task(
+                self.webhook.serve(stop, allowed_updates=self.allowed_updates, **self._webhook_options)
+            )
+        logger.info(f"Supervisor receiving updates for {self.workers} workers")
+        try:
+            while not stop.is_set() and not receiver.done():
+                self._check_workers()
+                try:
+                    await asyncio.wait_for(stop.wait(), 1)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self.webhook is None:
+                receiver.cancel()
+            else:
+                # El webhook deja de aceptar y entrega a los workers lo que tenía en cola
+                stop.set()
+            await asyncio.gather(receiver, return_exceptions=True)
+            logger.info("Supervisor stopping workers")
+            await loop.run_in_executor(None, self._shutdown_workers)
+            self.bus.put(None)
+            relay.join(5)
+            await self.bot.session.close()
+
+
+def run_supervisor(
+    token: str, workers: int, worker_target: Callable, allowed_updates=None, queue_size=1000, webhook=None
+) -> None:
+    async def _run():
+        supervisor = Supervisor(Bot(token=token), workers, worker_target, allowed_updates, queue_size, webhook)
+        await supervisor.run()
+
+    asyncio.run(_run())
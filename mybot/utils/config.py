@@ -18,8 +18,52 @@ VIP_CHANNEL_ID = int(os.environ.get("VIP_CHANNEL_ID", "0"))
 FREE_CHANNEL_ID = int(os.environ.get("FREE_CHANNEL_ID", "0"))
 
 # Scheduler intervals
-CHANNEL_SCHEDULER_INTERVAL = int(os.environ.get("CHANNEL_SCHEDULER_INTERVAL", "30"))
 VIP_SCHEDULER_INTERVAL = int(os.environ.get("VIP_SCHEDULER_INTERVAL", "3600"))
+VIP_SAFETY_SCAN_INTERVAL = int(os.environ.get("VIP_SAFETY_SCAN_INTERVAL", "21600"))
+JOIN_SAFETY_SCAN_INTERVAL = int(os.environ.get("JOIN_SAFETY_SCAN_INTERVAL", "300"))
+# Con varios procesos del bot, solo el que tenga el arrendamiento ejecuta las tareas programadas
+SCHEDULER_LEADER_ELECTION = os.environ.get("SCHEDULER_LEADER_ELECTION", "0") == "1"
+
+# Recarga en caliente de fragmentos narrativos (inotify con sondeo de respaldo)
+NARRATIVE_HOT_RELOAD = os.environ.get("NARRATIVE_HOT_RELOAD", "0") == "1"
+NARRATIVE_FRAGMENTS_DIR = os.environ.get("NARRATIVE_FRAGMENTS_DIR", "mybot/narrative_fragments")
+NARRATIVE_POLL_INTERVAL = float(os.environ.get("NARRATIVE_POLL_INTERVAL", "2"))
+
+# Búsqueda de usuarios en el panel de admin: "memory" (índice de trigramas) o "pg_trgm"
+USER_SEARCH_BACKEND = os.environ.get("USER_SEARCH_BACKEND", "memory")
+
+# Modo diagnóstico: registrar sentencias SQL más lentas que este umbral (0 = desactivado)
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "0"))
+
+# Bloqueos del bucle de eventos a partir de los cuales se registra la pila
+LOOP_LAG_THRESHOLD_MS = float(os.environ.get("LOOP_LAG_THRESHOLD_MS", "100"))
+
+# Perfil de muestreo durante N segundos tras arrancar (0 = desactivado)
+SAMPLING_PROFILER_SECONDS = float(os.environ.get("SAMPLING_PROFILER_SECONDS", "0"))
+SAMPLING_PROFILER_OUTPUT = os.environ.get("SAMPLING_PROFILER_OUTPUT", "profile.folded")
+
+# Arranque rápido: omitir create_all si el esquema ya está en la última versión
+DB_FAST_START = os.environ.get("DB_FAST_START", "1") == "1"
+# Registrar el tiempo de import por módulo y de cada fase del arranque
+STARTUP_PROFILE = os.environ.get("STARTUP_PROFILE", "0") == "1"
+
+# Procesos worker; con más de uno las actualizaciones se reparten por usuario
+BOT_WORKERS = max(1, int(os.environ.get("BOT_WORKERS", "1")))
+# Actualizaciones procesadas a la vez por cada worker
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "50"))
+# Actualizaciones en cola por worker antes de frenar la recepción
+WORKER_QUEUE_SIZE = int(os.environ.get("WORKER_QUEUE_SIZE", "1000"))
+
+# Webhook: URL pública base (vacía = polling), ruta, puerto y secreto que envía Telegram
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.environ.get("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", os.environ.get("PORT", "8080")))
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "")
+# Actualizaciones recibidas en espera; llena, el webhook responde 503 y Telegram reintenta
+WEBHOOK_QUEUE_SIZE = int(os.environ.get("WEBHOOK_QUEUE_SIZE", "1000"))
+# Fundir pulsaciones repetidas del mismo botón y reacciones seguidas de un usuario
+WEBHOOK_COALESCE = os.environ.get("WEBHOOK_COALESCE", "1") == "1"
 
 # Default reaction buttons
 DEFAULT_REACTION_BUTTONS = ["👍", "❤️", "😂", "🔥", "💯"]
@@ -39,5 +83,6 @@ class Config:
     
     DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
     
-    CHANNEL_SCHEDULER_INTERVAL = CHANNEL_SCHEDULER_INTERVAL
     VIP_SCHEDULER_INTERVAL = VIP_SCHEDULER_INTERVAL
+    VIP_SAFETY_SCAN_INTERVAL = VIP_SAFETY_SCAN_INTERVAL
+    JOIN_SAFETY_SCAN_INTERVAL = JOIN_SAFETY_SCAN_INTERVAL
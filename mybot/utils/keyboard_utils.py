@@ -363,7 +363,7 @@ def get_admin_content_minigames_keyboard():
 
 
 def get_admin_users_list_keyboard(
-    users: list[User], offset: int, total_count: int, limit: int = 4
+    users: list[User], nav_buttons: list[InlineKeyboardButton]
 ) -> InlineKeyboardMarkup:
     """Return a keyboard for the paginated list of users with action buttons."""
     keyboard: list[list[InlineKeyboardButton]] = []
@@ -377,16 +377,7 @@ def get_admin_users_list_keyboard(
             InlineKeyboardButton(text="👁", callback_data=f"admin_user_view_{user.id}"),
         ])
 
-    # Navegación mejorada
-    nav_buttons: list[InlineKeyboardButton] = []
-    if offset > 0:
-        nav_buttons.append(
-            InlineKeyboardButton(text="⬅️ Anterior", callback_data=f"admin_users_page_{offset - limit}")
-        )
-    if offset + limit < total_count:
-        nav_buttons.append(
-            InlineKeyboardButton(text="Siguiente ➡️", callback_data=f"admin_users_page_{offset + limit}")
-        )
+    # Navegación por cursor
     if nav_buttons:
         keyboard.append(nav_buttons)
 
@@ -0,0 +1,66 @@
+"""
+Routers de carga diferida.
+``LazyRouter`` ocupa el lugar de un router poco usado sin importar su módulo.
+Cuando le llega un update que podría ser suyo (un comando, un prefijo de
+``callback_data``, un texto de botón o un estado FSM de sus flujos) importa el
+módulo, incluye su router como hijo y deja que el update siga su camino.
+"""
+import importlib
+import logging
+import time
+from typing import Iterable, Optional
+
+from aiogram import Router
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+logger = logging.getLogger(__name__)
+
+
+class LazyRouter(Router):
+    def __init__(
+        self,
+        module_path: str,
+        *,
+        commands: Iterable[str] = (),
+        callback_prefixes: Iterable[str] = (),
+        texts: Iterable[str] = (),
+        state_prefixes: Iterable[str] = (),
+        attribute: str = "router",
+    ):
+        super().__init__(name=f"lazy:{module_path}")
+        self.module_path = module_path
+        self.attribute = attribute
+        self.commands = tuple(f"/{command}" for command in commands)
+        self.callback_prefixes = tuple(callback_prefixes)
+        self.texts = frozenset(texts)
+        self.state_prefixes = tuple(state_prefixes)
+        self.loaded = False
+
+    def load(self) -> Router:
+        """Importa el módulo e incluye su router (idempotente)."""
+        if self.loaded:
+            return self.sub_routers[0]
+        started = time.perf_counter()
+        module = importlib.import_module(self.module_path)
+        router = getattr(module, self.attribute)
+        self.include_router(router)
+        self.loaded = True
+        logger.info(f"Router {self.module_path} cargado en {(time.perf_counter() - started) * 1000:.0f} ms")
+        return router
+
+    def matches(self, event: TelegramObject, raw_state: Optional[str] = None) -> bool:
+        if raw_state and raw_state.startswith(self.state_prefixes):
+            return True
+        if isinstance(event, CallbackQuery):
+            return bool(event.data) and event.data.startswith(self.callback_prefixes)
+        if isinstance(event, Message) and event.text:
+            if event.text in self.texts:
+                return True
+            command = event.text.split(maxsplit=1)[0].split("@", 1)[0]
+            return command in self.commands
+        return False
+
+    async def propagate_event(self, update_type: str, event: TelegramObject, **kwargs):
+        if not self.loaded and self.matches(event, kwargs.get("raw_state")):
+            self.load()
+        return await super().propagate_event(update_type, event, **kwargs)
@@ -1,11 +1,100 @@
+import time
+from typing import Any, Optional
+
 from aiogram.types import InlineKeyboardButton
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+# Segundos que se reutiliza un total antes de volver a contarlo
+COUNT_TTL = 60
 
-def get_pagination_buttons(page: int, total_pages: int, prefix: str) -> list[InlineKeyboardButton]:
-    """Return navigation buttons for a paginated list."""
+# clave -> (total, instante de expiración)
+_COUNT_CACHE: dict[str, tuple[int, float]] = {}
+
+
+def _nav_buttons(prev_data: Optional[str], next_data: Optional[str]) -> list[InlineKeyboardButton]:
     buttons: list[InlineKeyboardButton] = []
-    if page > 0:
-        buttons.append(InlineKeyboardButton(text="⬅️", callback_data=f"{prefix}:{page-1}"))
-    if page + 1 < total_pages:
-        buttons.append(InlineKeyboardButton(text="➡️", callback_data=f"{prefix}:{page+1}"))
+    if prev_data:
+        buttons.append(InlineKeyboardButton(text="⬅️", callback_data=prev_data))
+    if next_data:
+        buttons.append(InlineKeyboardButton(text="➡️", callback_data=next_data))
     return buttons
+
+
+def get_pagination_buttons(page: int, total_pages: int, prefix: str) -> list[InlineKeyboardButton]:
+    """Return navigation buttons for a paginated list."""
+    return _nav_buttons(
+        f"{prefix}:{page-1}" if page > 0 else None,
+        f"{prefix}:{page+1}" if page + 1 < total_pages else None,
+    )
+
+
+def get_keyset_pagination_buttons(
+    prev_cursor: Optional[str], next_cursor: Optional[str], prefix: str
+) -> list[InlineKeyboardButton]:
+    """Navigation buttons for a list paginated with :func:`keyset_page`."""
+    return _nav_buttons(
+        f"{prefix}:{prev_cursor}" if prev_cursor else None,
+        f"{prefix}:{next_cursor}" if next_cursor else None,
+    )
+
+
+async def keyset_page(
+    session: AsyncSession,
+    stmt: Select,
+    key_column: Any,
+    cursor: Optional[str] = None,
+    limit: int = 10,
+) -> tuple[list[Any], Optional[str], Optional[str]]:
+    """Fetch one page of ``stmt`` ordered by the integer ``key_column``.
+
+    ``cursor`` is ``a<key>`` (rows after key) or ``b<key>`` (rows before key);
+    ``None`` starts from the beginning. ``key_column`` must be selected by
+    ``stmt``. Returns the rows plus the cursors for the previous and next pages.
+    """
+    direction, key = "a", None
+    if cursor and cursor[0] in "ab" and cursor[1:].lstrip("-").isdigit():
+        direction, key = cursor[0], int(cursor[1:])
+
+    if direction == "b":
+        stmt = stmt.where(key_column < key).order_by(key_column.desc())
+    else:
+        if key is not None:
+            stmt = stmt.where(key_column > key)
+        stmt = stmt.order_by(key_column)
+
+    rows = list((await session.execute(stmt.limit(limit + 1))).all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "b":
+        rows.reverse()
+    if not rows:
+        return rows, None, None
+
+    first_key = rows[0]._mapping[key_column]
+    last_key = rows[-1]._mapping[key_column]
+    if direction == "b":
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = key is not None, has_more
+    return (
+        rows,
+        f"b{first_key}" if has_prev else None,
+        f"a{last_key}" if has_next else None,
+    )
+
+
+async def get_cached_count(
+    session: AsyncSession, cache_key: str, stmt: Select, ttl: int = COUNT_TTL
+) -> int:
+    """Return ``COUNT(*)`` of ``stmt``, reusing the value for ``ttl`` seconds."""
+    cached = _COUNT_CACHE.get(cache_key)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    total = (await session.execute(select(func.count()).select_from(stmt.subquery()))).scalar_one()
+    _COUNT_CACHE[cache_key] = (total, time.monotonic() + ttl)
+    return total
+
+
+def invalidate_cached_count(cache_key: str) -> None:
+    _COUNT_CACHE.pop(cache_key, None)
@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Token bucket for pacing Telegram API calls across concurrent tasks."""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def set_rate(self, rate: float) -> None:
+        """Cambia el ritmo (p. ej. para repartir el límite entre varios procesos)."""
+        self.rate = rate
+        self.capacity = max(1, int(rate))
+        self._tokens = min(self._tokens, float(self.capacity))
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Límite global de Telegram (~30 llamadas/s por bot) compartido por todos los envíos masivos
+TELEGRAM_LIMITER = RateLimiter(25)
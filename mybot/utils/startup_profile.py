@@ -0,0 +1,106 @@
+"""
+Perfil de arranque.
+Con el modo activo se mide cada módulo importado por primera vez (tiempo
+propio y acumulado, como ``python -X importtime``) y las fases del arranque
+marcadas con ``startup_phase``. Solo usa la biblioteca estándar para poder
+activarse antes de importar nada más.
+"""
+import importlib.abc
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# módulo -> (segundos propios, segundos acumulados)
+_IMPORTS: Dict[str, Tuple[float, float]] = {}
+# Tiempo de los imports hijos del módulo que se está ejecutando en cada nivel
+_STACK: List[float] = []
+_PHASES: List[Tuple[str, float]] = []
+_STARTED = time.perf_counter()
+
+
+class _TimingLoader:
+    """Envuelve el loader real y cronometra ``exec_module``."""
+
+    def __init__(self, loader):
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        _STACK.append(0.0)
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = _STACK.pop()
+            if _STACK:
+                _STACK[-1] += elapsed
+            _IMPORTS[module.__name__] = (elapsed - children, elapsed)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimingLoader(spec.loader)
+            return spec
+        return None
+
+
+_FINDER = _TimingFinder()
+
+
+def enable_import_profiling() -> None:
+    global _STARTED
+    if _FINDER not in sys.meta_path:
+        _STARTED = time.perf_counter()
+        sys.meta_path.insert(0, _FINDER)
+
+
+def disable_import_profiling() -> None:
+    if _FINDER in sys.meta_path:
+        sys.meta_path.remove(_FINDER)
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Anota la duración de una fase del arranque (init_db, routers...)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _PHASES.append((name, time.perf_counter() - started))
+
+
+def get_import_report(limit: int = 25) -> List[Tuple[str, float, float]]:
+    """Módulos con más tiempo propio: (módulo, propio, acumulado)."""
+    rows = [(name, own, total) for name, (own, total) in _IMPORTS.items()]
+    rows.sort(key=lambda row: -row[1])
+    return rows[:limit]
+
+
+def format_startup_report(limit: int = 25) -> str:
+    lines = [f"Arranque: {(time.perf_counter() - _STARTED) * 1000:.0f} ms desde que se activó el perfil"]
+    for name, seconds in _PHASES:
+        lines.append(f"  fase {name}: {seconds * 1000:.1f} ms")
+    if _IMPORTS:
+        total = sum(own for own, _ in _IMPORTS.values())
+        lines.append(f"Imports: {len(_IMPORTS)} módulos, {total * 1000:.0f} ms")
+        lines.append("  propio ms  acumulado ms  módulo")
+        for name, own, cumulative in get_import_report(limit):
+            lines.append(f"  {own * 1000:9.1f}  {cumulative * 1000:12.1f}  {name}")
+    return "\n".join(lines)
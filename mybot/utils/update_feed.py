@@ -0,0 +1,56 @@
+"""
+Entrega de actualizaciones al dispatcher en orden por usuario.
+Las actualizaciones de usuarios distintos se procesan en paralelo (hasta
+``concurrency`` a la vez); las de un mismo usuario esperan a que termine la
+anterior, como en una conversación. ``submit`` espera mientras haya
+``max_pending`` actualizaciones sin terminar, para que quien las recibe frene
+en lugar de acumular tareas.
+"""
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from services.cluster import update_user_id
+
+logger = logging.getLogger(__name__)
+
+
+class UserOrderedFeed:
+    def __init__(self, dp: Dispatcher, bot: Bot, concurrency: int = 50, max_pending: int = 1000):
+        self.dp = dp
+        self.bot = bot
+        self._running = asyncio.Semaphore(concurrency)
+        self._pending = asyncio.Semaphore(max_pending)
+        # user_id -> última tarea encolada de ese usuario
+        self._tails: Dict[int, asyncio.Task] = {}
+
+    @property
+    def pending_users(self) -> int:
+        return len(self._tails)
+
+    async def submit(self, update: Update) -> None:
+        await self._pending.acquire()
+        user_id = update_user_id(update)
+        previous = self._tails.get(user_id)
+        self._tails[user_id] = asyncio.create_task(self._process(user_id, update, previous))
+
+    async def _process(self, user_id: int, update: Update, previous: Optional[asyncio.Task]) -> None:
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+            async with self._running:
+                await self.dp.feed_update(self.bot, update)
+        except Exception:
+            logger.exception(f"Error processing update {update.update_id}")
+        finally:
+            self._pending.release()
+            if self._tails.get(user_id) is asyncio.current_task():
+                del self._tails[user_id]
+
+    async def drain(self) -> None:
+        """Espera a que terminen las actualizaciones en curso."""
+        while self._tails:
+            await asyncio.gather(*self._tails.values(), return_exceptions=True)
@@ -142,10 +142,21 @@ async def get_user_role(
 
 
 def clear_role_cache(user_id: int = None):
-    """Clear role cache for a specific user or all users."""
+    """Clear role cache for a specific user or all users (in every worker)."""
+    _drop_role_cache(user_id)
+    publish("role_cache", user_id)
+
+
+def _drop_role_cache(user_id: int = None):
     if user_id:
         _ROLE_CACHE.pop(user_id, None)
         logger.debug(f"Cleared role cache for user {user_id}")
     else:
         _ROLE_CACHE.clear()
         logger.debug("Cleared all role cache")
+
+
+# Import al final: el paquete services importa point_service, que importa este módulo
+from services.cluster import publish, subscribe  # noqa: E402
+
+subscribe("role_cache", _drop_role_cache)
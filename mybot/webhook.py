@@ -0,0 +1,257 @@
+"""
+Recepción de actualizaciones por webhook (``WEBHOOK_URL``).
+Un servidor aiohttp recibe las actualizaciones de Telegram y las deja en una
+cola acotada; si la cola sigue llena pasado ``ENQUEUE_TIMEOUT`` se responde 503
+y Telegram reintenta más tarde. Un consumidor saca lotes de la cola, funde las
+actualizaciones repetidas de un mismo usuario (``coalesce_updates``: solo
+botones sin efecto acumulado y reacciones) y entrega el resto a ``submit``
+(``UserOrderedFeed.submit`` con un proceso, o el reparto a workers del
+supervisor). ``/healthz`` y ``/readyz`` informan de la cola.
+"""
+import asyncio
+import hmac
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.types import Update
+from aiohttp import web
+
+from services.metrics import inc_counter, set_gauge
+
+logger = logging.getLogger(__name__)
+
+# Segundos que espera una petición por un hueco en la cola antes de responder 503
+ENQUEUE_TIMEOUT = 5
+# Actualizaciones que el consumidor saca de la cola de una vez
+BATCH_SIZE = 100
+# Fracción de la cola a partir de la cual /readyz deja de estar listo
+READY_MAX_FILL = 0.9
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Botones que se pueden fundir: repetir la pulsación no cambia nada (menús,
+# vistas, reacciones que solo cuentan una vez). Los interruptores y las
+# acciones (toggle_*, pujas, decisiones...) quedan fuera y llegan todas.
+COALESCE_CALLBACKS = frozenset({
+    "admin_main",
+    "admin_main_menu",
+    "admin_back",
+    "admin_config",
+    "admin_stats",
+    "config_scheduler",
+    "menu_principal",
+    "free_main_menu",
+    "vip_menu",
+    "vip_stats",
+    "game_profile",
+    "misiones_disponibles",
+    "auction_main",
+    "view_active_auctions",
+    "view_my_auctions",
+    "volver_mochila",
+    "stats_mochila",
+    "narrative_stats",
+    "narrative_help",
+})
+COALESCE_CALLBACK_PREFIXES = (
+    "ip_",
+    "reaction_like_",
+    "reaction_dislike_",
+    "menu:",
+    "mochila_cat:",
+    "ver_pista_detail:",
+    "show_lore_piece:",
+    "view_auction_",
+)
+
+
+def _is_idempotent_callback(data: str) -> bool:
+    return data in COALESCE_CALLBACKS or data.startswith(COALESCE_CALLBACK_PREFIXES)
+
+
+def _coalesce_key(update: Update) -> Optional[Tuple]:
+    """Clave de las actualizaciones que se pueden fundir; None si ninguna."""
+    callback = update.callback_query
+    if (
+        callback is not None
+        and callback.message is not None
+        and callback.data
+        and _is_idempotent_callback(callback.data)
+    ):
+        # Pulsaciones repetidas de un botón sin efecto acumulado
+        return ("callback", callback.message.chat.id, callback.message.message_id, callback.data)
+    reaction = update.message_reaction
+    if reaction is not None:
+        # Cada actualización trae el conjunto completo de reacciones del usuario
+        return ("reaction", reaction.chat.id, reaction.message_id)
+    return None
+
+
+def coalesce_updates(updates: List[Update], user_id: Callable[[Update], int]) -> Tuple[List[Update], List[str]]:
+    """Funde las actualizaciones seguidas de un usuario que repiten la misma acción.
+
+    Solo se funden con la actualización anterior del mismo usuario, así que el
+    orden de cada usuario no cambia. Los botones repetidos de
+    ``COALESCE_CALLBACKS`` se quedan con la primera pulsación; las reacciones, con el estado inicial de la primera y
+    el final de la última. Devuelve (actualizaciones a procesar, ids de los
+    callbacks descartados, que hay que responder igualmente).
+    """
+    kept: List[Update] = []
+    dropped_callbacks: List[str] = []
+    # user_id -> (clave, posición en kept) de su última actualización
+    last: Dict[int, Tuple[Optional[Tuple], int]] = {}
+    for update in updates:
+        user = user_id(update)
+        key = _coalesce_key(update)
+        previous = last.get(user)
+        if key is not None and previous is not None and previous[0] == key:
+            index = previous[1]
+            if update.callback_query is not None:
+                dropped_callbacks.append(update.callback_query.id)
+            else:
+                first = kept[index].message_reaction
+                merged = first.model_copy(
+                    update={"new_reaction": update.message_reaction.new_reaction, "date": update.message_reaction.date}
+                )
+                kept[index] = update.model_copy(update={"message_reaction": merged})
+            continue
+        last[user] = (key, len(kept))
+        kept.append(update)
+    return kept, dropped_callbacks
+
+
+class WebhookServer:
+    def __init__(
+        self,
+        bot: Bot,
+        submit: Callable[[Update], Awaitable[Any]],
+        user_id: Callable[[Update], int],
+        *,
+        path: str = "/webhook",
+        secret: str = "",
+        queue_size: int = 1000,
+        coalesce: bool = True,
+        status: Optional[Callable[[], Dict[str, Any]]] = None,
+    ):
+        self.bot = bot
+        self.submit = submit
+        self.user_id = user_id
+        self.path = path
+        self.secret = secret
+        self.coalesce = coalesce
+        self.status = status
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.ready = False
+        self._closing = False
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self._handle_update)
+        app.router.add_get("/healthz", self._handle_health)
+        app.router.add_get("/readyz", self._handle_ready)
+        return app
+
+    def _report(self) -> Dict[str, Any]:
+        report = {
+            "ready": self.ready,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+        }
+        if self.status is not None:
+            report.update(self.status())
+        return report
+
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception:
+            logger.warning("Invalid webhook payload", exc_info=True)
+            return web.Response(status=400)
+        try:
+            await asyncio.wait_for(self.queue.put(update), ENQUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            inc_counter("bot_webhook_updates_total", {"outcome": "rejected"})
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        inc_counter("bot_webhook_updates_total", {"outcome": "queued"})
+        set_gauge("bot_webhook_queue_depth", None, self.queue.qsize())
+        return web.Response()
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response(self._report())
+
+    async def _handle_ready(self, request: web.Request) -> web.Response:
+        report = self._report()
+        ready = report["ready"] and report["queue_depth"] < report["queue_size"] * READY_MAX_FILL
+        return web.json_response(report, status=200 if ready else 503)
+
+    def _take_batch(self, first: Update) -> List[Update]:
+        batch = [first]
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _answer_dropped(self, callback_ids: List[str]) -> None:
+        for callback_id in callback_ids:
+            try:
+                await self.bot.answer_callback_query(callback_id)
+            except Exception as e:
+                logger.debug(f"Could not answer coalesced callback {callback_id}: {e}")
+
+    async def _consume(self) -> None:
+        """Entrega lotes hasta que se cierre el servidor y la cola quede vacía."""
+        while not (self._closing and self.queue.empty()):
+            try:
+                first = await asyncio.wait_for(self.queue.get(), 0.5)
+            except asyncio.TimeoutError:
+                continue
+            batch = self._take_batch(first)
+            set_gauge("bot_webhook_queue_depth", None, self.queue.qsize())
+            if self.coalesce:
+                updates, dropped = coalesce_updates(batch, self.user_id)
+                if len(updates) < len(batch):
+                    inc_counter("bot_webhook_updates_total", {"outcome": "coalesced"}, len(batch) - len(updates))
+                if dropped:
+                    asyncio.create_task(self._answer_dropped(dropped))
+            else:
+                updates = batch
+            for update in updates:
+                try:
+                    await self.submit(update)
+                except Exception:
+                    logger.exception(f"Error submitting update {update.update_id}")
+
+    async def serve(
+        self,
+        stop: asyncio.Event,
+        *,
+        url: str,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        allowed_updates: Optional[List[str]] = None,
+    ) -> None:
+        """Atiende el webhook hasta que se active ``stop``; después vacía la cola."""
+        runner = web.AppRunner(self.build_app())
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        self._closing = False
+        consumer = asyncio.create_task(self._consume())
+        try:
+            await self.bot.set_webhook(
+                url.rstrip("/") + self.path,
+                secret_token=self.secret or None,
+                allowed_updates=allowed_updates,
+            )
+            self.ready = True
+            logger.info(f"Webhook listening on {host}:{port}{self.path}")
+            await stop.wait()
+        finally:
+            self.ready = False
+            # Sin borrar el webhook: Telegram guarda las actualizaciones hasta el próximo arranque
+            await runner.cleanup()
+            self._closing = True
+            await asyncio.gather(consumer, return_exceptions=True)
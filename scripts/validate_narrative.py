@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Script para validar el grafo narrativo antes de cargarlo.
+Sale con código 1 si hay errores (destinos inexistentes, condiciones imposibles...).
+"""
+import argparse
+import importlib.util
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, os.pardir))
+STORY_GRAPH_PATH = os.path.join(ROOT_DIR, "mybot", "services", "story_graph.py")
+
+# Se carga el módulo por su ruta: importar el paquete ``services`` arrastraría
+# la base de datos y todos los servicios, y validar solo necesita los archivos.
+_spec = importlib.util.spec_from_file_location("story_graph", STORY_GRAPH_PATH)
+story_graph = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(story_graph)
+START_FRAGMENT_KEY = story_graph.START_FRAGMENT_KEY
+StoryGraph = story_graph.StoryGraph
+format_report = story_graph.format_report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Valida los fragmentos narrativos JSON.")
+    parser.add_argument("directory", nargs="?", default="mybot/narrative_fragments")
+    parser.add_argument("--start", default=START_FRAGMENT_KEY, help="Clave del fragmento inicial")
+    parser.add_argument("--strict", action="store_true", help="Tratar los avisos como errores")
+    args = parser.parse_args()
+
+    graph = StoryGraph.from_directory(args.directory)
+    report = graph.analyze(args.start)
+    print(format_report(report))
+
+    if report["errors"] or (args.strict and report["warnings"]):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())